@@ -8,14 +8,45 @@ import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), 'src')))
 # --- FIN DE LA CORRECTION ---
 
-from flask import Flask, request, jsonify, render_template, send_file
+# Table des modèles de litellm lue dans le paquet installé: sans cela, l'import de crewai
+# la télécharge (jusqu'à 5 s sans réseau sortant) à chaque démarrage. Valeur vide: téléchargement.
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+
+from flask import Flask, Response, request, jsonify, render_template, send_file
 from flask_cors import CORS
-from medical_report.crew import MedicalReportCrew
-from medical_report.pdf_generator import ModernPDFGenerator
-import queue
+from medical_report.crew_factory import CrewFactory
+from medical_report.pdf_service import PDFRenderService
+from medical_report.scheduler import SessionScheduler, SchedulerFull
+from medical_report.events import SessionEvents, FinalAnswerFilter, format_sse
+from medical_report.session_store import create_session_store, DEFAULT_MODE
+from medical_report.reaper import SessionReaper, SessionCancelled
+from medical_report.pipeline import IncrementalDossier
+from medical_report.fast_report import REPORT_SEPARATOR, split_fast_report
+from medical_report.fake_llm import llm_factory_from_env
+from medical_report.llm_cache import LLMResponseCache
+from medical_report.llm_gateway import LLMGateway
+from medical_report.question_bank import QuestionBank
+from medical_report.report_archive import ReportArchive
+from medical_report.speculation import Speculator
+from medical_report.session_context import current_session
+from medical_report.tools.custom_tool import AskPatientTool, AnalyzePatientResponseTool
+from medical_report.transcript import INTERVIEW_TASK, BoundedHistoryLLM, Transcript, clip
+from medical_report.tools.response_analyzer import analyze, format_analysis
+from medical_report.telemetry import Telemetry
+from crewai.events import (
+    crewai_event_bus, LLMCallStartedEvent, LLMCallCompletedEvent, LLMCallFailedEvent, LLMStreamChunkEvent,
+    TaskStartedEvent, TaskCompletedEvent, TaskFailedEvent,
+    ToolUsageStartedEvent, ToolUsageFinishedEvent, ToolUsageErrorEvent,
+)
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import hmac
+import socket
+import sqlite3
 import threading
+import time
 import uuid
 import tempfile
+import math
 import os
 import logging
 
@@ -23,59 +54,341 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {"origins": ["http://localhost:5173", "http://127.0.0.1:5173"]}})
+# Origines du frontend de développement (Vite)
+CORS_ORIGINS = ["http://localhost:5173", "http://127.0.0.1:5173"]
 
-# Ce dictionnaire stockera l'état de chaque session utilisateur.
-# Pour une vraie application, on utiliserait une base de données comme Redis.
-sessions = {}
-
-# Initialiser le générateur PDF
-pdf_generator = ModernPDFGenerator()
+app = Flask(__name__)
+CORS(app, resources={r"/*": {"origins": CORS_ORIGINS}})
 
-# --- Modification du Tool pour communiquer avec le web ---
-# Nous allons "patcher" la méthode _run de notre outil au démarrage.
+# État sérialisable des sessions (statut, questions/réponses, rapport): partagé entre
+# workers avec PSYCHAT_SESSION_STORE=sqlite, en mémoire du processus sinon.
+store = create_session_store()
 
-from medical_report.tools.custom_tool import AskPatientTool
+# Objets d'exécution des sessions dont le crew tourne dans CE processus
+# (journal d'événements SSE, filtre du flux du rapport).
+sessions = {}
 
-def web_ask_patient_run(self, question: str) -> str:
-    """Version web de la méthode _run du tool avec limite stricte de 10 questions."""
-    session_id = threading.current_thread().name
-    
-    if session_id not in sessions:
-        logger.error(f"Session {session_id} non trouvée dans web_ask_patient_run")
+# Identifiant de ce worker pour les baux de reprise des sessions
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+# Durée d'un bail de session (secondes): passé ce délai sans renouvellement,
+# un autre worker reprend la session depuis son dernier échange répondu.
+SESSION_LEASE = float(os.getenv("PSYCHAT_SESSION_LEASE", "30"))
+
+# Rendu ReportLab dans un pool de processus, avec cache disque par empreinte du rapport:
+# le texte est publié sans attendre le PDF, que /download attend au besoin
+# (PSYCHAT_PDF_WAIT secondes). Processus forkés à l'import s'il n'y a encore qu'un thread,
+# sinon repris du pool démarré par main.run avant le serveur (pdf_service.prestart).
+pdf_service = PDFRenderService()
+pdf_service.start()
+PDF_WAIT = float(os.getenv("PSYCHAT_PDF_WAIT", "30"))
+
+# Modes d'exécution du crew: 'sequential' (Process.sequential complet), 'pipeline'
+# (dossier structuré au fil des échanges, puis analyse et rédaction seules) ou 'fast'
+# (dossier, synthèse et rapport en une seule génération après l'entretien).
+CREW_MODES = ('sequential', 'pipeline', 'fast')
+CREW_MODE = os.getenv("PSYCHAT_CREW_MODE", DEFAULT_MODE)
+
+# Structuration incrémentale du mode pipeline, en parallèle de l'entretien
+dossier_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PSYCHAT_PIPELINE_WORKERS", "4")), thread_name_prefix="psychat-dossier"
+)
+# Attente maximale (s) des structurations encore en cours à la fin de l'entretien
+PIPELINE_DOSSIER_WAIT = float(os.getenv("PSYCHAT_PIPELINE_DOSSIER_WAIT", "300"))
+
+# Réponses LLM des tâches post-entretien en cache disque (transcriptions identiques:
+# rejeux, démos, reprises); sur demande seulement (PSYCHAT_LLM_CACHE=1): ses entrées
+# contiennent les transcriptions et survivraient au /cleanup des sessions
+llm_cache = LLMResponseCache()
+
+# Passerelle LLM commune à tous les agents: connexions keep-alive partagées, quotas du
+# fournisseur (jetons/requêtes par minute), tours d'entretien prioritaires sur les rapports,
+# bascule sur PSYCHAT_LLM_FALLBACK_MODEL en cas de refus ou de panne
+llm_gateway = LLMGateway.from_env()
+
+# Banque de questions guides (knowledge/ + transcriptions passées): questions d'ouverture
+# servies sans génération, questions candidates proposées à l'interviewer ensuite;
+# désactivable avec PSYCHAT_QUESTION_BANK=0
+question_bank = QuestionBank.from_env()
+
+# Archive des rapports finaux (versions par session, contenu adressé et compressé, index
+# SQLite): consultation par /reports après le nettoyage des sessions; PSYCHAT_REPORT_ARCHIVE=0
+report_archive = ReportArchive()
+
+# Jeton des routes d'administration de l'archive (liste, purge): en-tête
+# `Authorization: Bearer <jeton>`; routes refusées tant qu'il n'est pas défini
+ADMIN_TOKEN = os.getenv("PSYCHAT_ADMIN_TOKEN", "")
+
+# PSYCHAT_FAKE_LLM=1 remplace les LLM par un script local (tests de charge hors ligne)
+fake_llm = llm_factory_from_env()
+
+# Question suivante pré-générée pendant que le patient tape (PSYCHAT_SPECULATIVE=1)
+speculator = Speculator()
+
+def _current_speculation():
+    runtime = sessions.get(current_session())
+    return runtime['speculation'] if runtime is not None else None
+
+def _current_transcript():
+    runtime = sessions.get(current_session())
+    return runtime['transcript'] if runtime is not None else None
+
+def _agent_llm(agent):
+    # Prompt de l'interviewer borné par la transcription de la session (mémoire + derniers tours)
+    llm = llm_gateway.wrap(fake_llm(agent) if fake_llm else agent.llm)
+    if question_bank is not None:
+        llm = question_bank.wrap(llm)
+    llm = BoundedHistoryLLM(llm, _current_transcript)
+    return speculator.wrap(llm_cache.wrap(llm), _current_speculation)
+
+
+# Pool borné de workers pour les crews: les requêtes HTTP ne bloquent plus,
+# les sessions excédentaires attendent leur tour dans la file du planificateur.
+scheduler = SessionScheduler()
+
+# Durées par étape (tâches, outils, appels LLM, attente du patient, PDF) et jauges: /metrics;
+# trace détaillée de chaque session: /trace/<session_id>
+telemetry = Telemetry()
+telemetry.register(pdf_service.render_seconds)
+telemetry.gauge('psychat_sessions_active', "Sessions exécutées par ce worker", lambda: len(sessions))
+telemetry.gauge('psychat_scheduler_sessions', "Sessions du planificateur par état",
+                lambda: {k: scheduler.stats()[k] for k in ('running', 'parked', 'waiting')}, label='state')
+telemetry.gauge('psychat_pdf_renders_in_flight', "Rendus PDF en cours", lambda: pdf_service.stats()['in_progress'])
+telemetry.gauge('psychat_pdf_memory_bytes', "Octets des PDF gardés en mémoire", lambda: pdf_service.stats()['memory_bytes'])
+telemetry.gauge('psychat_pdf_requests_total', "Demandes de PDF par issue",
+                lambda: {k: pdf_service.stats()[k] for k in ('renders', 'hits', 'joined', 'failures')},
+                kind='counter', label='result')
+telemetry.gauge('psychat_llm_cache_total', "Consultations et écritures du cache de réponses LLM",
+                lambda: {k: llm_cache.stats()[k] for k in ('hits', 'misses', 'stores', 'evicted')},
+                kind='counter', label='result')
+telemetry.gauge('psychat_llm_gateway_total', "Bascules, nouveaux essais et saturations de la passerelle LLM",
+                lambda: {k: llm_gateway.stats()[k] for k in ('failovers', 'retries', 'busy')},
+                kind='counter', label='result')
+telemetry.gauge('psychat_llm_gateway_queued', "Appels LLM en attente de capacité, par fournisseur",
+                lambda: {p.name: p.stats()['queued'] for p in llm_gateway.providers}, label='provider')
+telemetry.gauge('psychat_question_bank_total', "Questions d'ouverture servies et tours enrichis par la banque",
+                lambda: {k: question_bank.stats()[k] for k in ('served', 'hinted')} if question_bank else {},
+                kind='counter', label='result')
+telemetry.gauge('psychat_speculation_total', "Pré-générations de la question suivante par issue",
+                lambda: speculator.stats(), kind='counter', label='result')
+telemetry.gauge('psychat_session_evictions_total', "Sessions évincées par motif", lambda: reaper.stats(),
+                kind='counter', label='reason')
+
+# Délai maximal d'attente de la réponse du patient par le tool (secondes)
+ANSWER_TIMEOUT = int(os.getenv("PSYCHAT_ANSWER_TIMEOUT", "60"))
+
+# Intervalle des commentaires keep-alive sur les flux SSE (secondes)
+SSE_HEARTBEAT = 15
+
+# Attente longue de /next?wait=<s>: durée maximale, et scrutation d'une session d'un autre worker
+LONG_POLL_MAX = float(os.getenv("PSYCHAT_LONG_POLL_MAX", "30"))
+LONG_POLL_INTERVAL = 0.5
+
+# Tâches dont la génération est diffusée token par token (mode rapide: section rapport seule)
+REPORT_TASK = 'tache_redaction_rapport_final'
+FAST_REPORT_TASK = 'tache_rapport_rapide'
+
+# --- Outils de l'interviewer servis par le web ---
+# Chaque crew reçoit des instances liées à sa session (voir CrewFactory.instance):
+# la session ne dépend ni du thread ni de la tâche qui exécute l'outil.
+
+def web_ask_patient(session_id: str, question: str) -> str:
+    """Version web de l'outil AskPatientTool avec limite stricte de 10 questions."""
+    runtime = sessions.get(session_id)
+    record = store.get(session_id)
+
+    if runtime is None or record is None:
+        logger.error(f"Session {session_id} non trouvée dans web_ask_patient")
         return "Erreur: session non trouvée"
 
-    # Initialiser le compteur si absent
-    if 'question_count' not in sessions[session_id]:
-        sessions[session_id]['question_count'] = 0
-
     # Si la limite est atteinte, informer l'agent de conclure
-    if sessions[session_id]['question_count'] >= 10:
+    if record['question_count'] >= 10:
         logger.info(f"Session {session_id}: Limite de 10 questions atteinte")
         raise RuntimeError(
             "MAX_QUESTIONS_REACHED: Vous avez atteint 10 questions. "
             "Donnez immédiatement votre Final Answer (la transcription complète) et n'utilisez plus d'outils."
         )
 
-    # Incrémenter le compteur et pousser la question au frontend
-    sessions[session_id]['question_count'] += 1
-    current_num = sessions[session_id]['question_count']
+    # Enregistrer la question (point de reprise) et la publier pour le frontend
+    current_num = record['question_count'] + 1
     logger.info(f"[Session {session_id}] Question {current_num}/10: {question[:80]}")
-    
-    # Mettre la question dans la file d'attente pour que le frontend la récupère
-    sessions[session_id]['question_queue'].put(question)
-    
-    # Attendre que le frontend fournisse une réponse avec timeout
-    try:
-        answer = sessions[session_id]['answer_queue'].get(timeout=60)
-        return answer
-    except queue.Empty:
+    store.record_question(session_id, current_num, question)
+    runtime['events'].publish('question', {'question': question, 'question_number': current_num})
+
+    # Attendre que le frontend fournisse une réponse (via n'importe quel worker) avec timeout;
+    # l'éviction de la session supprime son état et débloque immédiatement cette attente.
+    # Pendant l'attente, la place de travail du crew revient à une autre session.
+    with telemetry.span('patient', 'attente_reponse', session_id, question=current_num), scheduler.parked(session_id):
+        answer = store.wait_answer(session_id, current_num, ANSWER_TIMEOUT)
+    if runtime['speculation'] is not None:
+        runtime['speculation'].answered(answer)
+    if runtime['cancelled'].is_set():
+        raise SessionCancelled(f"Session {session_id} évincée")
+    if answer is None:
         logger.error(f"Timeout en attendant la réponse pour session {session_id}")
+        store.update(session_id, question=None, status='running')
         return "Pas de réponse reçue"
+    transcript = runtime['transcript']
+    transcript.add(current_num, question, answer)
+    # Mode pipeline: l'échange est structuré pendant que l'agent prépare la question suivante
+    if runtime['dossier'] is not None:
+        runtime['dossier'].add_exchange(current_num, question, clip(answer, transcript.answer_budget))
+    return answer
+
+def web_analyze_response(session_id: str, patient_response: str, conversation_context: str = "") -> str:
+    """Analyse locale de la réponse, couverture calculée sur la transcription de la session."""
+    runtime = sessions.get(session_id)
+    if runtime is not None:
+        # L'agent n'a pas à recopier les échanges précédents dans l'appel de l'outil
+        conversation_context = runtime['transcript'].answers()
+    return format_analysis(analyze(patient_response, conversation_context))
+
+# Configs YAML des agents/tâches parsées et validées une fois (rechargées si modifiées)
+crew_factory = CrewFactory(llm_factory=_agent_llm, tool_handlers={
+    AskPatientTool: web_ask_patient,
+    AnalyzePatientResponseTool: web_analyze_response,
+})
+
+
+# --- Diffusion du rapport final token par token ---
+# Le bus d'événements CrewAI appelle les handlers dans le contexte du crew,
+# lié à sa session (voir SessionScheduler et session_context.py).
+
+def _current_session_id():
+    session_id = current_session()
+    return session_id if session_id in sessions else None
+
+@crewai_event_bus.on(LLMCallStartedEvent)
+def _on_llm_call_started(source, event):
+    telemetry.start('llm', event.task_name or 'inconnue', _current_session_id())
+    session = sessions.get(current_session())
+    if session is not None and event.task_name == REPORT_TASK:
+        session['report_filter'] = FinalAnswerFilter()
+    elif session is not None and event.task_name == FAST_REPORT_TASK:
+        session['report_filter'] = FinalAnswerFilter(REPORT_SEPARATOR)
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _on_llm_stream_chunk(source, event):
+    session = sessions.get(current_session())
+    if session is None or event.task_name not in (REPORT_TASK, FAST_REPORT_TASK) or event.tool_call:
+        return
+    text = session['report_filter'].feed(event.chunk)
+    if text:
+        session['events'].publish('report_chunk', {'text': text})
+
+
+# --- Spans des tâches, outils et appels LLM (mêmes threads que les handlers ci-dessus) ---
+
+@crewai_event_bus.on(LLMCallCompletedEvent)
+def _on_llm_call_completed(source, event):
+    telemetry.finish('llm')
+
+@crewai_event_bus.on(LLMCallFailedEvent)
+def _on_llm_call_failed(source, event):
+    telemetry.finish('llm', 'error')
+
+@crewai_event_bus.on(TaskStartedEvent)
+def _on_task_started(source, event):
+    telemetry.start('task', getattr(event.task, 'name', None) or 'inconnue', _current_session_id())
+
+@crewai_event_bus.on(TaskCompletedEvent)
+def _on_task_completed(source, event):
+    telemetry.finish('task')
+
+@crewai_event_bus.on(TaskFailedEvent)
+def _on_task_failed(source, event):
+    telemetry.finish('task', 'error')
+
+@crewai_event_bus.on(ToolUsageStartedEvent)
+def _on_tool_started(source, event):
+    telemetry.start('tool', event.tool_name, _current_session_id())
+
+@crewai_event_bus.on(ToolUsageFinishedEvent)
+def _on_tool_finished(source, event):
+    telemetry.finish('tool')
+
+@crewai_event_bus.on(ToolUsageErrorEvent)
+def _on_tool_error(source, event):
+    telemetry.finish('tool', 'error')
+
+
+def _new_runtime(session_id):
+    """Objets d'exécution locaux d'une session."""
+    return {
+        'events': SessionEvents(),
+        'report_filter': FinalAnswerFilter(),
+        'cancelled': threading.Event(),
+        'dossier': None,   # IncrementalDossier en mode pipeline
+        'speculation': speculator.session(session_id),   # None si la pré-génération est désactivée
+        'transcript': Transcript(),   # échanges Q/R et contextes bornés des agents
+        'created': time.perf_counter(),
+    }
+
+
+def discard_session(session_id, reason='cleanup'):
+    """Libère tout ce que retient une session: crew, état, PDF temporaire, journal SSE.
+
+    Les rapports archivés ne sont pas touchés: ils ne partent qu'à expiration
+    (reaper) ou par une purge d'administration (DELETE /reports/<session_id>).
+    """
+    runtime = sessions.pop(session_id, None)
+    if runtime is not None:
+        # Annulation coopérative: le crew s'arrête à sa prochaine étape
+        runtime['cancelled'].set()
+        if runtime['speculation'] is not None:
+            runtime['speculation'].close()
+        # Une session encore en file d'attente n'occupera jamais de worker
+        scheduler.cancel(session_id)
+
+    record = store.get(session_id)
+    if record is not None:
+        store.delete(session_id)
+        # PDF en cache partagé par empreinte (report_file): oublié s'il ne sert plus à aucune session
+        # (un rendu encore en cours sera supprimé à sa fin, voir _on_pdf_rendered)
+        report_file = record['report_file']
+        if report_file and report_file not in {r['report_file'] for r in store.list_sessions()}:
+            pdf_service.discard(report_file)
+        logger.info(f"Session {session_id} supprimée ({reason})")
+
+    telemetry.discard(session_id)
+    if runtime is not None:
+        if reason != 'cleanup':
+            runtime['events'].publish('error', {'error': 'Session expirée'})
+        runtime['events'].close()
+
+
+def _session_state(session_id):
+    """Construit la réponse non bloquante décrivant l'état courant d'une session."""
+    record = store.get(session_id)
+    if record is None:
+        return None
+    status = record['status']
+
+    if status == 'queued':
+        return {'session_id': session_id, 'status': 'pending', 'position': scheduler.position(session_id)}
+    if status == 'awaiting_answer' and record['question'] is not None:
+        return {
+            'session_id': session_id,
+            'status': 'question',
+            'question': record['question'],
+            'question_number': record['question_count'],
+        }
+    if status == 'finished':
+        return {'session_id': session_id, 'status': 'finished', 'report': record['result']}
+    if status == 'error':
+        return {'session_id': session_id, 'status': 'error', 'error': record['error']}
+    return {'session_id': session_id, 'status': 'pending'}
+
 
-# On remplace la méthode originale par notre version web
-AskPatientTool._run = web_ask_patient_run
+def _format_history(transcript):
+    """Bloc de reprise injecté dans la tâche d'entretien ({historique}), réponses tronquées."""
+    if not transcript.resumed:
+        return ""
+    return (
+        f"REPRISE D'ENTRETIEN : les {transcript.resumed} premiers échanges ont déjà eu lieu. "
+        f"Ne les reposez pas, poursuivez à partir de la question {transcript.resumed + 1} "
+        "et incluez-les dans la transcription finale.\n" + transcript.render()
+    )
 
 
 # --- Routes de l'API ---
@@ -85,132 +398,227 @@ def index():
     """Sert la page HTML principale."""
     return render_template('index.html')
 
-@app.route('/start', methods=['POST'])
-def start_crew():
-    """Démarre une nouvelle session de crew."""
+# Logique des routes partagée par le serveur WSGI (Flask) et le mode ASGI (asgi.py):
+# chaque fonction renvoie (corps JSON, code HTTP).
+
+def start_session(topic, mode):
+    """Crée une session et la confie au planificateur sans attendre la première question."""
     try:
+        mode = mode or CREW_MODE
+        if mode not in CREW_MODES:
+            return {'error': f"Mode inconnu: {mode} (attendu: {', '.join(CREW_MODES)})"}, 400
         session_id = str(uuid.uuid4())
-        topic = request.json.get('topic', 'Consultation générale')
-
-        logger.info(f"Démarrage de session {session_id} avec topic: {topic}")
-
-        sessions[session_id] = {
-            'question_queue': queue.Queue(),
-            'answer_queue': queue.Queue(),
-            'thread': None,
-            'result': None,
-            'report_file': None,
-            'question_count': 0,
-            'status': 'starting'
-        }
+        logger.info(f"Démarrage de session {session_id} avec topic: {topic} (mode {mode})")
 
-        # Lancer le crew dans un thread séparé
-        thread = threading.Thread(
-            target=run_crew_for_session,
-            args=(session_id, topic),
-            name=session_id,
-            daemon=True  # Le thread se termine quand le processus principal se termine
-        )
-        sessions[session_id]['thread'] = thread
-        thread.start()
+        store.create(session_id, topic, owner=OWNER, lease=SESSION_LEASE, mode=mode)
+        sessions[session_id] = _new_runtime(session_id)
 
-        # Attendre la première question
         try:
-            first_question = sessions[session_id]['question_queue'].get(timeout=30)
-            sessions[session_id]['status'] = 'active'
-            return jsonify({
-                'session_id': session_id,
-                'question': first_question
-            })
-        except queue.Empty:
-            logger.error(f"Timeout en attendant la première question pour session {session_id}")
-            return jsonify({'error': 'Timeout en attendant la première question'}), 500
+            scheduler.submit(session_id, run_crew_for_session, session_id, topic)
+        except SchedulerFull as e:
+            del sessions[session_id]
+            store.delete(session_id)
+            logger.warning(f"Session {session_id} refusée: {e}")
+            return {'error': 'Serveur saturé, veuillez réessayer dans quelques instants'}, 503
+
+        return _session_state(session_id), 202
 
     except Exception as e:
         logger.error(f"Erreur lors du démarrage: {str(e)}")
-        return jsonify({'error': f'Erreur lors du démarrage: {str(e)}'}), 500
+        return {'error': f'Erreur lors du démarrage: {str(e)}'}, 500
+
+
+def submit_answer(session_id, answer):
+    """Transmet la réponse du patient à l'agent et rend la main immédiatement."""
+    logger.info(f"Réponse reçue pour session {session_id}: {str(answer)[:50]}...")
+
+    # Fournir la réponse à l'agent qui attend; la question suivante arrivera via /next
+    if not store.submit_answer(session_id, answer):
+        if store.get(session_id) is None:
+            logger.error(f"Session invalide: {session_id}")
+            return {'error': 'Session invalide'}, 400
+        return {'error': 'Aucune question en attente de réponse'}, 409
+
+    return _session_state(session_id), 202
+
+
+def propose_partial(session_id, partial, number):
+    """Texte partiel de la réponse en cours de saisie: pré-génère la question suivante."""
+    record = store.get(session_id)
+    if record is None:
+        return {'error': 'Session invalide'}, 400
+    runtime = sessions.get(session_id)
+    # Pré-génération dans le worker qui exécute le crew, pour la question encore en attente
+    speculating = (
+        runtime is not None
+        and runtime['speculation'] is not None
+        and record['status'] == 'awaiting_answer'
+        and number in (None, record['question_count'])
+        and runtime['speculation'].propose(partial or '')
+    )
+    return {'speculating': speculating}, 202
+
+
+def parse_wait(raw):
+    """Durée de `?wait=<s>` (0 si absente); ValueError si elle n'est pas un nombre fini positif."""
+    wait = float(raw or 0)
+    if not math.isfinite(wait) or wait < 0:
+        raise ValueError(f"wait invalide: {raw}")
+    return wait
+
+
+def parse_last_event_id(raw):
+    """Dernier événement SSE reçu par le client (`Last-Event-ID`); 0 si absent ou invalide."""
+    try:
+        return max(int(raw or 0), 0)
+    except ValueError:
+        return 0
+
+
+def wait_state(session_id, wait):
+    """État de la session, en attendant au plus `wait` secondes qu'il ne soit plus 'pending'.
+
+    Bloque le thread de la requête: en attente longue, préférer le mode ASGI ou /stream.
+    """
+    deadline = time.monotonic() + min(wait, LONG_POLL_MAX)
+    while True:
+        runtime = sessions.get(session_id)
+        # Identifiant relevé avant l'état: un événement publié entre les deux réveille l'attente
+        after = runtime['events'].last_id if runtime is not None else 0
+        state = _session_state(session_id)
+        remaining = deadline - time.monotonic()
+        if state is None or state['status'] != 'pending' or remaining <= 0:
+            return state
+        if runtime is not None:
+            runtime['events'].wait(after, remaining)
+        else:
+            # Session exécutée par un autre worker: scrutation du stockage partagé
+            time.sleep(min(LONG_POLL_INTERVAL, remaining))
+
+
+@app.route('/start', methods=['POST'])
+def start_crew():
+    body, status = start_session(request.json.get('topic', 'Consultation générale'), request.json.get('mode'))
+    return jsonify(body), status
 
 
 @app.route('/chat', methods=['POST'])
 def handle_chat():
-    """Reçoit la réponse de l'utilisateur et renvoie la question suivante."""
-    session_id = request.json.get('session_id')
-    answer = request.json.get('answer')
+    body, status = submit_answer(request.json.get('session_id'), request.json.get('answer'))
+    return jsonify(body), status
 
-    logger.info(f"Réponse reçue pour session {session_id}: {str(answer)[:50]}...")
-    
-    if session_id not in sessions:
-        logger.error(f"Session invalide: {session_id}")
-        return jsonify({'error': 'Session invalide'}), 400
 
-    # Fournir la réponse à l'agent qui attend
-    sessions[session_id]['answer_queue'].put(answer)
+@app.route('/typing', methods=['POST'])
+def typing():
+    body, status = propose_partial(
+        request.json.get('session_id'), request.json.get('partial'), request.json.get('question_number')
+    )
+    return jsonify(body), status
+
 
-    # Attendre la question suivante ou le résultat final
+@app.route('/next/<session_id>')
+def next_step(session_id):
+    """Question en attente, rapport final ou 'pending'; `?wait=<s>`: attente longue (long-poll)."""
     try:
-        next_question = sessions[session_id]['question_queue'].get(timeout=120)  # Augmenté le timeout
-        if next_question is None:
-            # Le crew a terminé
-            logger.info(f"Crew terminé pour session {session_id}")
-            sessions[session_id]['thread'].join()  # S'assurer que le thread est terminé
-            final_report = sessions[session_id]['result']
-
-            logger.info(f"Rapport final généré pour session {session_id}: {len(str(final_report))} caractères")
-
-            # Générer le PDF moderne
-            if final_report:
-                pdf_file = pdf_generator.generate_pdf(str(final_report), session_id)
-                if pdf_file:
-                    sessions[session_id]['report_file'] = pdf_file
-                    logger.info(f"PDF moderne généré: {pdf_file}")
-                else:
-                    logger.error("Erreur lors de la génération du PDF")
-
-            return jsonify({'report': str(final_report), 'session_id': session_id})
-        else:
-            logger.info(f"Question suivante pour session {session_id}: {next_question[:50]}...")
-        return jsonify({'question': next_question})
-    except queue.Empty:
-        logger.error(f"Timeout pour la question suivante de session {session_id}")
-        # Si plus de questions, le crew a probablement fini.
-        sessions[session_id]['thread'].join()  # S'assurer que le thread est terminé
-        final_report = sessions[session_id]['result']
-
-        logger.info(f"Rapport final (timeout) pour session {session_id}: {len(str(final_report))} caractères")
-
-        # Générer le PDF moderne
-        if final_report:
-            pdf_file = pdf_generator.generate_pdf(str(final_report), session_id)
-            if pdf_file:
-                sessions[session_id]['report_file'] = pdf_file
-                logger.info(f"PDF moderne généré (timeout): {pdf_file}")
-            else:
-                logger.error("Erreur lors de la génération du PDF (timeout)")
-
-        return jsonify({'report': str(final_report), 'session_id': session_id})
+        wait = parse_wait(request.args.get('wait'))
+    except ValueError:
+        return jsonify({'error': 'Paramètre wait invalide'}), 400
+    state = wait_state(session_id, wait)
+    if state is None:
+        return jsonify({'error': 'Session invalide'}), 400
+    return jsonify(state)
 
-@app.route('/download/<session_id>')
-def download_report(session_id):
-    """Télécharge le rapport PDF généré."""
+@app.route('/stream/<session_id>')
+def stream_session(session_id):
+    """Flux SSE: questions, progression des tâches, fragments puis texte complet du rapport."""
+    if session_id not in sessions:
+        if store.get(session_id) is not None:
+            # Le journal d'événements vit dans le worker qui exécute le crew
+            return jsonify({'error': 'Flux indisponible sur ce worker, utilisez /next'}), 409
+        return jsonify({'error': 'Session invalide'}), 400
+
+    events = sessions[session_id]['events']
+    last_id = parse_last_event_id(request.headers.get('Last-Event-ID') or request.args.get('last_event_id'))
+
+    def generate():
+        after = last_id
+        # Indique au navigateur le délai de reconnexion automatique
+        yield "retry: 3000\n\n"
+        while True:
+            batch = events.wait(after, timeout=SSE_HEARTBEAT)
+            if not batch:
+                if events.closed:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event, data in batch:
+                after = event_id
+                yield format_sse(event_id, event, data)
+                if event in ('done', 'error'):
+                    return
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+
+
+def report_for_download(session_id):
+    """Rapport terminé d'une session, ou (corps JSON, code HTTP) de l'erreur."""
     logger.info(f"Demande de téléchargement PDF pour session {session_id}")
 
-    if session_id not in sessions:
+    record = store.get(session_id)
+    if record is None:
         logger.error(f"Session invalide pour téléchargement: {session_id}")
-        return jsonify({'error': 'Session invalide'}), 400
+        return None, ({'error': 'Session invalide'}, 400)
 
-    report_file = sessions[session_id].get('report_file')
-    if not report_file or not os.path.exists(report_file):
-        logger.error(f"Fichier PDF non trouvé: {report_file}")
+    if record['status'] != 'finished' or not record['result']:
+        logger.error(f"Rapport non terminé pour session {session_id}")
+        return None, ({'error': 'Rapport PDF non disponible'}, 404)
+    return record['result'], None
+
+
+@app.route('/download/<session_id>')
+def download_report(session_id):
+    """Télécharge le rapport PDF généré."""
+    report, error = report_for_download(session_id)
+    if error is not None:
+        return jsonify(error[0]), error[1]
+
+    # ETag = empreinte du rapport: un nouveau téléchargement du même rapport ne coûte qu'un 304
+    etag = pdf_service.key(report)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    # En cache: immédiat; en cours de rendu: on l'attend; évincé du cache: nouveau rendu
+    try:
+        pdf = pdf_service.submit(report).result(timeout=PDF_WAIT)
+    except FutureTimeout:
+        return jsonify({'error': 'Rapport PDF en cours de génération, réessayez'}), 503
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération du PDF: {str(e)}")
         return jsonify({'error': 'Rapport PDF non disponible'}), 404
 
     try:
-        logger.info(f"Téléchargement du PDF: {report_file}")
-        return send_file(
-            report_file,
-            as_attachment=True,
-            download_name=f'rapport_psychiatrique_{session_id[:8]}.pdf',
-            mimetype='application/pdf'
-        )
+        download_name = f'rapport_psychiatrique_{session_id[:8]}.pdf'
+        logger.info(f"Téléchargement du PDF {pdf.key[:12]} ({pdf.size} octets)")
+        if pdf.data is not None:
+            # Rapport de taille courante: servi depuis la mémoire, Content-Length connu
+            response = Response(pdf.data, mimetype='application/pdf')
+            response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+        else:
+            response = send_file(
+                pdf.path,
+                as_attachment=True,
+                download_name=download_name,
+                mimetype='application/pdf',
+                etag=False,
+            )
+        response.set_etag(pdf.key, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response.make_conditional(request)
     except Exception as e:
         logger.error(f"Erreur lors du téléchargement PDF: {str(e)}")
         return jsonify({'error': f'Erreur lors du téléchargement: {str(e)}'}), 500
@@ -219,37 +627,347 @@ def download_report(session_id):
 def cleanup_session(session_id):
     """Nettoie les fichiers temporaires d'une session."""
     logger.info(f"Nettoyage de la session {session_id}")
-
-    if session_id in sessions:
-        report_file = sessions[session_id].get('report_file')
-        if report_file and os.path.exists(report_file):
-            try:
-                os.unlink(report_file)
-                logger.info(f"Fichier PDF temporaire supprimé: {report_file}")
-            except Exception as e:
-                logger.error(f"Erreur lors de la suppression du fichier: {str(e)}")
-        del sessions[session_id]
-        logger.info(f"Session {session_id} supprimée")
+    discard_session(session_id)
     return jsonify({'success': True})
 
 
-def run_crew_for_session(session_id, topic):
-    """Fonction exécutée dans le thread pour faire tourner le crew."""
+# Préchauffage après l'ouverture du port (voir medical_report/warmup.py): agents et tâches
+# construits une fois, ReportLab, styles et logo chargés ici et dans les processus de rendu
+warmup_state = {}
+_warmup_lock = threading.Lock()
+
+def warm_up():
+    with _warmup_lock:
+        if warmup_state:
+            return
+        started = time.perf_counter()
+        crew_factory.instance()
+        crew_done = time.perf_counter()
+        pdf_service.warm_up()
+        warmup_state.update(crew_s=round(crew_done - started, 3), pdf_s=round(time.perf_counter() - crew_done, 3))
+    logger.info(f"Préchauffage terminé: {warmup_state}")
+
+
+@app.route('/ready')
+def ready():
+    """Sonde de disponibilité: l'application répond (préchauffage éventuellement en cours)."""
+    return jsonify({'ready': True, 'warm': bool(warmup_state)})
+
+
+@app.route('/stats')
+def stats():
+    """Occupation du planificateur et compteurs d'éviction des sessions."""
+    return jsonify({
+        'scheduler': scheduler.stats(),
+        'local_sessions': len(sessions),
+        'evictions': reaper.stats(),
+        'pdf': pdf_service.stats(),
+        'llm_cache': llm_cache.stats(),
+        'speculation': speculator.stats(),
+        'llm_gateway': llm_gateway.stats(),
+        'question_bank': question_bank.stats() if question_bank else None,
+        'report_archive': report_archive.stats(),
+        'warmup': warmup_state,
+    })
+
+
+@app.route('/metrics')
+def metrics():
+    """Histogrammes des étapes et jauges au format texte Prometheus."""
+    return Response(telemetry.render(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/trace/<session_id>')
+def session_trace(session_id):
+    """Spans d'une session de ce worker (tâches, outils, appels LLM, attentes, PDF)."""
+    trace = telemetry.trace(session_id)
+    if trace is None:
+        return jsonify({'error': 'Aucune trace pour cette session'}), 404
+    return jsonify({'session_id': session_id, 'spans': trace})
+
+
+def _admin_error():
+    """(corps JSON, code HTTP) si la requête ne porte pas le jeton d'administration, sinon None."""
+    if not ADMIN_TOKEN:
+        return {'error': "Routes d'administration désactivées (PSYCHAT_ADMIN_TOKEN)"}, 403
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+        return {'error': 'Accès refusé'}, 401
+    return None
+
+
+@app.route('/reports')
+def list_reports():
+    """Rapports archivés, les plus récents d'abord (administration; filtres: topic, since, until en secondes epoch, limit)."""
+    error = _admin_error()
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    try:
+        since = float(request.args['since']) if request.args.get('since') else None
+        until = float(request.args['until']) if request.args.get('until') else None
+        limit = min(int(request.args.get('limit') or 50), 500)
+    except ValueError:
+        return jsonify({'error': 'Paramètres de recherche invalides'}), 400
+    entries = report_archive.list(request.args.get('topic'), since, until, limit)
+    return jsonify({'reports': [entry.as_dict() for entry in entries]})
+
+
+@app.route('/reports/<session_id>', methods=['DELETE'])
+def purge_reports(session_id):
+    """Efface toutes les versions archivées d'une session (administration)."""
+    error = _admin_error()
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    deleted = report_archive.delete(session_id)
+    logger.info(f"Archive purgée pour session {session_id}: {deleted} version(s)")
+    return jsonify({'deleted': deleted})
+
+
+def _archived(session_id):
+    """Version archivée demandée (?version=, par défaut la dernière), ou (corps JSON, code HTTP).
+
+    Routes d'administration: l'identifiant de session, connu du navigateur, ne doit pas
+    devenir un accès permanent aux rapports une fois la session terminée.
+    """
+    error = _admin_error()
+    if error is not None:
+        return None, error
+    version = request.args.get('version')
+    if version is not None and not version.isdigit():
+        return None, ({'error': 'Version invalide'}, 400)
+    entry = report_archive.get(session_id, int(version) if version else None)
+    if entry is None:
+        return None, ({'error': 'Aucun rapport archivé pour cette session'}, 404)
+    return entry, None
+
+
+def _archived_error(session_id, e):
+    """(corps JSON, code HTTP) pour un contenu d'archive manquant ou illisible."""
+    logger.error(f"Rapport archivé illisible pour session {session_id}: {e}")
+    if isinstance(e, FileNotFoundError):
+        return {'error': 'Contenu du rapport archivé introuvable'}, 404
+    return {'error': 'Rapport archivé illisible'}, 500
+
+
+@app.route('/reports/<session_id>')
+def archived_report(session_id):
+    """Rapport markdown archivé d'une session et liste de ses versions."""
+    entry, error = _archived(session_id)
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    try:
+        report = report_archive.markdown(entry)
+    except (OSError, ValueError) as e:
+        error = _archived_error(session_id, e)
+        return jsonify(error[0]), error[1]
+    return jsonify({
+        **entry.as_dict(),
+        'report': report,
+        'versions': [v.version for v in report_archive.versions(session_id)],
+    })
+
+
+@app.route('/reports/<session_id>/pdf')
+def archived_report_pdf(session_id):
+    """PDF archivé d'une version du rapport."""
+    entry, error = _archived(session_id)
+    if error is not None:
+        return jsonify(error[0]), error[1]
+    if entry.pdf_key is None:
+        return jsonify({'error': 'Rapport PDF non archivé pour cette version'}), 404
     try:
-        logger.info(f"Démarrage du crew pour session {session_id} avec topic: {topic}")
-        crew = MedicalReportCrew().crew()
-        result = crew.kickoff(inputs={'topic': topic})
-        sessions[session_id]['result'] = result
-        logger.info(f"Crew terminé pour session {session_id}, résultat: {len(str(result))} caractères")
-        # Mettre un signal de fin dans la file d'attente au cas où le frontend attendrait toujours
-        sessions[session_id]['question_queue'].put(None) 
+        pdf = report_archive.pdf(entry)
+    except (OSError, ValueError) as e:
+        error = _archived_error(session_id, e)
+        return jsonify(error[0]), error[1]
+    response = Response(pdf, mimetype='application/pdf')
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename="rapport_psychiatrique_{session_id[:8]}_v{entry.version}.pdf"'
+    )
+    # Contenu adressé: une version archivée ne change jamais
+    response.set_etag(entry.pdf_key)
+    return response.make_conditional(request)
+
+
+def run_crew_for_session(session_id, topic, resume=False):
+    """Fonction exécutée par un worker du planificateur pour faire tourner le crew."""
+    session = sessions.get(session_id)
+    record = store.get(session_id)
+    if session is None or record is None:
+        # Session nettoyée pendant qu'elle attendait un worker
+        return
+    events = session['events']
+    telemetry.record('session', 'file_attente', time.perf_counter() - session['created'], session_id)
+    crew_started = time.perf_counter()
+    try:
+        store.update(session_id, status='running')
+        events.publish('status', {'status': 'running'})
+        history = store.exchanges(session_id) if resume else []
+        transcript = session['transcript']
+        for ex in history:
+            transcript.add(ex['number'], ex['question'], ex['answer'])
+        transcript.resumed = len(history)
+        inputs = {'topic': topic, 'historique': _format_history(transcript)}
+        logger.info(f"Démarrage du crew pour session {session_id} avec topic: {topic} (mode {record['mode']})")
+        completed = []
+
+        def check_cancelled(_step=None):
+            if session['cancelled'].is_set():
+                raise SessionCancelled(f"Session {session_id} évincée")
+
+        def on_task_done(output):
+            check_cancelled()
+            if output.name == INTERVIEW_TASK and len(transcript):
+                # Contexte des tâches suivantes: transcription enregistrée, de taille bornée,
+                # plutôt que celle recopiée par l'interviewer
+                output.raw = transcript.render()
+            completed.append(output.name)
+            events.publish('progress', {'task': output.name, 'step': len(completed), 'total': total_tasks})
+
+        def kickoff(crew, crew_inputs):
+            crew.step_callback = check_cancelled
+            crew.task_callback = on_task_done
+            return crew.kickoff(inputs=crew_inputs)
+
+        if record['mode'] == 'pipeline':
+            instance = crew_factory.instance(session_id)
+            interview = instance.interview_crew()
+            total_tasks = len(interview.tasks) + 3  # structuration, analyse, rédaction
+            dossier = IncrementalDossier(instance, topic, dossier_executor)
+            for ex in transcript.exchanges():
+                dossier.add_exchange(ex.number, ex.question, clip(ex.answer, transcript.answer_budget))
+            session['dossier'] = dossier
+            kickoff(interview, inputs)
+            with telemetry.span('pipeline', 'attente_dossier', session_id):
+                structured = dossier.dossier(timeout=PIPELINE_DOSSIER_WAIT)
+            report_crew = instance.report_crew(structured)
+            # Structuration terminée: sa sortie, fournie d'avance au crew de rapport, compte comme une étape
+            on_task_done(instance.tache_structuration_dossier().output)
+            result = kickoff(report_crew, inputs)
+        elif record['mode'] == 'fast':
+            crew = crew_factory.instance(session_id).fast_report_crew()
+            total_tasks = len(crew.tasks)
+            # Dossier et synthèse servent à la rédaction; seul le rapport est publié
+            result = split_fast_report(str(kickoff(crew, inputs)))['rapport']
+        else:
+            crew = crew_factory.build(session_id)
+            total_tasks = len(crew.tasks)
+            result = kickoff(crew, inputs)
+        report = str(result)
+        logger.info(f"Crew terminé pour session {session_id}, résultat: {len(report)} caractères")
+        telemetry.record('session', 'crew', time.perf_counter() - crew_started, session_id)
+
+        # Le rapport texte est disponible tout de suite; le PDF est rendu à part
+        store.update(session_id, result=report, question=None, status='finished')
+        events.publish('report', {'report': report})
+        _archive_report(session_id, topic, report, record['mode'])
+        submitted = time.perf_counter()
+        pdf_service.submit(report).add_done_callback(
+            lambda future: _on_pdf_rendered(session_id, report, future, submitted)
+        )
     except Exception as e:
+        if session['cancelled'].is_set():
+            logger.info(f"Crew annulé pour session {session_id}")
+            telemetry.discard(session_id)
+            return
         logger.error(f"Erreur dans le crew pour session {session_id}: {str(e)}")
-        # En cas d'erreur, on met un message d'erreur dans la file d'attente
         error_message = f"Une erreur est survenue pendant l'exécution du crew: {e}"
-        sessions[session_id]['question_queue'].put(error_message)
-        sessions[session_id]['result'] = error_message
+        store.update(session_id, result=error_message, error=error_message, question=None, status='error')
+        events.publish('error', {'error': error_message})
+        telemetry.record('session', 'crew', time.perf_counter() - crew_started, session_id, status='error')
+        telemetry.dump(session_id)
+
+
+def _on_pdf_rendered(session_id, report, future, submitted):
+    """Fin du rendu PDF d'une session (thread du pool de rendu)."""
+    pdf = None if future.exception() is not None else future.result()
+    telemetry.record('pdf', 'rendu', time.perf_counter() - submitted, session_id, status='ok' if pdf else 'error')
+    if pdf:
+        # Avant tout le reste: la session peut être nettoyée dès la fin du téléchargement,
+        # et son PDF n'est oublié du cache qu'une fois report_file enregistré plus bas
+        _archive_pdf(session_id, report, pdf)
+    if store.get(session_id) is None:
+        # Session nettoyée pendant le rendu
+        pdf_service.discard(pdf.key if pdf else None)
+        telemetry.discard(session_id)
+        return
+    if pdf:
+        logger.info(f"PDF moderne généré: {pdf.key[:12]} ({pdf.size} octets, {'mémoire' if pdf.data else 'disque'})")
+        # report_file: empreinte du PDF dans le cache de rendu (ETag de /download)
+        store.update(session_id, report_file=pdf.key)
+    else:
+        logger.error("Erreur lors de la génération du PDF")
+    telemetry.dump(session_id)
+    session = sessions.get(session_id)
+    if session is not None:
+        session['events'].publish('done', {'status': 'finished', 'pdf': bool(pdf)})
+
+
+def _archive_report(session_id, topic, report, mode):
+    """Nouvelle version du rapport dans l'archive; un échec d'archivage n'interrompt pas la session."""
+    try:
+        entry = report_archive.add(session_id, topic, report, mode)
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Archivage du rapport impossible pour session {session_id}: {str(e)}")
+        return
+    if entry is not None:
+        logger.info(f"Rapport archivé: session {session_id}, version {entry.version} ({entry.markdown_key[:12]})")
+
+
+def _archive_pdf(session_id, report, pdf):
+    """Rattache le PDF rendu à la version archivée de son rapport."""
+    if not report_archive.enabled:
+        return
+    try:
+        if pdf.data is not None:
+            data = pdf.data
+        else:
+            with open(pdf.path, 'rb') as f:
+                data = f.read()
+        report_archive.attach_pdf(session_id, report, data)
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"Archivage du PDF impossible pour session {session_id}: {str(e)}")
+
+
+# --- Baux et reprise des sessions interrompues ---
+
+def resume_expired_sessions():
+    """Reprend les sessions non terminées dont le worker propriétaire a disparu."""
+    for session_id in store.expired():
+        if session_id in sessions or not store.claim(session_id, OWNER, SESSION_LEASE):
+            continue
+        record = store.get(session_id)
+        if record is None:
+            continue
+        # La question restée sans réponse sera reformulée par l'agent
+        store.discard_pending(session_id)
+        answered = store.exchanges(session_id)
+        store.update(session_id, status='queued', question=None, question_count=len(answered))
+        sessions[session_id] = _new_runtime(session_id)
+        try:
+            scheduler.submit(session_id, run_crew_for_session, session_id, record['topic'], True)
+        except SchedulerFull:
+            # Le bail expirera de nouveau: un worker moins chargé reprendra la session
+            del sessions[session_id]
+            break
+        logger.info(f"Reprise de la session {session_id} à partir de la question {len(answered) + 1}")
+
+
+def _session_heartbeat():
+    while True:
+        try:
+            store.renew(OWNER, list(sessions), SESSION_LEASE)
+            resume_expired_sessions()
+        except Exception as e:
+            logger.error(f"Erreur lors du renouvellement des baux de session: {str(e)}")
+        time.sleep(SESSION_LEASE / 3)
+
+threading.Thread(target=_session_heartbeat, name="psychat-heartbeat", daemon=True).start()
+
+# Éviction des sessions abandonnées (inactivité, âge maximal, plafond LRU)
+reaper = SessionReaper(store, evict=discard_session, local_sessions=lambda: list(sessions), archive=report_archive)
+reaper.start()
 
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5001)
\ No newline at end of file
+    app.run(debug=True, port=5001)
@@ -0,0 +1,230 @@
+# Fichier : asgi.py (mode ASGI de l'application web)
+"""Mode ASGI: mêmes routes, même état et mêmes crews que app.py, servis par uvicorn.
+
+Les attentes ne retiennent aucun thread: la question suivante (`/next?wait=<s>`), le flux
+SSE (`/stream`) et le PDF (`/download`) sont attendus sur des futures asyncio réveillées
+par le journal d'événements de la session ou par le service de rendu. Des milliers de
+connexions inactives coûtent des sockets, pas des threads. Les courts accès au stockage
+des sessions passent par un pool borné (PSYCHAT_ASGI_THREADS); les autres routes (page
+d'accueil, /stats, /metrics, /trace, /reports, /ready) sont servies par l'application Flask.
+
+Routage, CORS et réponses sont ceux de Starlette; la logique des routes (paramètres,
+états, erreurs) est celle de app.py, partagée avec le serveur Flask.
+
+Usage: uvicorn asgi:app --port 5001   (ou PSYCHAT_SERVER=asgi uv run run_crew)
+"""
+import asyncio
+import contextlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.types import Receive, Scope, Send
+from uvicorn.middleware.wsgi import WSGIMiddleware
+from werkzeug.http import parse_etags
+
+import app as web
+from medical_report.events import format_sse
+
+logger = logging.getLogger(__name__)
+
+# Accès courts et bloquants (stockage des sessions, planificateur, clé du PDF)
+_blocking = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PSYCHAT_ASGI_THREADS", "16")), thread_name_prefix="psychat-asgi"
+)
+
+# Routes Flask restantes, exécutées dans un pool de threads borné
+_flask = WSGIMiddleware(web.app, workers=int(os.getenv("PSYCHAT_ASGI_WSGI_THREADS", "8")))
+
+# Préchauffage de l'application (appelé par medical_report.warmup.LazyASGI après l'import)
+warm_up = web.warm_up
+
+
+async def _flask_routes(scope: Scope, receive: Receive, send: Send) -> None:
+    """Application Flask; ses en-têtes CORS sont retirés, le middleware Starlette pose les siens."""
+    async def send_without_cors(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            headers = [(k.lower(), v) for k, v in message.get("headers", [])]
+            message = {**message, "headers": [(k, v) for k, v in headers if not k.startswith(b"access-control-")]}
+        await send(message)
+
+    await _flask(scope, receive, send_without_cors)
+
+
+async def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    return await asyncio.get_running_loop().run_in_executor(_blocking, fn, *args)
+
+
+async def _json_body(request: Request) -> Dict[str, Any]:
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    return data if isinstance(data, dict) else {}
+
+
+# ---------------- Routes ----------------
+async def start(request: Request) -> Response:
+    data = await _json_body(request)
+    body, status = await _run(web.start_session, data.get("topic", "Consultation générale"), data.get("mode"))
+    return JSONResponse(body, status)
+
+
+async def chat(request: Request) -> Response:
+    data = await _json_body(request)
+    body, status = await _run(web.submit_answer, data.get("session_id"), data.get("answer"))
+    return JSONResponse(body, status)
+
+
+async def typing(request: Request) -> Response:
+    data = await _json_body(request)
+    body, status = await _run(
+        web.propose_partial, data.get("session_id"), data.get("partial"), data.get("question_number")
+    )
+    return JSONResponse(body, status)
+
+
+async def wait_state(session_id: str, wait: float) -> Optional[Dict[str, Any]]:
+    """Version asynchrone de `app.wait_state`: l'attente est une future du journal de la session."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + min(wait, web.LONG_POLL_MAX)
+    while True:
+        runtime = web.sessions.get(session_id)
+        # Identifiant relevé avant l'état: un événement publié entre les deux réveille l'attente
+        after = runtime['events'].last_id if runtime is not None else 0
+        state = await _run(web._session_state, session_id)
+        remaining = deadline - loop.time()
+        if state is None or state['status'] != 'pending' or remaining <= 0:
+            return state
+        if runtime is not None:
+            await runtime['events'].wait_async(after, remaining)
+        else:
+            # Session exécutée par un autre worker: scrutation du stockage partagé
+            await asyncio.sleep(min(web.LONG_POLL_INTERVAL, remaining))
+
+
+async def next_step(request: Request) -> Response:
+    try:
+        wait = web.parse_wait(request.query_params.get("wait"))
+    except ValueError:
+        return JSONResponse({'error': 'Paramètre wait invalide'}, 400)
+    state = await wait_state(request.path_params["session_id"], wait)
+    if state is None:
+        return JSONResponse({'error': 'Session invalide'}, 400)
+    return JSONResponse(state)
+
+
+async def stream(request: Request) -> Response:
+    session_id = request.path_params["session_id"]
+    runtime = web.sessions.get(session_id)
+    if runtime is None:
+        if await _run(web.store.get, session_id) is not None:
+            # Le journal d'événements vit dans le worker qui exécute le crew
+            return JSONResponse({'error': 'Flux indisponible sur ce worker, utilisez /next'}, 409)
+        return JSONResponse({'error': 'Session invalide'}, 400)
+
+    events = runtime['events']
+    last_id = web.parse_last_event_id(request.headers.get("last-event-id") or request.query_params.get("last_event_id"))
+
+    async def generate() -> AsyncIterator[str]:
+        after = last_id
+        # Indique au navigateur le délai de reconnexion automatique
+        yield "retry: 3000\n\n"
+        while True:
+            batch = await events.wait_async(after, web.SSE_HEARTBEAT)
+            if not batch:
+                if events.closed:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            chunk = []
+            for event_id, event, data in batch:
+                after = event_id
+                chunk.append(format_sse(event_id, event, data))
+                if event in ('done', 'error'):
+                    yield "".join(chunk)
+                    return
+            yield "".join(chunk)
+
+    # Déconnexion du client: Starlette annule le générateur (aucune attente orpheline)
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+async def download(request: Request) -> Response:
+    session_id = request.path_params["session_id"]
+    report, error = await _run(web.report_for_download, session_id)
+    if error is not None:
+        return JSONResponse(error[0], error[1])
+
+    # ETag = empreinte du rapport: un nouveau téléchargement du même rapport ne coûte qu'un 304
+    etag = await _run(web.pdf_service.key, report)
+    if parse_etags(request.headers.get("if-none-match")).contains_weak(etag):
+        return Response(status_code=304, headers={"ETag": f'W/"{etag}"'})
+
+    # En cache: immédiat; en cours de rendu: attente sur la future du rendu (sans thread)
+    future = await _run(web.pdf_service.submit, report)
+    try:
+        # shield: le délai dépassé n'annule pas un rendu partagé avec d'autres demandes
+        pdf = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), web.PDF_WAIT)
+    except asyncio.TimeoutError:
+        return JSONResponse({'error': 'Rapport PDF en cours de génération, réessayez'}, 503)
+    except Exception as e:
+        logger.error(f"Erreur lors de la génération du PDF: {str(e)}")
+        return JSONResponse({'error': 'Rapport PDF non disponible'}, 404)
+
+    data = pdf.data
+    if data is None:
+        # Rapport volumineux: lu depuis le cache disque de rendu
+        data = await _run(_read, pdf.path)
+    logger.info(f"Téléchargement du PDF {pdf.key[:12]} ({pdf.size} octets)")
+    return Response(data, media_type="application/pdf", headers={
+        "Content-Disposition": f'attachment; filename="rapport_psychiatrique_{session_id[:8]}.pdf"',
+        "ETag": f'W/"{pdf.key}"',
+        "Cache-Control": "private, no-cache",
+    })
+
+
+def _read(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+async def cleanup(request: Request) -> Response:
+    session_id = request.path_params["session_id"]
+    logger.info(f"Nettoyage de la session {session_id}")
+    await _run(web.discard_session, session_id)
+    return JSONResponse({'success': True})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(_app: Starlette) -> AsyncIterator[None]:
+    # Préchauffage en arrière-plan: le port s'ouvre sans l'attendre
+    asyncio.get_running_loop().run_in_executor(None, web.warm_up)
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route("/start", start, methods=["POST"]),
+        Route("/chat", chat, methods=["POST"]),
+        Route("/typing", typing, methods=["POST"]),
+        Route("/next/{session_id}", next_step),
+        Route("/stream/{session_id}", stream),
+        Route("/download/{session_id}", download),
+        Route("/cleanup/{session_id}", cleanup, methods=["POST"]),
+        Mount("/", app=_flask_routes),
+    ],
+    # Mêmes origines que flask-cors en mode WSGI, pré-vérifications comprises
+    middleware=[Middleware(CORSMiddleware, allow_origins=web.CORS_ORIGINS, allow_methods=["*"], allow_headers=["*"])],
+    lifespan=lifespan,
+)
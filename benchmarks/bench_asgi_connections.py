@@ -0,0 +1,179 @@
+"""Connexions inactives simultanées: serveur WSGI (Flask, un thread par connexion) vs ASGI (uvicorn).
+
+Hors ligne (LLM scripté): le serveur tourne dans un processus à part. Une session attend
+la réponse du patient (flux SSE `/stream` inactifs, keep-alive seulement) et une autre
+attend un worker (attentes longues `/next?wait=30`). Pour chaque palier, N connexions
+sont ouvertes (moitié SSE, moitié attente longue), puis on relève les threads et la RSS
+du serveur et la latence d'une requête `/next` ordinaire pendant qu'elles sont ouvertes.
+
+Usage: python benchmarks/bench_asgi_connections.py [--connections 200 1000 2000] [--servers wsgi asgi]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+HOST = "127.0.0.1"
+
+
+def serve(kind, port):
+    """Processus serveur (option interne --serve)."""
+    sys.path.insert(0, ROOT)
+    if kind == "wsgi":
+        from werkzeug.serving import make_server
+        from app import app
+
+        # Comme app.run(): un thread par connexion
+        make_server(HOST, port, app, threaded=True).serve_forever()
+    else:
+        import uvicorn
+
+        uvicorn.run("asgi:app", host=HOST, port=port, log_level="warning", backlog=4096)
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def _request(port, method, path, payload=None):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    req = urllib.request.Request(f"http://{HOST}:{port}{path}", data=data, method=method)
+    req.add_header("Content-Type", "application/json")
+    with urllib.request.urlopen(req, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def _proc_status(pid):
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            fields[key] = value.split()
+    return int(fields["Threads"][0]), int(fields["VmRSS"][0]) // 1024
+
+
+def start_server(kind):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        PSYCHAT_FAKE_LLM="1",
+        PSYCHAT_FAKE_LLM_LATENCY="5",
+        # Un seul entretien ouvert: la deuxième session reste en file d'attente (attentes longues)
+        PSYCHAT_MAX_WORKERS="1",
+        PSYCHAT_MAX_INTERVIEWS="1",
+        PSYCHAT_ANSWER_TIMEOUT="3600",
+        PSYCHAT_LLM_CACHE="0",
+        CREWAI_DISABLE_TELEMETRY="true",
+        OTEL_SDK_DISABLED="true",
+        CREWAI_TRACING_ENABLED="false",
+    )
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--serve", kind, "--port", str(port)],
+        cwd=ROOT, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 120
+    while True:
+        try:
+            _request(port, "GET", "/stats")
+            break
+        except OSError:
+            if time.time() > deadline or process.poll() is not None:
+                process.kill()
+                raise RuntimeError(f"serveur {kind} non démarré")
+            time.sleep(0.2)
+    interview = _request(port, "POST", "/start", {"topic": "Capacité"})["session_id"]
+    while _request(port, "GET", f"/next/{interview}")["status"] != "question":
+        time.sleep(0.05)
+    queued = _request(port, "POST", "/start", {"topic": "Capacité"})["session_id"]
+    return process, port, interview, queued
+
+
+async def _open(port, path, expect_headers):
+    """Connexion HTTP/1.1 gardée ouverte; None si le serveur ne l'a pas acceptée à temps."""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(HOST, port), 10)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode("ascii"))
+        await writer.drain()
+        if expect_headers:
+            status = await asyncio.wait_for(reader.readline(), 10)
+            if b" 200 " not in status:
+                writer.close()
+                return None
+        return reader, writer
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+
+async def _probe(port, path):
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(HOST, port)
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\nConnection: close\r\n\r\n".encode("ascii"))
+    await writer.drain()
+    await reader.read()
+    writer.close()
+    return time.perf_counter() - started
+
+
+async def hold(port, interview, queued, connections, batch=100):
+    started = time.perf_counter()
+    opened = []
+    for i in range(0, connections, batch):
+        # Par lots: la file d'écoute du serveur WSGI est courte (128)
+        size = min(batch, connections - i)
+        opened += await asyncio.gather(*(
+            _open(port, f"/stream/{interview}", True) if (i + j) % 2 == 0
+            else _open(port, f"/next/{queued}?wait=30", False)
+            for j in range(size)
+        ))
+    open_time = time.perf_counter() - started
+    await asyncio.sleep(1)
+    # Connexions toujours ouvertes côté serveur (la session attend toujours: aucune réponse finale)
+    alive = [c for c in opened if c is not None and not c[0].at_eof()]
+    probes = []
+    for _ in range(20):
+        probes.append(await asyncio.wait_for(_probe(port, f"/next/{interview}"), 60))
+    for connection in opened:
+        if connection is not None:
+            connection[1].close()
+    probes.sort()
+    return len(alive), open_time, probes[len(probes) // 2], probes[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, nargs="+", default=[200, 1000, 2000])
+    parser.add_argument("--servers", nargs="+", default=["wsgi", "asgi"], choices=["wsgi", "asgi"])
+    parser.add_argument("--serve", choices=["wsgi", "asgi"], help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    print(f"{'serveur':8s} {'connexions':>10s} {'ouvertes':>9s} {'ouverture':>10s} {'threads':>8s} "
+          f"{'RSS (Mo)':>9s} {'/next p50':>10s} {'/next max':>10s}")
+    for kind in args.servers:
+        for connections in args.connections:
+            # Serveur neuf par palier: les threads des connexions fermées ne faussent pas le suivant
+            process, port, interview, queued = start_server(kind)
+            try:
+                idle_threads, _ = _proc_status(process.pid)
+                alive, open_time, p50, worst = asyncio.run(hold(port, interview, queued, connections))
+                threads, rss = _proc_status(process.pid)
+            finally:
+                process.kill()
+                process.wait()
+            print(f"{kind:8s} {connections:10d} {alive:9d} {open_time:9.2f}s {threads:8d} {rss:9d} "
+                  f"{p50 * 1000:8.1f}ms {worst * 1000:8.1f}ms   (threads au repos: {idle_threads})")
+
+
+if __name__ == "__main__":
+    main()
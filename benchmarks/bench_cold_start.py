@@ -0,0 +1,129 @@
+"""Démarrage à froid du serveur: port ouvert, application prête, préchauffage, profil d'import.
+
+Hors ligne: pour chaque scénario, un processus neuf démarre le serveur Flask sur un port
+libre et la sonde `/ready` est interrogée en continu:
+
+- immédiat: `import app` puis `app.run` (le port ne s'ouvre qu'après l'import)
+- différé: pool de rendu PDF démarré, port ouvert, application importée puis préchauffée
+  en arrière-plan (`medical_report.warmup.LazyWSGI`, comme `main.run`)
+
+Rapport: délai jusqu'au port ouvert, jusqu'à `/ready` = 200 et jusqu'à la fin du
+préchauffage; puis profil d'import de `app` par paquet (`-X importtime`). `--save` et
+`--compare` enregistrent / comparent ce profil (code 1 en cas de régression).
+
+Usage: python benchmarks/bench_cold_start.py [--runs 3] [--save profil.json] [--compare profil.json]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'src'))
+
+from medical_report.loadtest import percentile
+from medical_report.warmup import main as import_report
+
+SERVE = {
+    "immédiat": "import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)",
+    "différé": (
+        "from werkzeug.serving import run_simple; from medical_report.warmup import LazyWSGI; "
+        "from medical_report.pdf_service import prestart; prestart(); "
+        "run_simple('127.0.0.1', {port}, LazyWSGI('app:app').start(), threaded=True)"
+    ),
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start(scenario, tmp):
+    port = free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([PROJECT_ROOT, os.path.join(PROJECT_ROOT, "src")]),
+        "CREWAI_DISABLE_TELEMETRY": "true", "OTEL_SDK_DISABLED": "true", "CREWAI_TRACING_ENABLED": "false",
+        "PSYCHAT_REPORT_ARCHIVE_DIR": os.path.join(tmp, "reports"),
+        "PSYCHAT_PDF_CACHE_DIR": os.path.join(tmp, "pdf"),
+        "PSYCHAT_LLM_CACHE": "0",
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVE[scenario].format(port=port)], cwd=PROJECT_ROOT, env=env,
+        stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+    return process, port, started
+
+
+def measure(scenario, tmp):
+    process, port, started = start(scenario, tmp)
+    url = f"http://127.0.0.1:{port}"
+    bound = ready = warm = None
+    try:
+        while time.perf_counter() - started < 120 and ready is None:
+            try:
+                with urllib.request.urlopen(f"{url}/ready", timeout=30):
+                    ready = time.perf_counter() - started
+            except urllib.error.HTTPError:
+                pass
+            except OSError:
+                time.sleep(0.02)
+                continue
+            bound = bound or time.perf_counter() - started
+            # Sonde espacée comme celle d'un orchestrateur (sans voler le processeur à l'import)
+            time.sleep(0.05)
+        # Sans préchauffage (immédiat), `warm` reste faux: le premier rendu PDF et le premier
+        # crew chargeront ReportLab, le logo et les agents à la demande
+        while scenario == "différé" and time.perf_counter() - started < 120:
+            with urllib.request.urlopen(f"{url}/ready", timeout=30) as response:
+                if json.load(response)["warm"]:
+                    warm = time.perf_counter() - started
+                    break
+            time.sleep(0.05)
+        with urllib.request.urlopen(f"{url}/stats", timeout=30) as response:
+            return bound, ready, warm, json.load(response)["warmup"]
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="paquets affichés dans le profil d'import")
+    parser.add_argument("--save", default=None, help="enregistre le profil d'import par paquet (JSON)")
+    parser.add_argument("--compare", default=None, help="profil d'import de référence")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for scenario in SERVE:
+            runs = [measure(scenario, tmp) for _ in range(args.runs)]
+            bound = [r[0] for r in runs]
+            ready = [r[1] for r in runs]
+            warm = [r[2] for r in runs]
+            line = (f"{scenario:9s} port ouvert p50 {percentile(bound, 50) * 1000:6.0f} ms, "
+                    f"prêt p50 {percentile(ready, 50) * 1000:6.0f} ms")
+            if all(warm):
+                line += f", préchauffé p50 {percentile(warm, 50) * 1000:6.0f} ms ({runs[-1][3]})"
+            print(line)
+    print()
+    argv = ["--top", str(args.top)]
+    if args.save:
+        argv += ["--save", args.save]
+    if args.compare:
+        argv += ["--compare", args.compare]
+    return import_report(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""Taille des prompts de l'entretien: historique ReAct complet vs mémoire bornée de la transcription.
+
+Hors ligne, sans LLM: l'historique de l'interviewer est reconstitué comme par l'exécuteur
+CrewAI (un tour "Action / Observation" par question), avec des réponses de longueur
+réglable. Tokens estimés à 4 caractères par token.
+
+Usage: python benchmarks/bench_context_budget.py [--questions 10] [--answer-words 40 200 800]
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from medical_report.fake_llm import QUESTIONS
+from medical_report.transcript import ASK_ACTION, Transcript, estimate_tokens
+
+# Consignes de la tâche et description des outils (~1 100 tokens dans l'application)
+PROMPT = [
+    {"role": "system", "content": "Consignes de l'agent. " * 150},
+    {"role": "user", "content": "Consignes de la tâche d'entretien. " * 100},
+]
+
+SENTENCE = "Je dors mal depuis trois mois, je me réveille souvent et je suis anxieux au travail."
+
+
+def tokens(messages):
+    return sum(estimate_tokens(str(m["content"])) for m in messages)
+
+
+def simulate(questions, answer_words, keep):
+    words = SENTENCE.split()
+    answer = " ".join(words[i % len(words)] for i in range(answer_words))
+    transcript = Transcript()
+    messages = list(PROMPT)
+    full, bounded = [], []
+    for number in range(1, questions + 1):
+        full.append(tokens(messages))
+        bounded.append(tokens(transcript.compact(messages, keep)))
+        question = QUESTIONS[(number - 1) % len(QUESTIONS)]
+        action = f"Thought: Je pose la question suivante.\n{ASK_ACTION}\nAction Input: {json.dumps({'question': question})}"
+        messages.append({"role": "assistant", "content": f"{action}\nObservation: {answer}"})
+        transcript.add(number, question, answer)
+    # Appel final (Final Answer) puis contexte de la structuration du dossier
+    full.append(tokens(messages))
+    bounded.append(tokens(transcript.compact(messages, keep)))
+    raw_transcript = sum(estimate_tokens(f"{QUESTIONS[0]} {answer}") for _ in range(questions))
+    return full, bounded, raw_transcript, estimate_tokens(transcript.render())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--answer-words", type=int, nargs="+", default=[40, 200, 800])
+    parser.add_argument("--keep", type=int, default=2, help="tours ReAct conservés tels quels")
+    args = parser.parse_args()
+
+    print(f"{args.questions} questions, {args.keep} derniers tours conservés")
+    for words in args.answer_words:
+        full, bounded, raw, rendered = simulate(args.questions, words, args.keep)
+        print(f"  réponses de {words:4d} mots: dernier appel {full[-1]:6d} -> {bounded[-1]:5d} tokens, "
+              f"total entretien {sum(full):7d} -> {sum(bounded):6d}, "
+              f"transcription du dossier {raw:6d} -> {rendered:5d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Coût de préparation d'un crew par session: MedicalReportCrew().crew() vs CrewFactory.build().
+
+Usage: python benchmarks/bench_crew_factory.py [--iterations 200]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from medical_report.crew import MedicalReportCrew
+from medical_report.crew_factory import CrewFactory
+
+
+def measure(label, build, iterations):
+    build()  # échauffement (imports, caches pydantic)
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        build()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{label:<32} médiane {statistics.median(samples):7.2f} ms   p95 {p95:7.2f} ms")
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    factory = CrewFactory()
+    before = measure("MedicalReportCrew().crew()", lambda: MedicalReportCrew().crew(), args.iterations)
+    after = measure("CrewFactory.build()", lambda: factory.build("bench-session"), args.iterations)
+    print(f"Gain par session: {before - after:.2f} ms (x{before / after:.1f})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Passerelle LLM contre un fournisseur local simulé (llm_stub): quota, priorité, bascule.
+
+Hors ligne: serveur compatible OpenAI avec un quota de jetons par minute (429 au-delà).
+Des entretiens (tours interactifs espacés du temps de réponse du patient) et des
+rédactions de rapports (appels enchaînés) appellent le même modèle via des LLM CrewAI:
+
+- direct: chaque appel part tout de suite (comme sans passerelle, réessais du client coupés)
+- passerelle: quota connu (PSYCHAT_LLM_TPM), entretiens prioritaires, pool keep-alive
+- bascule: le fournisseur principal tombe en panne à mi-parcours, secondaire configuré
+
+Rapport: appels en échec, refus 429, latence des tours d'entretien et des appels de
+rapport, connexions TCP ouvertes chez le fournisseur.
+
+Usage: python benchmarks/bench_llm_gateway.py [--seconds 20] [--tpm 60000] [--interviews 4] [--reports 4]
+"""
+import argparse
+import contextlib
+import logging
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_TRACING_ENABLED", "false")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from crewai import LLM
+
+from medical_report.llm_gateway import LLMGateway, Provider
+from medical_report.llm_stub import StubLLMServer
+from medical_report.loadtest import percentile
+
+
+class Task:
+    """Tâche minimale: seul le nom sert (priorité de la passerelle)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.id = name
+        self.agent = None
+
+
+INTERVIEW = Task("tache_entretien_interactif")
+REPORT = Task("tache_analyse_diagnostique")
+
+# ~600 jetons d'énoncé: l'ordre de grandeur d'un tour d'entretien ou d'une étape du rapport
+PROMPT = "Analysez UNIQUEMENT le dossier patient structuré. " + "Le patient décrit une anxiété persistante. " * 55
+
+
+def _llm(url):
+    return LLM(model="openai/psychat-stub", base_url=url, api_key="stub", max_retries=0, temperature=0.7)
+
+
+def worker(llm, task, think, stop, latencies, errors):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            llm.call([{"role": "user", "content": PROMPT}], from_task=task)
+            latencies.append(time.perf_counter() - started)
+        except Exception:
+            errors.append(time.perf_counter() - started)
+            # Session en échec: le patient recommence un peu plus tard
+            stop.wait(1.0)
+            continue
+        if think:
+            stop.wait(think)
+
+
+def run(scenario, args):
+    primary = StubLLMServer(latency=args.latency_ms / 1000, tpm=args.tpm).start()
+    fallback = StubLLMServer(latency=args.latency_ms / 1000, tpm=args.tpm).start() if scenario == "bascule" else None
+    gateway = None
+    if scenario != "direct":
+        gateway = LLMGateway(
+            primary=Provider("primary", "openai/psychat-stub", primary.url, "stub", tpm=args.tpm * 0.9),
+            fallback=Provider("fallback", "openai/psychat-stub", fallback.url, "stub", tpm=args.tpm * 0.9)
+            if fallback else None,
+            max_wait=args.max_wait,
+            pool=16,
+        )
+
+    def llm():
+        base = _llm(primary.url)
+        return gateway.wrap(base) if gateway else base
+
+    stop = threading.Event()
+    results = {"entretien": ([], []), "rapport": ([], [])}
+    threads = [
+        threading.Thread(target=worker, args=(llm(), INTERVIEW, args.think_s, stop, *results["entretien"]))
+        for _ in range(args.interviews)
+    ] + [
+        threading.Thread(target=worker, args=(llm(), REPORT, 0, stop, *results["rapport"]))
+        for _ in range(args.reports)
+    ]
+    # Les LLM CrewAI impriment chaque échec sur stdout
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for thread in threads:
+            thread.start()
+        if fallback is not None:
+            stop.wait(args.seconds / 3)
+            primary.down = True
+        stop.wait(args.seconds - (args.seconds / 3 if fallback is not None else 0))
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    stats = primary.stats()
+    connections = stats["connections"] + (fallback.stats()["connections"] if fallback else 0)
+    print(f"{scenario}: 429 {stats['rate_limited']}, pannes {stats['unavailable']}, connexions {connections}"
+          + (f", bascules {gateway.stats()['failovers']}" if gateway else ""))
+    for kind, (latencies, errors) in results.items():
+        line = f"  {kind:10s} {len(latencies):4d} appels, {len(errors):3d} échecs"
+        if latencies:
+            line += (f", latence p50 {percentile(latencies, 50) * 1000:7.0f} ms, "
+                     f"p95 {percentile(latencies, 95) * 1000:7.0f} ms")
+        print(line)
+    primary.stop()
+    if fallback:
+        fallback.stop()
+    if gateway:
+        gateway.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--tpm", type=int, default=60000, help="quota du fournisseur simulé (jetons/min)")
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--interviews", type=int, default=4, help="entretiens simultanés")
+    parser.add_argument("--think-s", type=float, default=3.0, help="temps de réponse du patient entre deux tours")
+    parser.add_argument("--reports", type=int, default=4, help="rédactions de rapports simultanées")
+    parser.add_argument("--max-wait", type=float, default=5.0, help="attente avant débordement sur le secondaire")
+    parser.add_argument("--scenarios", nargs="+", default=["direct", "passerelle", "bascule"],
+                        choices=["direct", "passerelle", "bascule"])
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger("LiteLLM").setLevel(logging.ERROR)
+
+    print(f"{args.interviews} entretiens + {args.reports} rapports pendant {args.seconds:.0f} s, "
+          f"quota {args.tpm} jetons/min, latence {args.latency_ms:.0f} ms")
+    for scenario in args.scenarios:
+        run(scenario, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Nettoyage + conversion markdown -> flowables: implémentation précédente vs tokenizer en une passe.
+
+Vérifie d'abord que les deux produisent exactement le même markdown nettoyé et les mêmes
+flowables, puis mesure débit (Mo/s) et allocations (pic tracemalloc, collectes gc gen0)
+sur des rapports synthétiques de 100 Ko à 5 Mo.
+
+Usage: python benchmarks/bench_markdown.py [--sizes 100k,1m,5m] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+from typing import List
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from reportlab.platypus import Paragraph, Spacer
+
+from medical_report.pdf_generator import ModernPDFGenerator
+
+
+class LegacyMarkdown:
+    """Implémentation d'origine (motifs non compilés, trois boucles sur les lignes)."""
+
+    def __init__(self, styles):
+        self.styles = styles
+
+    def _clean_markdown(self, content: str) -> str:
+        if not content:
+            return ""
+        text = content.replace("\r\n", "\n").replace("\r", "\n")
+        text = re.sub(r"\[(?:[^\]]*(?:compl[eé]ter|completer|ins[eé]rer|à remplir)[^\]]*)\]", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"\bNon spécifié\b", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"\bmarkdown\b", "", text, flags=re.IGNORECASE)
+        cleaned: List[str] = []
+        for ln in text.split("\n"):
+            s = ln.strip()
+            if s.lower().startswith("généré le ") or s.lower().startswith("page "):
+                continue
+            if s == "Rapport Psychiatrique":
+                continue
+            cleaned.append(ln)
+        out: List[str] = []
+        last_empty = False
+        for ln in cleaned:
+            if ln.strip() == "":
+                if not last_empty:
+                    out.append("")
+                last_empty = True
+            else:
+                out.append(ln)
+                last_empty = False
+        return "\n".join(out).strip()
+
+    def _fmt_inline(self, text: str) -> str:
+        try:
+            text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text)
+            text = re.sub(r"(?<!\*)\*([^*]+?)\*(?!\*)", r"<i>\1</i>", text)
+            text = re.sub(r"`(.*?)`", r"<font name='Courier'>\1</font>", text)
+            return text
+        except Exception:
+            return text
+
+    def _md_to_elements(self, md: str):
+        elements = []
+        if not md:
+            return elements
+        for raw in md.split("\n"):
+            line = raw.strip()
+            if not line:
+                elements.append(Spacer(1, 6))
+                continue
+            if line.startswith("# "):
+                elements.append(Paragraph(self._fmt_inline(line[2:]), self.styles["SectionHeader"]))
+                continue
+            if line.startswith("## "):
+                elements.append(Paragraph(self._fmt_inline(line[3:]), self.styles["SectionHeader"]))
+                continue
+            if line.startswith(('- ', '* ')):
+                bullet = self._fmt_inline(line[2:])
+                elements.append(Paragraph(f"• {bullet}", self.styles["BodyTextLarge"]))
+                continue
+            if re.match(r"^\d+\.\s+.+", line):
+                num = re.sub(r"^(\d+)\.\s+", r"\1. ", line)
+                elements.append(Paragraph(self._fmt_inline(num), self.styles["BodyTextLarge"]))
+                continue
+            elements.append(Paragraph(self._fmt_inline(line), self.styles["BodyTextLarge"]))
+        return elements
+
+    def elements(self, content: str):
+        return self._md_to_elements(self._clean_markdown(content))
+
+
+# Lignes représentatives des rapports produits par le rédacteur, cas limites compris
+LINES = [
+    "# Rapport Psychiatrique",
+    "Rapport Psychiatrique",
+    "## Motif de consultation",
+    "Le patient consulte pour une **anxiété** persistante et des *troubles du sommeil*.",
+    "- **Sommeil** : endormissement difficile depuis 3 mois",
+    "* Appétit conservé, pas de perte de poids `Non spécifié`",
+    "1. Évaluation de l'humeur",
+    "12.\tSuivi à 4 semaines",
+    "3.pas une liste",
+    "  - puce indentée avec `code` et **gras** et *italique*",
+    "Antécédents : [À compléter par le praticien]",
+    "Traitement : [insérer posologie] Non spécifié",
+    "Ce texte markdown doit disparaître, mais pas markdowns.",
+    "Généré le 01/01/2025 à 10:00",
+    "Page 2 / 3",
+    "page suivante",
+    "#Titre sans espace",
+    "-puce sans espace",
+    "**gras non fermé et *italique* mêlés",
+    "",
+    "",
+    "   ",
+    "\t",
+]
+
+
+def synthetic_report(size: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < size:
+        line = rng.choice(LINES)
+        if rng.random() < 0.02:
+            line += "\r"
+        parts.append(line)
+        total += len(line) + 1
+    return "\n".join(parts)
+
+
+def signature(elements):
+    out = []
+    for el in elements:
+        if isinstance(el, Spacer):
+            out.append(("Spacer", el.width, el.height))
+        else:
+            out.append(("Paragraph", el.text, el.style.name))
+    return out
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    factor = {"k": 1024, "m": 1024 * 1024}.get(text[-1], 1)
+    return int(float(text.rstrip("km")) * factor)
+
+
+def measure(label, fn, content, repeat):
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn(content)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+
+    gc.collect()
+    collections = gc.get_stats()[0]["collections"]
+    tracemalloc.start()
+    fn(content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    gen0 = gc.get_stats()[0]["collections"] - collections
+
+    mb = len(content.encode("utf-8")) / (1024 * 1024)
+    print(f"  {label:<22} {best * 1000:9.1f} ms  {mb / best:7.2f} Mo/s  pic {peak / (1024 * 1024):7.1f} Mo  gc gen0 {gen0:6d}")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100k,1m,5m")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    generator = ModernPDFGenerator()
+    legacy = LegacyMarkdown(generator.styles)
+
+    for size in [parse_size(s) for s in args.sizes.split(",")]:
+        content = synthetic_report(size)
+        print(f"Rapport synthétique de {len(content) / 1024:.0f} Ko ({content.count(chr(10)) + 1} lignes)")
+
+        if legacy._clean_markdown(content) != generator._clean_markdown(content):
+            sys.exit("  ÉCART: markdown nettoyé différent")
+        if signature(legacy.elements(content)) != signature(generator._md_to_elements(content)):
+            sys.exit("  ÉCART: flowables différents")
+        print("  sortie identique (markdown nettoyé et flowables)")
+
+        print(" nettoyage seul")
+        before = measure("précédent", legacy._clean_markdown, content, args.repeat)
+        after = measure("une passe", generator._clean_markdown, content, args.repeat)
+        print(f"  gain x{before / after:.2f}")
+        print(" nettoyage + flowables")
+        before = measure("précédent", legacy.elements, content, args.repeat)
+        after = measure("une passe", generator._md_to_elements, content, args.repeat)
+        print(f"  gain x{before / after:.2f}")
+
+
+if __name__ == "__main__":
+    main()
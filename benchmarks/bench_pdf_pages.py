@@ -0,0 +1,85 @@
+"""Coût du rendu PDF selon le nombre de pages: ressources par page (précédent) vs partagées.
+
+Le rendu précédent relisait le logo (ImageReader + os.path.exists) sur chaque page et
+reconstruisait les filets d'accent à chaque rapport; le rendu actuel partage logo décodé,
+filets et styles, et embarque le logo une fois par document (Form XObject).
+
+Usage: python benchmarks/bench_pdf_pages.py [--pages 1,10,50,200] [--repeat 3]
+"""
+import argparse
+import io
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+
+from medical_report.pdf_generator import ModernPDFGenerator
+
+_PAGE = re.compile(rb"/Type /Page[^s]")
+
+# Environ une page A4 de corps de texte 14pt
+PAGE_MARKDOWN = "\n".join(
+    ["## Observation clinique"]
+    + [f"- **Point {i}** : le patient décrit une *anxiété* modérée, stable sur la période." for i in range(12)]
+    + ["Synthèse : évolution favorable, poursuite du suivi et réévaluation à quatre semaines."] * 4
+)
+
+
+class LegacyPDFGenerator(ModernPDFGenerator):
+    """Ressources recréées à chaque page/rapport, comme avant le cache partagé."""
+
+    def _header_footer(self, canvas, doc_):
+        canvas.setFillColor(self.primary_blue)
+        canvas.rect(doc_.leftMargin, A4[1] - doc_.topMargin + 10, doc_.width, 2, stroke=0, fill=1)
+        if self.logo_path and os.path.exists(self.logo_path):
+            try:
+                logo = ImageReader(self.logo_path)
+                canvas.drawImage(logo, A4[0] - doc_.rightMargin - 30, A4[1] - doc_.topMargin + 0, width=55, height=55, mask='auto')
+            except Exception:
+                pass
+
+    def _accent_rule(self, thin=False):
+        return self._build_accent_rule(thin)
+
+
+def render(generator, markdown):
+    buffer = io.BytesIO()
+    generator.render(markdown, buffer)
+    return buffer.getvalue()
+
+
+def measure(label, generator, markdown, repeat):
+    render(generator, markdown)  # échauffement
+    timings, data = [], b""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = render(generator, markdown)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    pages = len(_PAGE.findall(data))
+    print(f"  {label:<10} {pages:4d} pages  {best * 1000:9.1f} ms  {best * 1000 / pages:7.2f} ms/page  {len(data) / 1024:8.0f} Ko")
+    return best / pages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", default="1,10,50,200")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    legacy, shared = LegacyPDFGenerator(), ModernPDFGenerator()
+    for count in [int(p) for p in args.pages.split(",")]:
+        markdown = "\n\n".join([PAGE_MARKDOWN] * count)
+        print(f"Rapport d'environ {count} page(s)")
+        before = measure("précédent", legacy, markdown, args.repeat)
+        after = measure("partagé", shared, markdown, args.repeat)
+        print(f"  coût par page x{before / after:.1f} plus faible")
+
+
+if __name__ == "__main__":
+    main()
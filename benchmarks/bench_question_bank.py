@@ -0,0 +1,120 @@
+"""Banque de questions de l'entretien: construction de l'index, recherche, appels LLM évités.
+
+Hors ligne: la banque est construite depuis `knowledge/` puis depuis des transcriptions
+passées générées (questions récurrentes et questions propres à chaque entretien), la
+recherche est chronométrée sur les réponses du test de charge, et un entretien de 10
+questions est rejoué à travers `QuestionBankLLM` pour compter les générations évitées
+et les jetons ajoutés par les questions candidates.
+
+Usage: python benchmarks/bench_question_bank.py [--transcripts 0 200 2000] [--searches 2000]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_TRACING_ENABLED", "false")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from medical_report.fake_llm import ScriptedLLM
+from medical_report.loadtest import ANSWERS, percentile
+from medical_report.question_bank import ASK_TOOL, QuestionBank
+from medical_report.tools.response_analyzer import analyze
+
+RECURRING = (
+    "Depuis quand vous sentez-vous ainsi ?",
+    "Comment dormez-vous en ce moment ?",
+    "Avez-vous déjà consulté un psychiatre ?",
+    "Comment se passe votre travail ?",
+    "Avez-vous des idées noires ?",
+)
+
+
+class Task:
+    def __init__(self, name):
+        self.name = name
+        self.id = name
+        self.agent = None
+
+
+class CountingLLM(ScriptedLLM):
+    """LLM scripté qui compte ses générations et les caractères d'énoncé reçus."""
+
+    def __init__(self):
+        super().__init__(latency=0)
+        self.calls = 0
+        self.prompt_chars = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        self.calls += 1
+        self.prompt_chars += sum(len(str(m.get("content", ""))) for m in messages)
+        return super().call(messages, tools, callbacks, available_functions, from_task, from_agent)
+
+
+def write_transcripts(path, count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            exchanges = [{"question": q, "answer": ANSWERS[j % len(ANSWERS)]} for j, q in enumerate(RECURRING)]
+            exchanges += [{"question": f"Que s'est-il passé lors de l'épisode {i}-{j} que vous évoquez ?", "answer": "..."}
+                          for j in range(5)]
+            f.write(json.dumps({"id": f"t{i}", "topic": "anxiété", "exchanges": exchanges}, ensure_ascii=False) + "\n")
+
+
+def interview(bank):
+    """Entretien de 10 questions: énoncé de l'interviewer rejoué tour par tour."""
+    inner = CountingLLM()
+    llm = bank.wrap(inner) if bank else inner
+    task = Task("tache_entretien_interactif")
+    messages = [
+        {"role": "system", "content": f"Vous êtes un psychiatre. Outil disponible: {ASK_TOOL}."},
+        {"role": "user", "content": "Le sujet général de la consultation est : 'anxiété'. Menez l'entretien."},
+    ]
+    for answer in ANSWERS:
+        response = llm.call(messages, from_task=task)
+        messages.append({"role": "assistant", "content": f"{response}\nObservation: {answer}"})
+    asked = sum(m["content"].count(f"Action: {ASK_TOOL}") for m in messages if m["role"] == "assistant")
+    return inner, asked
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--transcripts", type=int, nargs="+", default=[0, 200, 2000],
+                        help="nombres de transcriptions passées indexées")
+    parser.add_argument("--searches", type=int, default=2000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.transcripts:
+            path = os.path.join(tmp, f"transcripts_{count}.jsonl")
+            write_transcripts(path, count)
+            started = time.perf_counter()
+            bank = QuestionBank.load(transcripts=[path] if count else [])
+            build = time.perf_counter() - started
+
+            timings = []
+            for i in range(args.searches):
+                answer = ANSWERS[i % len(ANSWERS)]
+                analysis = analyze(answer)
+                started = time.perf_counter()
+                bank.search(answer, analysis.uncovered, k=3, topic="anxiété")
+                timings.append(time.perf_counter() - started)
+            print(f"{count:5d} transcriptions: {len(bank):6d} questions, index {build * 1000:7.1f} ms, "
+                  f"recherche p50 {percentile(timings, 50) * 1e6:7.0f} µs, p95 {percentile(timings, 95) * 1e6:7.0f} µs")
+
+    print()
+    bank = QuestionBank.load()
+    for label, candidate in (("sans banque", None), ("avec banque", bank)):
+        inner, asked = interview(candidate)
+        print(f"{label}: {asked} questions posées, {inner.calls} générations LLM, "
+              f"~{inner.prompt_chars // 4} jetons d'énoncé au total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Archive des rapports: écriture, taux de compression et temps de recherche selon sa taille.
+
+Hors ligne: N rapports (markdown du LLM scripté, une ligne propre à chaque session) sont
+archivés avec un PDF commun par lot de sujets, puis la dernière version d'une session et la
+liste d'un sujet sont lues depuis l'index, comparées à un dossier plat de fichiers
+`<session>.md` qu'il faut parcourir (métadonnées en tête de chaque fichier). Enfin, coût de
+l'effacement d'une session (PDF commun conservé tant qu'une autre version s'en sert).
+
+Usage: python benchmarks/bench_report_archive.py [--reports 1000 10000] [--lookups 500]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from medical_report.fake_llm import REPORT
+from medical_report.loadtest import percentile
+from medical_report.report_archive import ReportArchive
+
+TOPICS = ("anxiété", "troubles du sommeil", "humeur dépressive", "attaques de panique", "épuisement professionnel")
+PDF = b"%PDF-1.4\n" + os.urandom(24 * 1024)
+
+
+def timed(fn, calls):
+    timings = []
+    for args in calls:
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return f"p50 {percentile(timings, 50) * 1e6:8.0f} µs, p95 {percentile(timings, 95) * 1e6:8.0f} µs"
+
+
+def scan_topic(folder, topic, limit=20):
+    found = []
+    for name in os.listdir(folder):
+        with open(os.path.join(folder, name), encoding="utf-8") as f:
+            header = f.readline()
+        if header.startswith(f"<!-- {topic} |"):
+            found.append((float(header.rsplit("|", 1)[1].split()[0]), name))
+    return sorted(found, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reports", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--lookups", type=int, default=500)
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    for count in args.reports:
+        tmp = tempfile.mkdtemp(prefix="psychat_bench_archive_")
+        try:
+            archive = ReportArchive(os.path.join(tmp, "archive"), enabled=True)
+            flat = os.path.join(tmp, "flat")
+            os.makedirs(flat)
+            sessions = [f"session-{i:06d}" for i in range(count)]
+            started = time.perf_counter()
+            for i, session_id in enumerate(sessions):
+                topic = TOPICS[i % len(TOPICS)]
+                report = f"{REPORT}\n\nSession {session_id}, sujet: {topic}.\n"
+                archive.add(session_id, topic, report)
+                archive.attach_pdf(session_id, report, PDF + topic.encode("utf-8"))
+                with open(os.path.join(flat, f"{session_id}.md"), "w", encoding="utf-8") as f:
+                    f.write(f"<!-- {topic} | {time.time()} -->\n{report}")
+            elapsed = time.perf_counter() - started
+            stats = archive.stats()
+            print(f"{count} rapports: archivage {elapsed / count * 1000:.2f} ms/rapport, "
+                  f"{stats['bytes_in'] / 1e6:.1f} Mo reçus -> {stats['bytes_stored'] / 1e6:.2f} Mo stockés "
+                  f"({stats['deduplicated']} contenus déjà présents)")
+
+            picks = [(rng.choice(sessions),) for _ in range(args.lookups)]
+            print(f"  session, index:        {timed(lambda s: archive.markdown(archive.get(s)), picks)}")
+            print(f"  session, fichier:      {timed(lambda s: open(os.path.join(flat, f'{s}.md')).read(), picks)}")
+            topics = [(rng.choice(TOPICS),) for _ in range(min(args.lookups, 50))]
+            print(f"  sujet (20), index:     {timed(lambda t: archive.list(topic=t, limit=20), topics)}")
+            print(f"  sujet (20), parcours:  {timed(lambda t: scan_topic(flat, t), topics)}")
+            doomed = [(s,) for s in rng.sample(sessions, min(args.lookups, count))]
+            print(f"  effacement session:    {timed(archive.delete, doomed)}")
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
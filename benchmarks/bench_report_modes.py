@@ -0,0 +1,104 @@
+"""Latence et tokens après l'entretien: mode séquentiel (3 tâches) vs mode rapide (1 génération).
+
+Hors ligne: les agents utilisent le LLM scripté (latence par appel + génération à débit
+fixe) et le patient répond instantanément. Les tokens sont estimés sur les prompts
+réellement construits par CrewAI (4 caractères par token).
+
+Usage: python benchmarks/bench_report_modes.py [--runs 3] [--latency-ms 800] [--tokens-per-s 50]
+"""
+import argparse
+import contextlib
+import os
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("CREWAI_DISABLE_TELEMETRY", "true")
+os.environ.setdefault("OTEL_SDK_DISABLED", "true")
+os.environ.setdefault("CREWAI_TRACING_ENABLED", "false")
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from crewai.events import LLMCallCompletedEvent, TaskCompletedEvent, crewai_event_bus
+
+from medical_report.crew_factory import CrewFactory
+from medical_report.fake_llm import ScriptedLLM
+from medical_report.fast_report import split_fast_report
+from medical_report.tools.custom_tool import AskPatientTool
+
+INTERVIEW_TASK = "tache_entretien_interactif"
+
+
+class Usage:
+    """Appels LLM et tokens estimés après l'entretien, et instant de fin de l'entretien."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.interview_done = None
+
+    def on_llm(self, source, event) -> None:
+        if event.task_name == INTERVIEW_TASK:
+            return
+        prompt = event.messages if isinstance(event.messages, str) else "\n".join(
+            str(m.get("content", "")) for m in event.messages or []
+        )
+        with self.lock:
+            self.calls += 1
+            self.prompt_tokens += len(prompt) // 4
+            self.completion_tokens += len(str(event.response)) // 4
+
+    def on_task(self, source, event) -> None:
+        if getattr(event.task, "name", None) == INTERVIEW_TASK:
+            self.interview_done = time.perf_counter()
+
+
+def run(factory, mode):
+    instance = factory.instance()
+    crew = instance.fast_report_crew() if mode == "rapide" else instance.crew()
+    for agent in crew.agents:
+        agent.verbose = False
+    crew.verbose = False
+    result = str(crew.kickoff(inputs={"topic": "Anxiété et sommeil", "historique": ""}))
+    end = time.perf_counter()
+    return split_fast_report(result)["rapport"] if mode == "rapide" else result, end
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=800, help="délai avant le premier token de chaque appel")
+    parser.add_argument("--tokens-per-s", type=float, default=50, help="débit de génération simulé")
+    args = parser.parse_args()
+
+    AskPatientTool._run = lambda self, question: "Je dors mal depuis trois mois et je suis anxieux au travail."
+    factory = CrewFactory(llm_factory=lambda agent: ScriptedLLM(
+        args.latency_ms / 1000, stream=bool(getattr(agent.llm, "stream", False)), tokens_per_second=args.tokens_per_s
+    ))
+    usage = Usage()
+    crewai_event_bus.on(LLMCallCompletedEvent)(usage.on_llm)
+    crewai_event_bus.on(TaskCompletedEvent)(usage.on_task)
+
+    print(f"LLM scripté: {args.latency_ms:.0f} ms par appel + {args.tokens_per_s:.0f} tokens/s, {args.runs} exécutions")
+    results = {}
+    for mode in ("séquentiel", "rapide"):
+        latencies = []
+        for _ in range(args.runs):
+            usage.reset()
+            with contextlib.redirect_stdout(open(os.devnull, "w")):
+                report, end = run(factory, mode)
+            latencies.append(end - usage.interview_done)
+        results[mode] = statistics.median(latencies)
+        print(f"  {mode:<11} rapport {results[mode] * 1000:8.0f} ms après l'entretien  "
+              f"{usage.calls} appel(s) LLM  prompt ~{usage.prompt_tokens:6d} tokens  "
+              f"réponse ~{usage.completion_tokens:5d} tokens  rapport {len(report)} car.")
+    print(f"Latence du rapport x{results['séquentiel'] / results['rapide']:.1f} plus faible en mode rapide")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Coût de l'analyse locale d'une réponse du patient (couverture des domaines, signaux d'alerte).
+
+Mesure le temps par appel de l'outil "Analyser la Réponse du Patient" selon la longueur
+des échanges précédents fournis en contexte (1 à 10 échanges).
+
+Usage: python benchmarks/bench_response_analyzer.py [--iterations 20000]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
+
+from medical_report.tools.custom_tool import AnalyzePatientResponseTool
+
+EXCHANGES = [
+    ("Qu'est-ce qui vous amène aujourd'hui ?", "Je m'appelle Claire, j'ai 34 ans, je consulte pour une anxiété qui ne me lâche plus."),
+    ("Depuis quand ?", "Depuis environ trois mois, ça a commencé après une réorganisation au travail."),
+    ("Comment dormez-vous ?", "Très mal, je me réveille vers 4 h et je n'arrive plus à me rendormir."),
+    ("Et l'appétit ?", "Je mange moins, j'ai perdu quatre kilos."),
+    ("Avez-vous déjà été suivie ?", "Oui, une psychologue il y a cinq ans, sans traitement médicamenteux."),
+    ("Comment va votre entourage ?", "Mon mari me soutient, mais je m'isole de mes amis."),
+    ("Buvez-vous de l'alcool ?", "Un verre ou deux le soir pour décompresser."),
+    ("Avez-vous des idées noires ?", "Parfois je me dis que je voudrais que tout s'arrête."),
+    ("Comment se passent vos journées ?", "Je suis épuisée, j'ai du mal à me concentrer."),
+    ("Qu'attendez-vous de la consultation ?", "Retrouver le sommeil et comprendre ce qui m'arrive."),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    tool = AnalyzePatientResponseTool()
+    for count in (1, 5, 10):
+        context = "\n".join(f"Q: {q}\nR: {a}" for q, a in EXCHANGES[:count - 1])
+        response = EXCHANGES[count - 1][1]
+        tool._run(response, context)  # échauffement
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            tool._run(response, context)
+        elapsed = (time.perf_counter() - start) / args.iterations
+        print(f"{count:2d} échange(s), contexte {len(context):5d} car.: {elapsed * 1e6:7.1f} µs par analyse")
+    print()
+    print(tool._run(EXCHANGES[7][1], "\n".join(f"Q: {q}\nR: {a}" for q, a in EXCHANGES[:7])))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,26 @@ import { useEffect, useMemo, useRef, useState } from 'react'
 
 const API_BASE = 'http://127.0.0.1:5001'
 
-type ServerStart = { session_id: string; question?: string; error?: string }
-type ServerChat = { question?: string; report?: string; session_id?: string; error?: string }
+const POLL_INTERVAL_MS = 800
+
+// Attente longue côté serveur (s) par appel à /next lorsque le flux SSE n'est pas disponible
+const LONG_POLL_WAIT_S = 25
+
+// Pause de frappe après laquelle le texte saisi est envoyé pour pré-générer la question suivante
+const TYPING_PAUSE_MS = 600
+
+type SessionStatus = 'pending' | 'question' | 'finished' | 'error'
+type ServerState = {
+  session_id?: string
+  status?: SessionStatus
+  position?: number
+  question?: string
+  question_number?: number
+  report?: string
+  error?: string
+}
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms))
 
 function App() {
   const [sessionId, setSessionId] = useState<string | null>(null)
@@ -15,12 +33,73 @@ function App() {
   const [agentQuestion, setAgentQuestion] = useState<string>('')
   const [messages, setMessages] = useState<{ sender: 'agent' | 'user'; text: string }[]>([])
   const inputRef = useRef<HTMLInputElement>(null)
+  const streamRef = useRef<EventSource | null>(null)
+  const questionNumberRef = useRef(0)
+  const typingTimerRef = useRef<number | undefined>(undefined)
 
   const canSend = useMemo(() => Boolean(agentQuestion && sessionId), [agentQuestion, sessionId])
 
   const addMsg = (sender: 'agent' | 'user', text: string) =>
     setMessages((m) => [...m, { sender, text }])
 
+  // Attente longue sur /next jusqu'à obtenir une question, le rapport ou une erreur
+  const waitForNext = async (id: string): Promise<ServerState> => {
+    for (;;) {
+      const res = await fetch(`${API_BASE}/next/${id}?wait=${LONG_POLL_WAIT_S}`)
+      const data: ServerState = await res.json()
+      if (data.error || data.status === 'question' || data.status === 'finished') return data
+      if (!res.ok) await sleep(POLL_INTERVAL_MS)
+    }
+  }
+
+  const handleState = (data: ServerState) => {
+    if (data.status === 'question' && data.question) {
+      // Question déjà affichée (bascule du flux SSE vers /next pendant qu'elle attend sa réponse)
+      if (data.question_number !== undefined && data.question_number <= questionNumberRef.current) return
+      questionNumberRef.current = data.question_number ?? questionNumberRef.current + 1
+      setAgentQuestion(data.question)
+      addMsg('agent', data.question)
+    } else if (data.status === 'finished') {
+      setAgentQuestion('')
+      setIsChatting(false)
+      setIsReportReady(true)
+      setIsGeneratingPDF(true)
+      // Afficher un message de transition avant d'activer le téléchargement
+      setTimeout(() => setIsGeneratingPDF(false), 4000)
+    } else if (data.error) {
+      addMsg('agent', `Erreur: ${data.error}`)
+    }
+  }
+
+  // Flux SSE: les questions et le rapport arrivent dès qu'ils sont produits
+  const openStream = (id: string) => {
+    const es = new EventSource(`${API_BASE}/stream/${id}`)
+    streamRef.current = es
+    es.addEventListener('question', (e) => {
+      const data = JSON.parse((e as MessageEvent).data)
+      handleState({ status: 'question', ...data })
+    })
+    es.addEventListener('report', () => {
+      handleState({ status: 'finished' })
+      es.close()
+    })
+    es.addEventListener('error', (e) => {
+      const raw = (e as MessageEvent).data
+      es.close()
+      if (streamRef.current === es) streamRef.current = null
+      if (raw) {
+        handleState({ status: 'error', ...JSON.parse(raw) })
+        return
+      }
+      // Flux refusé (409: session exécutée par un autre worker) ou coupé: bascule sur /next
+      waitForNext(id)
+        .then(handleState)
+        .catch((err) => addMsg('agent', `Erreur de connexion: ${err?.message ?? err}`))
+    })
+  }
+
+  useEffect(() => () => streamRef.current?.close(), [])
+
   const startConversation = async () => {
     if (!topic.trim()) return
     setIsStarting(true)
@@ -30,16 +109,18 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ topic })
       })
-      const data: ServerStart = await res.json()
-      if (data.error) {
-        addMsg('agent', `Erreur: ${data.error}`)
+      const data: ServerState = await res.json()
+      if (data.error || !data.session_id) {
+        addMsg('agent', `Erreur: ${data.error ?? 'session indisponible'}`)
         return
       }
       setSessionId(data.session_id)
+      questionNumberRef.current = 0
       setIsChatting(true)
-      if (data.question) {
-        setAgentQuestion(data.question)
-        addMsg('agent', data.question)
+      if (typeof EventSource !== 'undefined') {
+        openStream(data.session_id)
+      } else {
+        handleState(await waitForNext(data.session_id))
       }
     } catch (e: any) {
       addMsg('agent', `Erreur de connexion: ${e?.message ?? e}`)
@@ -48,9 +129,26 @@ function App() {
     }
   }
 
+  // Réponse partielle: le serveur peut commencer à générer la question suivante (sans effet sinon)
+  const onTyping = (partial: string) => {
+    window.clearTimeout(typingTimerRef.current)
+    if (!sessionId || !partial.trim()) return
+    const id = sessionId
+    const number = questionNumberRef.current
+    typingTimerRef.current = window.setTimeout(() => {
+      fetch(`${API_BASE}/typing`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ session_id: id, question_number: number, partial })
+      }).catch(() => {})
+    }, TYPING_PAUSE_MS)
+  }
+
   const sendAnswer = async (answer: string) => {
     if (!sessionId || !answer.trim()) return
+    window.clearTimeout(typingTimerRef.current)
     addMsg('user', answer)
+    setAgentQuestion('')
     inputRef.current && (inputRef.current.value = '')
     try {
       const res = await fetch(`${API_BASE}/chat`, {
@@ -58,19 +156,12 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ session_id: sessionId, answer })
       })
-      const data: ServerChat = await res.json()
-      if (data.question) {
-        setAgentQuestion(data.question)
-        addMsg('agent', data.question)
-      } else if (data.report) {
-        setIsChatting(false)
-        setIsReportReady(true)
-        setIsGeneratingPDF(true)
-        // Afficher un message de transition avant d'activer le téléchargement
-        setTimeout(() => setIsGeneratingPDF(false), 4000)
-      } else if (data.error) {
+      const data: ServerState = await res.json()
+      if (data.error) {
         addMsg('agent', `Erreur: ${data.error}`)
+        return
       }
+      if (!streamRef.current) handleState(await waitForNext(sessionId))
     } catch (e: any) {
       addMsg('agent', `Erreur de connexion: ${e?.message ?? e}`)
     }
@@ -221,6 +312,7 @@ function App() {
                   ref={inputRef}
                   className="flex-1 px-4 py-3 bg-gray-800/50 border border-gray-600/50 rounded-xl text-white placeholder-gray-400 focus:outline-none focus:ring-2 focus:ring-blue-500 focus:border-blue-500 transition-all duration-200"
                   placeholder="Saisissez votre réponse…"
+                  onChange={(e) => onTyping(e.target.value)}
                   onKeyDown={(e) => {
                     if (e.key === 'Enter') sendAnswer((e.target as HTMLInputElement).value)
                   }}
@@ -0,0 +1,324 @@
+"""Régénération en lot des rapports à partir de transcriptions enregistrées (sans entretien).
+
+Entrée: un fichier JSONL ou un dossier de fichiers .json / .jsonl / .md / .txt. Chaque
+enregistrement JSON porte un identifiant (`id` ou `session_id`), un `topic` facultatif et
+soit `exchanges` ([{"question", "answer"}], comme `/trace` et le stockage des sessions),
+soit `transcript` (texte). Un fichier .md / .txt est une transcription, identifiée par
+son nom. Pour chaque transcription: structuration, analyse diagnostique et rédaction,
+puis rendu PDF, écrits dans le dossier de sortie (`<id>-<empreinte>.md` / `.pdf`: l'identifiant
+nettoyé pour le système de fichiers, suivi des 8 premiers caractères du SHA-256 de l'identifiant
+d'origine, pour que deux identifiants proches ne s'écrasent pas). Un identifiant présent deux
+fois dans l'entrée est refusé.
+
+Reprise: chaque rapport terminé est consigné dans `<sortie>/checkpoint.jsonl`; relancer la
+même commande ne traite que les transcriptions restantes ou en échec (`--force`: toutes).
+
+Usage: replay transcripts.jsonl [--output rapports_batch] [--workers 4] [--llm-concurrency 4] [--rpm 60]
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT = "checkpoint.jsonl"
+DEFAULT_TOPIC = "Consultation générale"
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+class BatchItem(NamedTuple):
+    id: str
+    topic: str
+    transcript: str
+
+
+# ---------------- Lecture des transcriptions ----------------
+def load_items(path: str) -> Iterator[BatchItem]:
+    """Transcriptions d'un fichier JSONL ou d'un dossier, dans l'ordre des noms de fichiers."""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            yield from _load_file(os.path.join(path, name))
+    else:
+        yield from _load_file(path)
+
+
+def _load_file(path: str) -> Iterator[BatchItem]:
+    stem, ext = os.path.splitext(os.path.basename(path))
+    ext = ext.lower()
+    if ext in (".md", ".txt"):
+        with open(path, "r", encoding="utf-8") as f:
+            yield _item({"id": stem, "transcript": f.read()}, path)
+    elif ext == ".json":
+        with open(path, "r", encoding="utf-8") as f:
+            record = json.load(f)
+            yield _item({"id": stem, **record} if isinstance(record, dict) else record, path)
+    elif ext == ".jsonl":
+        with open(path, "r", encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                if line.strip():
+                    yield _item(json.loads(line), f"{path}:{number}")
+
+
+def _item(record: Any, origin: str) -> BatchItem:
+    from .transcript import Transcript, clip
+
+    if not isinstance(record, dict):
+        raise ValueError(f"{origin}: objet JSON attendu, {type(record).__name__} trouvé")
+    item_id = record.get("id") or record.get("session_id")
+    if not item_id:
+        raise ValueError(f"{origin}: identifiant manquant ('id' ou 'session_id')")
+    # Même contexte borné que dans l'application web (voir transcript.py)
+    transcript = Transcript()
+    if record.get("exchanges"):
+        exchanges = record["exchanges"]
+        if not isinstance(exchanges, list):
+            raise ValueError(f"{origin}: 'exchanges' doit être une liste")
+        for number, ex in enumerate(exchanges, 1):
+            if not isinstance(ex, dict) or not isinstance(ex.get("question"), str):
+                raise ValueError(f"{origin}: échange {number} sans 'question' (texte)")
+            transcript.add(ex.get("number", number), ex["question"], ex.get("answer") or "")
+        text = transcript.render()
+    elif record.get("transcript"):
+        if not isinstance(record["transcript"], str):
+            raise ValueError(f"{origin}: 'transcript' doit être un texte")
+        text = clip(record["transcript"], transcript.transcript_budget)
+    else:
+        raise ValueError(f"{origin}: ni 'exchanges' ni 'transcript'")
+    return BatchItem(str(item_id), record.get("topic") or DEFAULT_TOPIC, text)
+
+
+# ---------------- Points de reprise ----------------
+class Checkpoint:
+    """Journal JSONL des transcriptions traitées (dernier statut de chaque identifiant)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.done: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    with contextlib.suppress(ValueError):
+                        entry = json.loads(line)
+                        self.done[entry["id"]] = entry
+
+    def completed(self, item_id: str) -> bool:
+        return self.done.get(item_id, {}).get("status") == "ok"
+
+    def record(self, **entry: Any) -> None:
+        entry["finished_at"] = time.time()
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.done[entry["id"]] = entry
+            # Une ligne par rapport, écrite d'un bloc: une interruption perd au plus la ligne en cours
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+
+
+def output_name(item_id: str) -> str:
+    """Nom de fichier (sans extension) propre à un identifiant: nettoyé, suivi d'une empreinte courte."""
+    digest = hashlib.sha256(item_id.encode("utf-8")).hexdigest()[:8]
+    return f"{_UNSAFE.sub('_', item_id)}-{digest}"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+    try:
+        with open(partial, "wb") as f:
+            f.write(data)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.unlink(partial)
+
+
+# ---------------- Exécution ----------------
+class Progress:
+    """Compteurs du lot et ligne d'avancement périodique (stderr)."""
+
+    def __init__(self, total: int, interval: float) -> None:
+        self.total = total
+        self.interval = interval
+        self.ok = 0
+        self.failed = 0
+        self.durations: List[float] = []
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+    def add(self, seconds: Optional[float]) -> None:
+        with self._lock:
+            if seconds is None:
+                self.failed += 1
+            else:
+                self.ok += 1
+                self.durations.append(seconds)
+
+    def line(self) -> str:
+        with self._lock:
+            done, ok, failed = self.ok + self.failed, self.ok, self.failed
+        elapsed = time.perf_counter() - self.started
+        rate = done / elapsed * 60 if elapsed else 0.0
+        eta = f", fin estimée dans {(self.total - done) / rate:.1f} min" if rate and done < self.total else ""
+        return f"{done}/{self.total} traités (ok {ok}, échecs {failed}), {rate:.1f} rapports/min{eta}"
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            print(f"[replay] {self.line()}", file=sys.stderr, flush=True)
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+class BatchRunner:
+    """Rapports d'un lot de transcriptions, `workers` crews en parallèle."""
+
+    def __init__(self, crew_factory, pdf_service, output_dir: str, checkpoint: Checkpoint) -> None:
+        self.crew_factory = crew_factory
+        self.pdf_service = pdf_service
+        self.output_dir = output_dir
+        self.checkpoint = checkpoint
+
+    def process(self, item: BatchItem) -> float:
+        started = time.perf_counter()
+        name = output_name(item.id)
+        crew = self.crew_factory.instance().offline_report_crew(item.transcript)
+        crew.verbose = False
+        for agent in crew.agents:
+            agent.verbose = False
+        report = str(crew.kickoff(inputs={"topic": item.topic, "historique": ""}))
+        report_path = os.path.join(self.output_dir, f"{name}.md")
+        _write_atomic(report_path, report.encode("utf-8"))
+
+        pdf_path = None
+        if self.pdf_service is not None:
+            pdf = self.pdf_service.submit(report).result()
+            pdf_path = os.path.join(self.output_dir, f"{name}.pdf")
+            if pdf.data is not None:
+                _write_atomic(pdf_path, pdf.data)
+            else:
+                with open(pdf.path, "rb") as f:
+                    _write_atomic(pdf_path, f.read())
+        seconds = time.perf_counter() - started
+        self.checkpoint.record(id=item.id, status="ok", seconds=round(seconds, 3), report=report_path, pdf=pdf_path)
+        return seconds
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="fichier JSONL ou dossier de transcriptions")
+    parser.add_argument("--output", default="rapports_batch", help="dossier des rapports et du point de reprise")
+    parser.add_argument("--workers", type=int, default=4, help="transcriptions traitées en parallèle")
+    parser.add_argument("--llm-concurrency", type=int, default=0, help="appels LLM simultanés au plus (0: illimité)")
+    parser.add_argument("--rpm", type=float, default=0, help="appels LLM par minute au plus (0: illimité)")
+    parser.add_argument("--no-pdf", action="store_true", help="rapports markdown seulement")
+    parser.add_argument("--force", action="store_true", help="retraite aussi les transcriptions déjà terminées")
+    parser.add_argument("--limit", type=int, default=0, help="nombre maximal de transcriptions à traiter")
+    parser.add_argument("--progress-s", type=float, default=10, help="intervalle des lignes d'avancement")
+    parser.add_argument("--fake-llm", action="store_true", help="LLM scripté local (essai hors ligne, sans quota)")
+    parser.add_argument("--verbose", action="store_true", help="conserve les logs et sorties du crew")
+    args = parser.parse_args(argv)
+
+    if args.fake_llm:
+        os.environ["PSYCHAT_FAKE_LLM"] = "1"
+        # Hors ligne: ni télémétrie ni traces crewai (à fixer avant l'import de crewai)
+        os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+        os.environ["OTEL_SDK_DISABLED"] = "true"
+        os.environ["CREWAI_TRACING_ENABLED"] = "false"
+    from .crew_factory import CrewFactory
+    from .fake_llm import llm_factory_from_env
+    from .llm_cache import LLMResponseCache
+    from .llm_gateway import LLMGateway
+    from .pdf_service import PDFRenderService
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+    os.makedirs(args.output, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(args.output, CHECKPOINT))
+    items, skipped, seen = [], 0, set()
+    try:
+        for item in load_items(args.input):
+            if item.id in seen:
+                raise ValueError(f"identifiant en double: {item.id}")
+            seen.add(item.id)
+            if not args.force and checkpoint.completed(item.id):
+                skipped += 1
+                continue
+            items.append(item)
+            if args.limit and len(items) >= args.limit:
+                break
+    except (OSError, ValueError) as e:
+        print(f"Lecture des transcriptions impossible: {e}", file=sys.stderr)
+        return 2
+
+    # Processus de rendu démarrés avant les threads des workers
+    pdf_service = None if args.no_pdf else PDFRenderService()
+    if pdf_service is not None:
+        pdf_service.start()
+    # Limites du lot sur le fournisseur principal (en plus de PSYCHAT_LLM_TPM, bascule, etc.)
+    gateway = LLMGateway.from_env(max_concurrent=args.llm_concurrency, rpm=args.rpm)
+    # Actif par défaut en lot (rejeux, reprises du checkpoint); PSYCHAT_LLM_CACHE=0 le désactive
+    llm_cache = LLMResponseCache(default=True)
+    fake_llm = llm_factory_from_env()
+    # Le cache sert avant la passerelle: une réponse déjà connue ne consomme ni créneau ni quota
+    crew_factory = CrewFactory(llm_factory=lambda agent: llm_cache.wrap(
+        gateway.wrap(fake_llm(agent) if fake_llm else agent.llm)
+    ))
+    runner = BatchRunner(crew_factory, pdf_service, args.output, checkpoint)
+
+    print(f"{len(items)} transcription(s) à traiter, {skipped} déjà terminée(s); {args.workers} worker(s), "
+          f"LLM {args.llm_concurrency or 'illimité'} simultané(s), {args.rpm or 'illimité'} /min", file=sys.stderr)
+    progress = Progress(len(items), args.progress_s)
+    threading.Thread(target=progress.run, name="replay-progress", daemon=True).start()
+    interrupted = False
+    pool = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="replay-worker")
+    try:
+        with contextlib.ExitStack() as quiet:
+            if not args.verbose:
+                quiet.enter_context(contextlib.redirect_stdout(quiet.enter_context(open(os.devnull, "w"))))
+            futures = {pool.submit(runner.process, item): item for item in items}
+            for future in as_completed(futures):
+                item = futures[future]
+                try:
+                    progress.add(future.result())
+                except Exception as e:
+                    logger.error(f"Transcription {item.id} en échec: {str(e)}")
+                    checkpoint.record(id=item.id, status="error", error=str(e))
+                    progress.add(None)
+    except KeyboardInterrupt:
+        interrupted = True
+        print("Interruption: fin des rapports en cours; relancer la même commande pour reprendre", file=sys.stderr)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        progress.stop()
+        if pdf_service is not None:
+            pdf_service.shutdown()
+        gateway.close()
+
+    elapsed = time.perf_counter() - progress.started
+    print(f"Terminé en {elapsed:.1f} s: {progress.line()}")
+    if progress.durations:
+        from .loadtest import percentile
+
+        durations = progress.durations
+        waited = sum(gateway.stats()[p.name]["waited_s"] for p in gateway.providers)
+        print(f"  durée par rapport: p50 {percentile(durations, 50):.2f} s, p95 {percentile(durations, 95):.2f} s, "
+              f"max {max(durations):.2f} s; attente de la limite LLM {waited:.1f} s au total")
+    cache = llm_cache.stats()
+    print(f"  cache LLM: {cache['hits']} succès, {cache['misses']} échecs; sortie: {args.output}")
+    return 130 if interrupted else (1 if progress.failed else 0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
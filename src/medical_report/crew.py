@@ -1,6 +1,7 @@
 
 from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
+from crewai.tasks.task_output import TaskOutput
 from .tools.custom_tool import AskPatientTool, AnalyzePatientResponseTool
 
 
@@ -15,7 +16,6 @@ class MedicalReportCrew():
         return Agent(
             config=self.agents_config['interviewer_clinique'],
             tools=[AskPatientTool(), AnalyzePatientResponseTool()],
-            memory=True,
             temperature=0.9,
             verbose=True
         )
@@ -36,10 +36,14 @@ class MedicalReportCrew():
 
     @agent
     def redacteur_medical(self) -> Agent:
-        return Agent(
-            config=self.agents_config['redacteur_medical'], 
+        redacteur = Agent(
+            config=self.agents_config['redacteur_medical'],
             verbose=True
         )
+        # Génération en flux: chaque fragment est émis sur le bus d'événements (LLMStreamChunkEvent)
+        if hasattr(redacteur.llm, 'stream'):
+            redacteur.llm.stream = True
+        return redacteur
 
    
     @task
@@ -70,8 +74,81 @@ class MedicalReportCrew():
         return Task(
             config=self.tasks_config['tache_redaction_rapport_final'],
             agent=self.redacteur_medical(),
-            context=[self.tache_analyse_diagnostique()],
-            output_file='rapport_psychiatrique.md'
+            context=[self.tache_analyse_diagnostique()]
+        )
+
+    # Tâche hors séquence (pas de @task): exécutée à chaque échange en mode pipeline
+    def tache_structuration_incrementale(self) -> Task:
+        return Task(
+            config=self.tasks_config['tache_structuration_incrementale'],
+            agent=self.analyste_clinique(),
+            name='tache_structuration_incrementale'
+        )
+
+    # Tâche hors séquence: dossier, synthèse et rapport en une seule génération (mode rapide)
+    def tache_rapport_rapide(self) -> Task:
+        return Task(
+            config=self.tasks_config['tache_rapport_rapide'],
+            agent=self.redacteur_medical(),
+            name='tache_rapport_rapide',
+            context=[self.tache_entretien_interactif()]
+        )
+
+    # ---------------- Mode pipeline ----------------
+    def interview_crew(self) -> Crew:
+        """Crew réduit à l'entretien: la structuration se fait en parallèle, échange par échange."""
+        return Crew(
+            agents=[self.interviewer_clinique()],
+            tasks=[self.tache_entretien_interactif()],
+            process=Process.sequential,
+            verbose=True
+        )
+
+    def report_crew(self, dossier: str) -> Crew:
+        """Crew d'analyse et de rédaction, à partir d'un dossier déjà structuré."""
+        structuration = self.tache_structuration_dossier()
+        # Sortie fournie d'avance: la tâche sert uniquement de contexte à l'analyse diagnostique
+        structuration.output = TaskOutput(
+            description=structuration.description,
+            name=structuration.name,
+            expected_output=structuration.expected_output,
+            raw=dossier,
+            agent=self.analyste_clinique().role
+        )
+        return Crew(
+            agents=[self.synthetiseur_diagnostique(), self.redacteur_medical()],
+            tasks=[self.tache_analyse_diagnostique(), self.tache_redaction_rapport_final()],
+            process=Process.sequential,
+            verbose=True
+        )
+
+    # ---------------- Mode rapide ----------------
+    def fast_report_crew(self) -> Crew:
+        """Entretien puis un seul appel LLM pour le dossier, la synthèse et le rapport."""
+        return Crew(
+            agents=[self.interviewer_clinique(), self.redacteur_medical()],
+            tasks=[self.tache_entretien_interactif(), self.tache_rapport_rapide()],
+            process=Process.sequential,
+            verbose=True
+        )
+
+    # ---------------- Mode batch ----------------
+    def offline_report_crew(self, transcript: str) -> Crew:
+        """Structuration, analyse et rédaction à partir d'une transcription enregistrée (sans entretien)."""
+        interview = self.tache_entretien_interactif()
+        # Sortie fournie d'avance: l'entretien sert uniquement de contexte à la structuration
+        interview.output = TaskOutput(
+            description=interview.description,
+            name=interview.name,
+            expected_output=interview.expected_output,
+            raw=transcript,
+            agent=self.interviewer_clinique().role
+        )
+        return Crew(
+            agents=[self.analyste_clinique(), self.synthetiseur_diagnostique(), self.redacteur_medical()],
+            tasks=[self.tache_structuration_dossier(), self.tache_analyse_diagnostique(), self.tache_redaction_rapport_final()],
+            process=Process.sequential,
+            verbose=True
         )
 
     @crew
@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import yaml
+from crewai import Crew
+
+from .crew import MedicalReportCrew
+
+logger = logging.getLogger(__name__)
+
+# Entrées de kickoff que les templates YAML ont le droit de référencer
+KNOWN_INPUTS = ('topic', 'historique')
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class CrewConfigError(ValueError):
+    """Configuration YAML des agents/tâches invalide."""
+
+
+class CrewFactory:
+    """Fabrique de crews à partir de templates YAML parsés et validés une seule fois.
+
+    - `config/agents.yaml` et `config/tasks.yaml` sont lus au démarrage puis validés
+      (clés obligatoires, références agent/contexte, méthodes @agent/@task, variables)
+    - Rechargement à chaud si la date de modification d'un fichier change; une
+      configuration invalide est signalée et la précédente reste en service
+    - `build()` n'instancie plus que les Agents/Tasks de la session (aucun accès YAML)
+    - `llm_factory(agent)`, si fourni, remplace le LLM de chaque agent (LLM scripté des tests de charge)
+    - `tool_handlers` ({classe d'outil: handler}): les outils des agents d'une session sont
+      liés à celle-ci (`SessionBoundTool.attach`)
+    """
+
+    def __init__(
+        self,
+        crew_class=MedicalReportCrew,
+        llm_factory: Optional[Callable[[Any], Any]] = None,
+        tool_handlers: Optional[Dict[type, Callable[..., str]]] = None,
+    ) -> None:
+        self.crew_class = crew_class
+        self.llm_factory = llm_factory
+        self.tool_handlers = tool_handlers or {}
+        base_dir = crew_class.base_directory
+        self.agents_path = os.path.join(base_dir, crew_class.original_agents_config_path)
+        self.tasks_path = os.path.join(base_dir, crew_class.original_tasks_config_path)
+
+        self._lock = threading.Lock()
+        self._mtimes: Tuple[float, float] = (0.0, 0.0)
+        self._agents: Dict[str, Dict[str, Any]] = {}
+        self._tasks: Dict[str, Dict[str, Any]] = {}
+        self._reload()
+
+        factory = self
+
+        class TemplatedCrew(crew_class):
+            def load_configurations(self):
+                self.agents_config, self.tasks_config = factory.templates()
+
+        self._templated_class = TemplatedCrew
+
+    # ---------------- Chargement ----------------
+    def _current_mtimes(self) -> Tuple[float, float]:
+        return (os.path.getmtime(self.agents_path), os.path.getmtime(self.tasks_path))
+
+    def _reload(self) -> None:
+        mtimes = self._current_mtimes()
+        with open(self.agents_path, "r", encoding="utf-8") as f:
+            agents = yaml.safe_load(f) or {}
+        with open(self.tasks_path, "r", encoding="utf-8") as f:
+            tasks = yaml.safe_load(f) or {}
+        self._validate(agents, tasks)
+        self._agents, self._tasks, self._mtimes = agents, tasks, mtimes
+        logger.info(f"Templates du crew chargés: {len(agents)} agents, {len(tasks)} tâches")
+
+    def refresh(self) -> bool:
+        """Recharge les templates si un fichier a changé. Retourne True en cas de rechargement."""
+        try:
+            mtimes = self._current_mtimes()
+        except OSError as e:
+            logger.error(f"Configuration du crew inaccessible: {str(e)}")
+            return False
+        if mtimes == self._mtimes:
+            return False
+        with self._lock:
+            if mtimes == self._mtimes:
+                return False
+            try:
+                self._reload()
+            except (CrewConfigError, yaml.YAMLError) as e:
+                # Ne pas retenter à chaque session tant que le fichier n'est pas corrigé
+                self._mtimes = mtimes
+                logger.error(f"Configuration du crew invalide, conservation de la précédente: {str(e)}")
+                return False
+        return True
+
+    def _validate(self, agents: Dict[str, Any], tasks: Dict[str, Any]) -> None:
+        errors = []
+        members = {n: getattr(self.crew_class, n, None) for n in dir(self.crew_class)}
+        agent_methods = {n for n, f in members.items() if getattr(f, "is_agent", False)}
+        # Tâches séquentielles (@task) ou exécutées à part (méthode simple du même nom)
+        task_methods = {n for n, f in members.items() if callable(f) and n.startswith("tache_")}
+
+        for name, cfg in agents.items():
+            if name not in agent_methods:
+                errors.append(f"agent '{name}' sans méthode @agent correspondante")
+            for key in ("role", "goal", "backstory"):
+                if not isinstance((cfg or {}).get(key), str) or not cfg[key].strip():
+                    errors.append(f"agent '{name}': champ '{key}' manquant")
+        for name, cfg in tasks.items():
+            cfg = cfg or {}
+            if name not in task_methods:
+                errors.append(f"tâche '{name}' sans méthode correspondante")
+            for key in ("description", "expected_output"):
+                if not isinstance(cfg.get(key), str) or not cfg[key].strip():
+                    errors.append(f"tâche '{name}': champ '{key}' manquant")
+            if cfg.get("agent") not in agents:
+                errors.append(f"tâche '{name}': agent inconnu '{cfg.get('agent')}'")
+            for dep in cfg.get("context") or []:
+                if dep not in tasks:
+                    errors.append(f"tâche '{name}': contexte inconnu '{dep}'")
+
+        templates = [v for cfg in agents.values() for v in (cfg or {}).values() if isinstance(v, str)]
+        templates += [v for cfg in tasks.values() for v in (cfg or {}).values() if isinstance(v, str)]
+        for text in templates:
+            for var in _PLACEHOLDER.findall(text):
+                if var not in KNOWN_INPUTS:
+                    errors.append(f"variable inconnue '{{{var}}}'")
+        if errors:
+            raise CrewConfigError("; ".join(sorted(set(errors))))
+
+    # ---------------- Construction ----------------
+    def templates(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Copies des configs validées: CrewBase remplace en place noms d'agents et contextes."""
+        with self._lock:
+            agents, tasks = self._agents, self._tasks
+        return (
+            {name: dict(cfg) for name, cfg in agents.items()},
+            {name: dict(cfg) for name, cfg in tasks.items()},
+        )
+
+    def instance(self, session_id: Optional[str] = None):
+        """Instance MedicalReportCrew alimentée par les templates (accès aux crews du mode pipeline)."""
+        self.refresh()
+        instance = self._templated_class()
+        bind_tools = session_id is not None and self.tool_handlers
+        if self.llm_factory is not None or bind_tools:
+            # Agents mémoïsés par instance: le remplacement vaut pour tous les crews construits ensuite
+            for name in instance.agents_config:
+                agent = getattr(instance, name)()
+                if self.llm_factory is not None:
+                    agent.llm = self.llm_factory(agent)
+                if bind_tools:
+                    # Outils propres à l'instance, déjà partagés avec les tâches créées à l'initialisation
+                    for tool in agent.tools or []:
+                        handler = self.tool_handlers.get(type(tool))
+                        if handler is not None:
+                            tool.attach(session_id, handler)
+        return instance
+
+    def build(self, session_id: Optional[str] = None) -> Crew:
+        """Crew prêt pour une session; seules les entrées de kickoff restent à fournir."""
+        crew = self.instance(session_id).crew()
+        if session_id:
+            crew.name = f"psychat-{session_id[:8]}"
+        return crew
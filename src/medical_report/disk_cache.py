@@ -0,0 +1,69 @@
+"""Répertoires de cache évincés par âge puis par taille (réponses LLM, PDF rendus).
+
+- Une entrée = un fichier `<clé><suffixe>`; sa date de dernier service est son mtime
+  (`touch` à chaque lecture), ce qui donne l'ordre LRU sans index à maintenir
+- Écriture atomique: contenu écrit dans `partial(path)` puis renommé (`os.replace`);
+  un lecteur ne voit jamais d'entrée tronquée
+- `sweep`: supprime les entrées plus vieilles que `max_age`, puis les moins récemment
+  servies tant que le total dépasse `max_bytes`; les `.part` abandonnés (processus tué
+  pendant l'écriture) sont supprimés après `PARTIAL_MAX_AGE` et ne comptent pas dans le total
+"""
+import os
+import threading
+import time
+from typing import Tuple
+
+# Une écriture en cours dure quelques secondes: au-delà, le fichier temporaire est orphelin
+PARTIAL_MAX_AGE = 3600.0
+
+
+def partial(path: str) -> str:
+    """Fichier temporaire propre au processus et au thread qui écrit `path`."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+
+
+def touch(path: str) -> None:
+    """Date de dernier service = mtime (ordre LRU du cache)."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def sweep(directory: str, suffix: str, max_bytes: int, max_age: float) -> Tuple[int, int]:
+    """Évince les entrées de `directory`; retourne (entrées évincées, octets restants)."""
+    now = time.time()
+    evicted = 0
+    entries = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        age = now - st.st_mtime
+        if name.endswith(".part"):
+            if age > min(max_age, PARTIAL_MAX_AGE):
+                _unlink(path)
+        elif not name.endswith(suffix):
+            continue
+        elif age > max_age:
+            evicted += _unlink(path)
+        else:
+            entries.append((st.st_mtime, st.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        evicted += _unlink(path)
+        total -= size
+    return evicted, total
+
+
+def _unlink(path: str) -> int:
+    try:
+        os.unlink(path)
+    except OSError:
+        return 0
+    return 1
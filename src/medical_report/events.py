@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+Event = Tuple[int, str, Dict[str, Any]]
+
+
+class SessionEvents:
+    """Journal d'événements d'une session, diffusé aux clients SSE.
+
+    - Append-only, identifiants croissants: un client reconnecté reprend via Last-Event-ID
+    - Borné (`max_events`): les plus anciens fragments sont oubliés en premier
+    - Plusieurs flux peuvent lire le même journal en parallèle
+    - `wait()` bloque le thread appelant; `wait_async()` attend sur une future asyncio
+      (mode ASGI): un lecteur inactif ne retient aucun thread
+    """
+
+    def __init__(self, max_events: int = 5000) -> None:
+        self.max_events = max_events
+        self._events: List[Event] = []
+        self._next_id = 1
+        self._closed = False
+        self._cond = threading.Condition()
+        # Lecteurs asyncio en attente: (boucle, future) réveillés par publish/close
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]] = []
+
+    def publish(self, event: str, data: Optional[Dict[str, Any]] = None) -> int:
+        with self._cond:
+            event_id = self._next_id
+            self._next_id += 1
+            self._events.append((event_id, event, data or {}))
+            if len(self._events) > self.max_events:
+                del self._events[: len(self._events) - self.max_events]
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        _wake(waiters)
+        return event_id
+
+    def close(self) -> None:
+        """Marque la fin du flux: les lecteurs terminent après les derniers événements."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            waiters, self._waiters = self._waiters, []
+        _wake(waiters)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def wait(self, after_id: int, timeout: float) -> List[Event]:
+        """Retourne les événements d'identifiant > after_id, en attendant au plus `timeout` secondes."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._closed or self._last_id() > after_id, timeout=timeout)
+            return [e for e in self._events if e[0] > after_id]
+
+    async def wait_async(self, after_id: int, timeout: float) -> List[Event]:
+        """Comme `wait()`, depuis une coroutine: attente sur une future de la boucle courante."""
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            if self._closed or self._last_id() > after_id:
+                return [e for e in self._events if e[0] > after_id]
+            waiter = (loop, loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await asyncio.wait([waiter[1]], timeout=timeout)
+        finally:
+            with self._cond:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        with self._cond:
+            return [e for e in self._events if e[0] > after_id]
+
+    @property
+    def last_id(self) -> int:
+        with self._cond:
+            return self._last_id()
+
+    def _last_id(self) -> int:
+        return self._events[-1][0] if self._events else 0
+
+
+def _wake(waiters: List[Tuple[asyncio.AbstractEventLoop, "asyncio.Future[None]"]]) -> None:
+    # Appelé depuis le thread du crew: la future est résolue dans le thread de sa boucle
+    for loop, future in waiters:
+        try:
+            loop.call_soon_threadsafe(_resolve, future)
+        except RuntimeError:
+            # Boucle arrêtée (serveur en cours d'arrêt)
+            pass
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+def format_sse(event_id: int, event: str, data: Dict[str, Any]) -> str:
+    """Sérialise un événement au format text/event-stream."""
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"id: {event_id}\nevent: {event}\ndata: {payload}\n\n"
+
+
+class FinalAnswerFilter:
+    """Ne laisse passer que le texte suivant le marqueur 'Final Answer:' d'une génération en flux.
+
+    Les agents CrewAI raisonnent au format ReAct (Thought/Action/Final Answer);
+    seul le contenu du rapport doit être poussé au client.
+    """
+
+    MARKER = "Final Answer:"
+
+    def __init__(self, marker: Optional[Pattern[str]] = None) -> None:
+        # `marker`: motif à attendre à la place de 'Final Answer:' (p. ex. début de section)
+        self._marker = marker
+        self._buffer = ""
+        self._open = False
+
+    def feed(self, chunk: str) -> str:
+        if self._open:
+            return chunk
+        self._buffer += chunk
+        if self._marker is None:
+            idx = self._buffer.find(self.MARKER)
+            end = idx + len(self.MARKER)
+        else:
+            match = self._marker.search(self._buffer)
+            idx, end = (match.start(), match.end()) if match else (-1, 0)
+        if idx < 0:
+            return ""
+        self._open = True
+        text = self._buffer[end:].lstrip()
+        self._buffer = ""
+        return text
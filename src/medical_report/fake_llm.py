@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from crewai.events import LLMCallCompletedEvent, LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+
+logger = logging.getLogger(__name__)
+
+# Nom de l'outil d'entretien (voir tools/custom_tool.py)
+ASK_TOOL = "Poser une Question au Patient"
+
+QUESTIONS = (
+    "Pouvez-vous me décrire ce qui vous amène à consulter aujourd'hui ?",
+    "Depuis quand ressentez-vous ces difficultés ?",
+    "Comment qualifieriez-vous votre sommeil ces dernières semaines ?",
+    "Avez-vous remarqué des changements d'appétit ou de poids ?",
+    "Comment se passent vos journées au travail ou dans vos activités ?",
+    "Avez-vous des antécédents de suivi psychologique ou psychiatrique ?",
+    "Prenez-vous actuellement des traitements ?",
+    "Pouvez-vous parler de votre entourage et du soutien dont vous disposez ?",
+    "Vous arrive-t-il d'avoir des idées noires ?",
+    "Qu'attendez-vous de cette consultation ?",
+)
+
+# Questions résumées par la mémoire bornée de l'interviewer (voir transcript.py)
+_MEMORY_ASKED = re.compile(r"(\d+) question\(s\) déjà posée\(s\)")
+
+DOSSIER = "# Dossier patient\n## Symptômes\n- Anxiété, insomnie"
+
+ANALYSE = "## Analyse\n- Hypothèse principale: trouble anxieux"
+
+REPORT = """# Rapport psychiatrique
+
+## Motif de consultation
+Le patient consulte pour une **anxiété** persistante associée à des *troubles du sommeil*.
+
+## Histoire du problème
+- Début des symptômes il y a environ trois mois
+- Aggravation progressive en lien avec une surcharge professionnelle
+
+## Symptômes
+1. Insomnie d'endormissement
+2. Ruminations anxieuses
+3. Fatigue diurne
+
+## Conclusion
+Tableau compatible avec un trouble anxieux; un suivi est proposé à quatre semaines."""
+
+
+class ScriptedLLM(BaseLLM):
+    """LLM local déterministe pour les benchmarks et tests de charge (aucun appel réseau).
+
+    Les réponses suivent un script par tâche: l'interviewer pose les questions de
+    `QUESTIONS` via l'outil jusqu'à `max_questions`, les autres agents renvoient un
+    contenu fixe. Chaque appel dure `latency` secondes, plus un aléa dans
+    `[0, jitter]` tiré d'un générateur initialisé par `seed`, plus la génération de
+    la réponse à `tokens_per_second` (estimation: 4 caractères par token; 0 = instantanée). Les événements du bus
+    (début, fragments en mode `stream`, fin) sont émis comme par un vrai LLM.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        seed: int = 0,
+        stream: bool = False,
+        chunk_size: int = 16,
+        max_questions: int = 10,
+        tokens_per_second: float = 0.0,
+    ) -> None:
+        super().__init__(model="psychat-scripted")
+        self.latency = latency
+        self.jitter = jitter
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_questions = max_questions
+        self.tokens_per_second = tokens_per_second
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> str:
+        crewai_event_bus.emit(self, LLMCallStartedEvent(
+            messages=messages, from_task=from_task, from_agent=from_agent, model=self.model
+        ))
+        with self._lock:
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        response = self._script(_as_text(messages), getattr(from_task, "name", None))
+        if self.tokens_per_second:
+            delay += len(response) / 4 / self.tokens_per_second
+        time.sleep(delay)
+
+        if self.stream:
+            for i in range(0, len(response), self.chunk_size):
+                crewai_event_bus.emit(self, LLMStreamChunkEvent(
+                    chunk=response[i:i + self.chunk_size], from_task=from_task, from_agent=from_agent
+                ))
+        crewai_event_bus.emit(self, LLMCallCompletedEvent(
+            messages=messages, response=response, call_type=LLMCallType.LLM_CALL,
+            from_task=from_task, from_agent=from_agent, model=self.model
+        ))
+        return response
+
+    def supports_function_calling(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return 128_000
+
+    # ---------------- Script ----------------
+    def _script(self, text: str, task_name: Optional[str]) -> str:
+        if ASK_TOOL in text and task_name in (None, "tache_entretien_interactif"):
+            asked = text.count(f"Action: {ASK_TOOL}\n")
+            memory = _MEMORY_ASKED.search(text)
+            if memory:
+                asked += int(memory.group(1))
+            if asked >= self.max_questions or "MAX_QUESTIONS_REACHED" in text:
+                return "Thought: L'entretien est complet.\nFinal Answer: ## Transcription de l'entretien\n" + "\n".join(
+                    f"- **Question {i + 1}:** {q}" for i, q in enumerate(QUESTIONS[:self.max_questions])
+                )
+            question = QUESTIONS[asked % len(QUESTIONS)]
+            return (
+                "Thought: Je pose la question suivante.\n"
+                f"Action: {ASK_TOOL}\n"
+                f"Action Input: {json.dumps({'question': question}, ensure_ascii=False)}"
+            )
+        if task_name == "tache_structuration_incrementale":
+            return (
+                "Thought: J'extrais les informations.\nFinal Answer: "
+                "- [Motif de consultation] Anxiété persistante\n- [Symptômes] Insomnie d'endormissement"
+            )
+        if task_name == "tache_structuration_dossier":
+            return f"Thought: Je structure le dossier.\nFinal Answer: {DOSSIER}"
+        if task_name == "tache_analyse_diagnostique":
+            return f"Thought: J'analyse.\nFinal Answer: {ANALYSE}"
+        if task_name == "tache_rapport_rapide":
+            return (
+                "Thought: Je structure, j'analyse puis je rédige.\nFinal Answer: "
+                f"=== DOSSIER ===\n{DOSSIER}\n=== SYNTHÈSE ===\n{ANALYSE}\n=== RAPPORT ===\n{REPORT}"
+            )
+        return f"Thought: Je rédige le rapport.\nFinal Answer: {REPORT}"
+
+
+def _as_text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+def llm_factory_from_env() -> Optional[Callable[[Any], BaseLLM]]:
+    """Fabrique de LLM scripté si PSYCHAT_FAKE_LLM est activé, None sinon.
+
+    PSYCHAT_FAKE_LLM_LATENCY / PSYCHAT_FAKE_LLM_JITTER (ms), PSYCHAT_FAKE_LLM_TOKENS_PER_S
+    et PSYCHAT_FAKE_LLM_SEED règlent la latence simulée. Le mode flux de l'agent remplacé est conservé.
+    """
+    if os.getenv("PSYCHAT_FAKE_LLM", "").lower() not in ("1", "true", "yes"):
+        return None
+    latency = float(os.getenv("PSYCHAT_FAKE_LLM_LATENCY", "50")) / 1000
+    jitter = float(os.getenv("PSYCHAT_FAKE_LLM_JITTER", "0")) / 1000
+    seed = int(os.getenv("PSYCHAT_FAKE_LLM_SEED", "0"))
+    tokens_per_second = float(os.getenv("PSYCHAT_FAKE_LLM_TOKENS_PER_S", "0"))
+    logger.warning(f"LLM scripté actif (latence {latency * 1000:.0f} ms ± {jitter * 1000:.0f} ms): aucun appel API")
+
+    def factory(agent: Any) -> BaseLLM:
+        return ScriptedLLM(
+            latency, jitter, seed, stream=bool(getattr(agent.llm, "stream", False)), tokens_per_second=tokens_per_second
+        )
+
+    return factory
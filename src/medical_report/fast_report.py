@@ -0,0 +1,29 @@
+import re
+from typing import Dict
+
+# Sections produites en une seule génération par `tache_rapport_rapide`, dans l'ordre
+FAST_REPORT_SECTIONS = ("dossier", "synthese", "rapport")
+
+# Ligne de séparation "=== DOSSIER ===" (espaces, accents et casse tolérés)
+_SEPARATOR = re.compile(r"^[ \t]*=+[ \t]*(DOSSIER|SYNTH[ÈE]SE|RAPPORT)[ \t]*=+[ \t]*$", re.IGNORECASE | re.MULTILINE)
+
+# Début de la section rapport: seul ce texte est diffusé au client pendant la génération
+REPORT_SEPARATOR = re.compile(r"=+[ \t]*RAPPORT[ \t]*=+", re.IGNORECASE)
+
+
+def split_fast_report(raw: str) -> Dict[str, str]:
+    """Découpe la réponse du mode rapide en dossier, synthèse et rapport.
+
+    Sans séparateur reconnu, la réponse entière est considérée comme le rapport
+    (le patient obtient toujours un document, même si le format n'est pas respecté).
+    """
+    sections = {name: "" for name in FAST_REPORT_SECTIONS}
+    matches = list(_SEPARATOR.finditer(raw))
+    if not any(m.group(1).upper() == "RAPPORT" for m in matches):
+        sections["rapport"] = raw.strip()
+        return sections
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(raw)
+        name = match.group(1).upper().replace("È", "E").lower()
+        sections[name] = raw[match.end():end].strip()
+    return sections
@@ -0,0 +1,242 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from crewai.events import LLMCallCompletedEvent, LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+
+from . import disk_cache
+from .private_files import open_private, private_dir
+
+logger = logging.getLogger(__name__)
+
+# Tâches dont la réponse ne dépend que du prompt (pas d'outil, pas de patient):
+# structuration, analyse et rédaction après l'entretien (ou leur version en un appel),
+# structuration incrémentale
+CACHED_TASKS = (
+    'tache_structuration_incrementale',
+    'tache_structuration_dossier',
+    'tache_analyse_diagnostique',
+    'tache_redaction_rapport_final',
+    'tache_rapport_rapide',
+)
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LLMResponseCache:
+    """Cache disque des réponses LLM, à correspondance exacte.
+
+    - Clé = SHA-256 de (rôle de l'agent, tâche, modèle, température, messages normalisés:
+      espaces consécutifs réduits); une transcription identique (rejeu QA, démo,
+      reprise après timeout) réutilise l'analyse et le rapport sans appel au fournisseur
+    - Seules les tâches de `tasks` sont servies depuis le cache; l'entretien reste dynamique
+    - Un fichier JSON par réponse, écrit atomiquement; taille bornée (`max_bytes`) avec
+      éviction des moins récemment servies (mtime), et âge maximal (`max_age`)
+
+    Les entrées contiennent les transcriptions des patients: sans PSYCHAT_LLM_CACHE, le cache
+    n'est actif que si l'appelant le demande (`default=True`: rejeux en lot et QA), pas pour
+    l'application web dont les sessions sont effacées à /cleanup.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        tasks=None,
+        enabled: Optional[bool] = None,
+        default: bool = False,
+    ) -> None:
+        if enabled is None:
+            enabled = os.getenv("PSYCHAT_LLM_CACHE", "1" if default else "0").lower() not in ("0", "false", "no")
+        self.enabled = enabled
+        self.cache_dir = cache_dir or os.getenv(
+            "PSYCHAT_LLM_CACHE_DIR", os.path.join(tempfile.gettempdir(), "psychat_llm_cache")
+        )
+        self.max_bytes = max_bytes or int(os.getenv("PSYCHAT_LLM_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+        self.max_age = max_age or float(os.getenv("PSYCHAT_LLM_CACHE_MAX_AGE", str(7 * 86400)))
+        self.tasks = frozenset(tasks if tasks is not None else CACHED_TASKS)
+
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"hits": 0, "misses": 0, "stores": 0, "evicted": 0}
+        self._bytes = 0
+        if self.enabled:
+            # Prompts et réponses contiennent celles du patient: réservés à l'utilisateur du serveur
+            private_dir(self.cache_dir)
+            self.sweep()
+
+    # ---------------- Clés ----------------
+    def key(self, agent: Optional[str], task: Optional[str], model: str, temperature: Any, messages: Any) -> str:
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        normalized = [
+            (m.get("role"), _WHITESPACE.sub(" ", str(m.get("content", ""))).strip()) for m in messages
+        ]
+        payload = json.dumps([agent, task, model, temperature, normalized], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    # ---------------- Lecture / écriture ----------------
+    def get(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                response = json.load(f)["response"]
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self._counters["misses"] += 1
+            return None
+        disk_cache.touch(path)
+        with self._lock:
+            self._counters["hits"] += 1
+        return response
+
+    def put(self, key: str, response: str, **meta: Any) -> None:
+        path = self.path(key)
+        data = json.dumps({"response": response, "created": time.time(), **meta}, ensure_ascii=False).encode("utf-8")
+        partial = disk_cache.partial(path)
+        try:
+            with open_private(partial) as f:
+                f.write(data)
+            os.replace(partial, path)
+        except OSError as e:
+            logger.error(f"Écriture du cache LLM impossible: {str(e)}")
+            with contextlib.suppress(OSError):
+                os.unlink(partial)
+            return
+        with self._lock:
+            self._counters["stores"] += 1
+            self._bytes += len(data)
+            over = self._bytes > self.max_bytes
+        if over:
+            self.sweep()
+
+    def wrap(self, llm: BaseLLM) -> BaseLLM:
+        """LLM de l'agent servi depuis le cache pour les tâches de `tasks` (inchangé si désactivé)."""
+        return CachedLLM(llm, self) if self.enabled else llm
+
+    # ---------------- Éviction ----------------
+    def sweep(self) -> None:
+        """Évince les réponses trop anciennes puis les moins récemment servies au-delà de `max_bytes`."""
+        evicted, total = disk_cache.sweep(self.cache_dir, ".json", self.max_bytes, self.max_age)
+        with self._lock:
+            self._counters["evicted"] += evicted
+            self._bytes = total
+
+    # ---------------- Compteurs ----------------
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+class WrappedLLM(BaseLLM):
+    """Enveloppe d'un LLM CrewAI: attributs, mots d'arrêt et mode flux délégués au LLM enveloppé."""
+
+    def __init__(self, llm: BaseLLM) -> None:
+        self._llm = llm
+        super().__init__(model=llm.model, temperature=getattr(llm, "temperature", None), stop=llm.stop)
+
+    # L'exécuteur CrewAI ajoute ses mots d'arrêt à `llm.stop`; le redacteur active `stream`
+    @property
+    def stop(self) -> List[str]:
+        return self._llm.stop
+
+    @stop.setter
+    def stop(self, value: List[str]) -> None:
+        self._llm.stop = value
+
+    @property
+    def stream(self) -> bool:
+        return bool(getattr(self._llm, "stream", False))
+
+    @stream.setter
+    def stream(self, value: bool) -> None:
+        self._llm.stream = value
+
+    def __getattr__(self, name: str) -> Any:
+        # Appelé seulement pour les attributs absents de l'enveloppe
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._llm, name)
+
+    def supports_stop_words(self) -> bool:
+        return self._llm.supports_stop_words()
+
+    def supports_function_calling(self) -> bool:
+        return self._llm.supports_function_calling()
+
+    def get_context_window_size(self) -> int:
+        return self._llm.get_context_window_size()
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        return self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+
+    def _replay(self, messages: Any, response: str, from_task: Any, from_agent: Any) -> None:
+        """Événements d'un appel servi sans génération (début, fragment unique en mode flux, fin)."""
+        crewai_event_bus.emit(self, LLMCallStartedEvent(
+            messages=messages, from_task=from_task, from_agent=from_agent, model=self.model
+        ))
+        if self.stream:
+            crewai_event_bus.emit(self, LLMStreamChunkEvent(chunk=response, from_task=from_task, from_agent=from_agent))
+        crewai_event_bus.emit(self, LLMCallCompletedEvent(
+            messages=messages, response=response, call_type=LLMCallType.LLM_CALL,
+            from_task=from_task, from_agent=from_agent, model=self.model
+        ))
+
+
+class CachedLLM(WrappedLLM):
+    """Enveloppe d'un LLM CrewAI: réponses des tâches cachables lues/écrites dans `cache`.
+
+    Sur un succès de cache, les événements du bus (début, fragment unique en mode flux, fin)
+    sont émis comme pour un vrai appel: diffusion SSE du rapport et métriques inchangées.
+    """
+
+    def __init__(self, llm: BaseLLM, cache: LLMResponseCache) -> None:
+        self._cache = cache
+        super().__init__(llm)
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        task = getattr(from_task, "name", None)
+        if task not in self._cache.tasks or tools:
+            return self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+
+        key = self._cache.key(getattr(from_agent, "role", None), task, self.model, self.temperature, messages)
+        response = self._cache.get(key)
+        if response is not None:
+            logger.info(f"Réponse LLM servie depuis le cache ({task}, {key[:12]})")
+            self._replay(messages, response, from_task, from_agent)
+            return response
+
+        response = self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+        if isinstance(response, str) and response.strip():
+            self._cache.put(key, response, task=task, model=self.model)
+        return response
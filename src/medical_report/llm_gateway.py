@@ -0,0 +1,428 @@
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from crewai.events import LLMStreamChunkEvent, crewai_event_bus
+from crewai.llms.base_llm import BaseLLM
+
+from .llm_cache import WrappedLLM
+from .transcript import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Priorités d'accès au fournisseur (la plus petite passe en premier)
+INTERACTIVE = 0   # tour d'entretien attendu par le patient
+SPECULATIVE = 1   # pré-génération de la question suivante
+BACKGROUND = 2    # structuration, analyse, rédaction, lot
+
+INTERACTIVE_TASKS = ('tache_entretien_interactif',)
+
+# Priorité imposée par l'appelant (pré-génération, lot); sinon déduite de la tâche
+_priority: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("psychat_llm_priority", default=None)
+
+# Erreurs après lesquelles un autre fournisseur (ou un nouvel essai) a des chances d'aboutir
+_RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504, 529)
+_RETRYABLE_ERRORS = ('RateLimitError', 'ServiceUnavailableError', 'InternalServerError', 'APIConnectionError',
+                     'Timeout', 'APITimeoutError', 'ConnectError', 'ReadTimeout')
+
+
+# Fragments de flux émis par chaque thread (les handlers du bus s'exécutent dans le thread
+# de l'appel): un appel qui a déjà diffusé du texte n'est pas réessayé
+_streamed = threading.local()
+
+
+@crewai_event_bus.on(LLMStreamChunkEvent)
+def _count_stream_chunk(source: Any, event: LLMStreamChunkEvent) -> None:
+    _streamed.chunks = getattr(_streamed, "chunks", 0) + 1
+
+
+def _stream_chunks() -> int:
+    return getattr(_streamed, "chunks", 0)
+
+
+@contextlib.contextmanager
+def prioritized(priority: int) -> Iterator[None]:
+    """Priorité des appels LLM du contexte courant (thread, tâche asyncio)."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class GatewayBusy(RuntimeError):
+    """Aucun fournisseur n'a libéré de capacité dans le délai imparti."""
+
+
+class Provider:
+    """Un modèle et ses limites: jetons et requêtes par minute, appels simultanés (0: illimité).
+
+    - `model` None: le LLM de l'agent est appelé tel quel (modèle de `MODEL`); sinon un LLM
+      CrewAI de ce modèle est dérivé pour chaque agent (température, flux et mots d'arrêt repris)
+    - Seaux à jetons: remplissage continu (`tpm`/60 par seconde), réserve de `burst` secondes;
+      l'estimation d'un appel est réservée au départ puis corrigée par la taille réelle
+    - Requêtes espacées régulièrement (`rpm`): pas de rafale en début de minute
+    - File d'attente par priorité puis ordre d'arrivée: un tour d'entretien double les rapports
+    - Après un refus (429) ou une panne, plus aucun départ jusqu'à la fin du `Retry-After`
+      (ou `cooldown` secondes)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        tpm: float = 0.0,
+        rpm: float = 0.0,
+        max_concurrent: int = 0,
+        cooldown: float = 10.0,
+        burst: float = 10.0,
+    ) -> None:
+        self.name = name
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.tpm = tpm
+        self.rpm = rpm
+        self.max_concurrent = max_concurrent
+        self.cooldown = cooldown
+        self._capacity = tpm / 60 * burst
+        self._tokens = self._capacity
+        self._interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._next_start = 0.0
+        self._refilled = time.monotonic()
+        self._blocked_until = 0.0
+        self._in_flight = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._counters: Dict[str, float] = {
+            "calls": 0, "tokens": 0, "failures": 0, "rate_limited": 0, "overflows": 0, "waited_s": 0.0,
+        }
+
+    # ---------------- Capacité ----------------
+    def _refill(self, now: float) -> None:
+        if self.tpm:
+            self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self.tpm / 60)
+        self._refilled = now
+
+    def _delay(self, need: float, now: float) -> float:
+        """Secondes avant qu'un appel de `need` jetons puisse partir (0: tout de suite)."""
+        delay = max(0.0, self._blocked_until - now, self._next_start - now)
+        if self.tpm:
+            # Un appel plus gros que la réserve part dès qu'elle est pleine (dette remboursée ensuite)
+            missing = min(need, self._capacity) - self._tokens
+            if missing > 0:
+                delay = max(delay, missing * 60 / self.tpm)
+        return delay
+
+    def acquire(self, need: float, priority: int, timeout: float) -> bool:
+        """Réserve un départ; False si la capacité n'est pas libérée avant `timeout` secondes."""
+        started = time.monotonic()
+        deadline = started + timeout
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    first = self._waiting[0] == ticket
+                    slot = not self.max_concurrent or self._in_flight < self.max_concurrent
+                    delay = self._delay(need, now)
+                    if first and slot and delay == 0:
+                        heapq.heappop(self._waiting)
+                        self._in_flight += 1
+                        self._tokens -= need
+                        if self._interval:
+                            self._next_start = now + self._interval
+                        self._counters["waited_s"] += now - started
+                        # Le suivant de la file réévalue sa propre attente
+                        self._cond.notify_all()
+                        return True
+                    # Attente connue (suspension, quota) au-delà du délai: inutile de patienter
+                    if now >= deadline or (first and slot and now + delay > deadline):
+                        self._counters["overflows"] += 1
+                        return False
+                    # En tête: réveil à l'instant calculé; sinon à la libération d'une place
+                    self._cond.wait(min(deadline - now, delay if first and slot else deadline - now))
+            finally:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._cond.notify_all()
+
+    def release(self, reserved: float, used: Optional[float]) -> None:
+        """Fin d'un appel: place libérée, réservation remplacée par les jetons réellement consommés."""
+        with self._cond:
+            self._in_flight -= 1
+            if used is None:
+                # Échec: la requête n'a rien coûté au quota (ou le fournisseur l'a refusée)
+                self._tokens = min(self._capacity, self._tokens + reserved)
+            else:
+                self._tokens = min(self._capacity, self._tokens + reserved - used)
+                self._counters["calls"] += 1
+                self._counters["tokens"] += used
+            self._cond.notify_all()
+
+    def penalize(self, error: BaseException) -> None:
+        """Refus ou panne: départs suspendus jusqu'à `Retry-After` (ou `cooldown`)."""
+        retry_after = _retry_after(error)
+        with self._cond:
+            self._counters["failures"] += 1
+            if _status(error) == 429 or type(error).__name__ == 'RateLimitError':
+                self._counters["rate_limited"] += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + (retry_after or self.cooldown))
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._counters)
+            stats["waited_s"] = round(stats["waited_s"], 3)
+            stats.update(model=self.model or "agent", in_flight=self._in_flight, queued=len(self._waiting))
+        return stats
+
+    # ---------------- Appel ----------------
+    def derive(self, llm: BaseLLM) -> BaseLLM:
+        """LLM de ce fournisseur pour l'agent dont `llm` est le LLM d'origine."""
+        if self.model is None:
+            return llm
+        from crewai import LLM
+
+        # Réessais confiés à la passerelle (le client OpenAI en ferait 2 en silence sur un 429)
+        return LLM(
+            model=self.model, base_url=self.base_url, api_key=self.api_key,
+            temperature=getattr(llm, "temperature", None), stream=bool(getattr(llm, "stream", False)),
+            stop=list(llm.stop or []), max_retries=0,
+        )
+
+
+class LLMGateway:
+    """Passerelle LLM partagée par tous les agents de tous les crews du processus.
+
+    - Connexions HTTP keep-alive dans un pool commun (`pool` connexions au plus), installé
+      comme session httpx de litellm: fournisseurs compatibles OpenAI (OpenAI, Groq,
+      OpenRouter, Ollama, vLLM, serveur local de `llm_stub`)
+    - Ordonnancement par fournisseur (voir `Provider`): jetons/min, requêtes/min, appels
+      simultanés, priorité des tours d'entretien sur la rédaction des rapports
+    - Bascule sur le fournisseur secondaire (`fallback`) après une erreur transitoire (429,
+      5xx, connexion, délai) ou si le principal ne libère pas de place en `max_wait` secondes;
+      au plus `retries` nouveaux essais par appel une fois tous les fournisseurs essayés
+    - Un appel en flux interrompu après son premier fragment n'est ni réessayé ni basculé:
+      le nouvel essai reprendrait le texte depuis le début et le dupliquerait chez les abonnés
+    """
+
+    def __init__(
+        self,
+        primary: Optional[Provider] = None,
+        fallback: Optional[Provider] = None,
+        max_wait: float = 5.0,
+        queue_timeout: float = 300.0,
+        retries: int = 2,
+        output_tokens: int = 800,
+        pool: int = 32,
+        keepalive: float = 60.0,
+        enabled: bool = True,
+    ) -> None:
+        self.primary = primary or Provider("primary")
+        self.fallback = fallback
+        self.max_wait = max_wait
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.output_tokens = output_tokens
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"failovers": 0, "retries": 0, "busy": 0, "interrupted_streams": 0}
+        self._client = None
+        if enabled and pool > 0:
+            self._install_pool(pool, keepalive)
+
+    @classmethod
+    def from_env(cls, **overrides: Any) -> "LLMGateway":
+        """Configuration PSYCHAT_LLM_* (voir README); `overrides` remplace les limites du principal."""
+        def limits(prefix: str) -> Dict[str, Any]:
+            return {
+                "tpm": float(os.getenv(f"{prefix}_TPM") or "0"),
+                "rpm": float(os.getenv(f"{prefix}_RPM") or "0"),
+                "max_concurrent": int(os.getenv(f"{prefix}_CONCURRENCY") or "0"),
+                "cooldown": float(os.getenv("PSYCHAT_LLM_COOLDOWN", "10")),
+            }
+
+        primary = dict(limits("PSYCHAT_LLM"), **{k: v for k, v in overrides.items() if v})
+        fallback_model = os.getenv("PSYCHAT_LLM_FALLBACK_MODEL")
+        return cls(
+            primary=Provider(
+                "primary", os.getenv("PSYCHAT_LLM_MODEL") or None, os.getenv("PSYCHAT_LLM_BASE_URL") or None,
+                os.getenv("PSYCHAT_LLM_API_KEY") or None, **primary,
+            ),
+            fallback=Provider(
+                "fallback", fallback_model, os.getenv("PSYCHAT_LLM_FALLBACK_BASE_URL") or None,
+                os.getenv("PSYCHAT_LLM_FALLBACK_API_KEY") or None, **limits("PSYCHAT_LLM_FALLBACK"),
+            ) if fallback_model else None,
+            max_wait=float(os.getenv("PSYCHAT_LLM_MAX_WAIT", "5")),
+            queue_timeout=float(os.getenv("PSYCHAT_LLM_QUEUE_TIMEOUT", "300")),
+            retries=int(os.getenv("PSYCHAT_LLM_RETRIES", "2")),
+            output_tokens=int(os.getenv("PSYCHAT_LLM_OUTPUT_TOKENS", "800")),
+            pool=int(os.getenv("PSYCHAT_LLM_POOL", "32")),
+            keepalive=float(os.getenv("PSYCHAT_LLM_KEEPALIVE", "60")),
+            enabled=os.getenv("PSYCHAT_LLM_GATEWAY", "1").lower() not in ("0", "false", "no"),
+        )
+
+    def _install_pool(self, pool: int, keepalive: float) -> None:
+        import httpx
+        import litellm
+
+        if litellm.client_session is not None:
+            # Pool déjà fourni par l'application hôte
+            return
+        self._client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool, max_keepalive_connections=pool, keepalive_expiry=keepalive),
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        litellm.client_session = self._client
+
+    @property
+    def providers(self) -> List[Provider]:
+        return [self.primary] + ([self.fallback] if self.fallback is not None else [])
+
+    def wrap(self, llm: BaseLLM) -> BaseLLM:
+        """LLM de l'agent servi par la passerelle (inchangé si désactivée)."""
+        if not self.enabled:
+            return llm
+        if self.primary.model is None and isinstance(getattr(llm, "additional_params", None), dict):
+            # LLM de l'agent appelé tel quel: réessais du client OpenAI laissés à la passerelle
+            llm.additional_params.setdefault("max_retries", 0)
+        return GatewayLLM(llm, self)
+
+    # ---------------- Appels ----------------
+    def call(self, wrapper: "GatewayLLM", messages: Any, args: Tuple[Any, ...], from_task: Any) -> Any:
+        priority = _priority.get()
+        if priority is None:
+            priority = INTERACTIVE if getattr(from_task, "name", None) in INTERACTIVE_TASKS else BACKGROUND
+        reserved = estimate_tokens(_text(messages)) + self.output_tokens
+        last_error: Optional[BaseException] = None
+        providers = self.providers
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count("retries")
+            for index, provider in enumerate(providers):
+                last = index == len(providers) - 1
+                # Principal saturé ou suspendu: débordement vers le secondaire après `max_wait`
+                if not provider.acquire(reserved, priority, self.queue_timeout if last else self.max_wait):
+                    continue
+                if index:
+                    self._count("failovers")
+                    logger.warning(f"LLM: bascule sur {provider.name} ({provider.model})")
+                streamed = _stream_chunks()
+                try:
+                    response = wrapper.on(provider).call(messages, *args)
+                except Exception as e:
+                    provider.release(reserved, None)
+                    if not _retryable(e):
+                        raise
+                    provider.penalize(e)
+                    if _stream_chunks() != streamed:
+                        self._count("interrupted_streams")
+                        logger.warning(f"LLM {provider.name}: flux interrompu après diffusion partielle, pas de nouvel essai")
+                        raise
+                    last_error = e
+                    logger.warning(f"LLM {provider.name} indisponible ({type(e).__name__}): {str(e)[:200]}")
+                    continue
+                used = reserved - self.output_tokens + estimate_tokens(response if isinstance(response, str) else "")
+                provider.release(reserved, used)
+                return response
+        if last_error is not None:
+            raise last_error
+        self._count("busy")
+        raise GatewayBusy(f"Aucun fournisseur LLM disponible après {self.queue_timeout:.0f} s d'attente")
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counters[key] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        for provider in self.providers:
+            stats[provider.name] = provider.stats()
+        return stats
+
+    def close(self) -> None:
+        if self._client is not None:
+            import litellm
+
+            if litellm.client_session is self._client:
+                litellm.client_session = None
+            self._client.close()
+            self._client = None
+
+
+class GatewayLLM(WrappedLLM):
+    """Enveloppe du LLM d'un agent: chaque appel passe par la file et les fournisseurs de la passerelle."""
+
+    def __init__(self, llm: BaseLLM, gateway: LLMGateway) -> None:
+        self._gateway = gateway
+        self._derived: Dict[str, BaseLLM] = {}
+        super().__init__(llm)
+        if gateway.primary.model is not None:
+            # Modèle réellement appelé (clés du cache de réponses, événements)
+            self.model = gateway.primary.model
+
+    def on(self, provider: Provider) -> BaseLLM:
+        """LLM de `provider` pour cet agent, mots d'arrêt et mode flux synchronisés avec l'agent."""
+        llm = self._derived.get(provider.name)
+        if llm is None:
+            llm = self._derived[provider.name] = provider.derive(self._llm)
+        if llm is not self._llm:
+            llm.stop = list(self._llm.stop or [])
+            llm.stream = self.stream
+        return llm
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        return self._gateway.call(self, messages, (tools, callbacks, available_functions, from_task, from_agent), from_task)
+
+
+def _text(messages: Any) -> str:
+    if isinstance(messages, str):
+        return messages
+    return "".join(str(m.get("content", "")) for m in messages)
+
+
+def _status(error: BaseException) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retryable(error: BaseException) -> bool:
+    if _status(error) in _RETRYABLE_STATUS:
+        return True
+    return any(cls.__name__ in _RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    # litellm recopie les en-têtes du fournisseur à part (sa `response` est reconstruite)
+    headers = getattr(error, "litellm_response_headers", None) or getattr(
+        getattr(error, "response", None), "headers", None
+    ) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        return min(float(value), 120.0) if value else None
+    except (TypeError, ValueError):
+        return None
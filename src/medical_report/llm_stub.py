@@ -0,0 +1,220 @@
+"""Serveur LLM local compatible OpenAI (`/v1/chat/completions`), pour tester la passerelle LLM.
+
+Réponses du script de `fake_llm.ScriptedLLM` (tâche reconnue d'après son énoncé), avec les
+comportements d'un fournisseur réel: latence et débit de génération, limites de jetons et
+de requêtes par minute (429 + Retry-After), panne simulée (503), connexions HTTP/1.1
+keep-alive et réponses en flux (SSE). Compteurs: connexions TCP acceptées, requêtes, refus.
+
+Usage: python -m medical_report.llm_stub [--port 8089] [--latency-ms 300] [--tpm 40000] [--rpm 0]
+       puis PSYCHAT_LLM_MODEL=openai/psychat-stub PSYCHAT_LLM_BASE_URL=http://127.0.0.1:8089/v1
+"""
+import argparse
+import collections
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .fake_llm import ScriptedLLM, _as_text
+
+# Tâche reconnue d'après un extrait de son énoncé (config/tasks.yaml), dans cet ordre
+_TASK_HINTS = (
+    ("Mode rapport rapide", "tache_rapport_rapide"),
+    ("Mode pipeline", "tache_structuration_incrementale"),
+    ("transcription d'entretien brute", "tache_structuration_dossier"),
+    ("Analysez UNIQUEMENT le dossier", "tache_analyse_diagnostique"),
+    ("rédigez le rapport final", "tache_redaction_rapport_final"),
+)
+
+
+class StubLLMServer:
+    """Fournisseur simulé: `tpm`/`rpm` sur une fenêtre glissante d'une minute (0: illimité)."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.3,
+        tokens_per_second: float = 0.0,
+        tpm: int = 0,
+        rpm: int = 0,
+        chunk_size: int = 16,
+    ) -> None:
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.tpm = tpm
+        self.rpm = rpm
+        self.chunk_size = chunk_size
+        # Panne simulée: toutes les requêtes reçoivent 503
+        self.down = False
+        self._script = ScriptedLLM(latency=0)
+        self._window: Deque[Tuple[float, int]] = collections.deque()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "connections": 0, "requests": 0, "completed": 0, "rate_limited": 0, "unavailable": 0, "tokens": 0,
+        }
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "StubLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="llm-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += n
+
+    # ---------------- Limites ----------------
+    def _admit(self, tokens: int) -> Optional[float]:
+        """Enregistre la requête si elle tient dans la minute glissante; sinon délai Retry-After."""
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] >= 60:
+                self._window.popleft()
+            used = sum(n for _, n in self._window)
+            over_tokens = self.tpm and used + tokens > self.tpm
+            over_requests = self.rpm and len(self._window) + 1 > self.rpm
+            if over_tokens or over_requests:
+                self._counters["rate_limited"] += 1
+                return max(0.1, 60 - (now - self._window[0][0])) if self._window else 1.0
+            self._window.append((now, tokens))
+        return None
+
+    # ---------------- Réponses ----------------
+    def complete(self, body: Dict[str, Any]) -> Tuple[str, int]:
+        text = _as_text(body.get("messages") or [])
+        task = next((name for hint, name in _TASK_HINTS if hint in text), None)
+        return self._script._script(text, task), len(text) // 4
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                server._count("connections")
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    body = {}
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._json(404, {"error": {"message": "not found", "type": "invalid_request_error"}})
+                    return
+                server._count("requests")
+                if server.down:
+                    server._count("unavailable")
+                    self._json(503, {"error": {"message": "stub unavailable", "type": "server_error"}})
+                    return
+                response, prompt_tokens = server.complete(body)
+                completion_tokens = len(response) // 4
+                retry_after = server._admit(prompt_tokens + completion_tokens)
+                if retry_after is not None:
+                    self._json(429, {"error": {
+                        "message": "Rate limit reached for tokens per min", "type": "rate_limit_error",
+                    }}, {"Retry-After": f"{retry_after:.1f}"})
+                    return
+
+                delay = server.latency
+                if server.tokens_per_second:
+                    delay += completion_tokens / server.tokens_per_second
+                time.sleep(delay)
+                server._count("tokens", prompt_tokens + completion_tokens)
+                usage = {
+                    "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens,
+                }
+                model = body.get("model", "psychat-stub")
+                if body.get("stream"):
+                    self._stream(model, response, usage)
+                else:
+                    self._json(200, {
+                        "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion",
+                        "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": response}}],
+                        "usage": usage,
+                    })
+                server._count("completed")
+
+            def _json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, model: str, response: str, usage: Dict[str, int]) -> None:
+                # Fragments SSE en transfert chunked: la connexion reste réutilisable
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                        "created": int(time.time()), "model": model}
+                for i in range(0, len(response), server.chunk_size):
+                    delta = {"content": response[i:i + server.chunk_size]}
+                    self._chunk({**base, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]})
+                self._chunk({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+                self._chunk({**base, "choices": [], "usage": usage})
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _chunk(self, payload: Dict[str, Any]) -> None:
+                self._write_chunk(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+            def _write_chunk(self, data: bytes) -> None:
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--tokens-per-s", type=float, default=0, help="débit de génération (0: instantané)")
+    parser.add_argument("--tpm", type=int, default=0, help="jetons par minute (0: illimité)")
+    parser.add_argument("--rpm", type=int, default=0, help="requêtes par minute (0: illimité)")
+    args = parser.parse_args()
+    server = StubLLMServer(args.host, args.port, args.latency_ms / 1000, args.tokens_per_s, args.tpm, args.rpm)
+    print(f"LLM simulé sur {server.url} (modèle: openai/psychat-stub)", flush=True)
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(server.stats()))
+
+
+if __name__ == "__main__":
+    main()
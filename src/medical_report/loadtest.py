@@ -0,0 +1,376 @@
+"""Test de charge de bout en bout: /start -> /chat x10 -> /download avec un LLM scripté.
+
+L'application tourne dans ce processus (serveur werkzeug multi-thread, ou uvicorn avec
+--server asgi, sur un port libre de 127.0.0.1) avec PSYCHAT_FAKE_LLM=1: aucun appel
+réseau, aucun quota consommé. N patients simulés suivent le flux SSE (ou interrogent
+/next, en attente longue avec --transport longpoll), répondent à chaque question puis
+téléchargent le PDF. Rapport: latences p50/p95/p99 par tour, sessions/s,
+threads et RSS maximal (processus + pool de rendu PDF).
+
+Avec --llm stub, les agents passent par la passerelle LLM et un serveur local compatible
+OpenAI (`llm_stub`, quota --stub-tpm) au lieu du LLM scripté en mémoire: pool de
+connexions, file par priorité et refus 429 sont exercés de bout en bout.
+
+Usage: test [--sessions 20] [--concurrency 10] [--latency-ms 50] [--transport sse|poll|longpoll] [--server wsgi|asgi]
+            [--llm scripted|stub] [--stub-tpm 0]
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+ANSWERS = (
+    "Je me sens anxieux depuis plusieurs semaines.",
+    "Depuis environ trois mois.",
+    "Je dors mal, je me réveille souvent la nuit.",
+    "Je mange moins qu'avant.",
+    "C'est difficile de me concentrer au travail.",
+    "Non, jamais.",
+    "Aucun traitement.",
+    "Ma famille me soutient.",
+    "Non.",
+    "Mieux comprendre ce qui m'arrive.",
+)
+
+
+class Metrics:
+    """Mesures partagées par les patients simulés."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {"premiere_question": [], "tour": [], "rapport": [], "pdf": [], "session": []}
+        self.errors: List[str] = []
+
+    def add(self, name: str, value: float) -> None:
+        with self._lock:
+            self.samples[name].append(value)
+
+    def error(self, message: str) -> None:
+        with self._lock:
+            self.errors.append(message)
+
+
+class ResourceSampler(threading.Thread):
+    """Relève périodiquement le nombre de threads et la RSS courante (Linux: /proc)."""
+
+    def __init__(self, interval: float = 0.05) -> None:
+        super().__init__(name="loadtest-sampler", daemon=True)
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss = 0
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss = max(self.peak_rss, _tree_rss(os.getpid()))
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+def _tree_rss(pid: int) -> int:
+    """RSS (octets) du processus et de ses enfants directs (pool de rendu PDF)."""
+    total = _rss(pid)
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            children = f.read().split()
+    except OSError:
+        return total
+    return total + sum(_rss(int(child)) for child in children)
+
+
+def _rss(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+class Patient:
+    """Un patient simulé: une session complète contre le serveur."""
+
+    def __init__(
+        self, base_url: str, metrics: Metrics, transport: str, think: float, mode: Optional[str], rng: random.Random,
+        typing: bool = False,
+    ) -> None:
+        self.base_url = base_url
+        self.metrics = metrics
+        self.transport = transport
+        self.think = think
+        self.mode = mode
+        self.rng = rng
+        self.typing = typing
+
+    # ---------------- HTTP ----------------
+    def _request(self, method: str, path: str, payload: Optional[dict] = None, timeout: float = 60):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        if data is not None:
+            req.add_header("Content-Type", "application/json")
+        return urllib.request.urlopen(req, timeout=timeout)
+
+    def _json(self, method: str, path: str, payload: Optional[dict] = None) -> dict:
+        with self._request(method, path, payload) as response:
+            return json.loads(response.read())
+
+    # ---------------- Session ----------------
+    def run(self) -> None:
+        started = time.perf_counter()
+        payload = {"topic": "Test de charge"}
+        if self.mode:
+            payload["mode"] = self.mode
+        try:
+            session_id = self._json("POST", "/start", payload)["session_id"]
+        except urllib.error.HTTPError as e:
+            self.metrics.error(f"/start: HTTP {e.code}")
+            return
+        try:
+            if self.transport == "sse":
+                events = self._sse(session_id)
+            else:
+                events = self._poll(session_id, wait=10 if self.transport == "longpoll" else 0)
+            if self._converse(session_id, events, started):
+                self.metrics.add("session", time.perf_counter() - started)
+        except Exception as e:
+            self.metrics.error(f"{session_id[:8]}: {type(e).__name__}: {e}")
+        finally:
+            with contextlib.suppress(Exception):
+                self._json("POST", f"/cleanup/{session_id}")
+
+    def _converse(self, session_id: str, events, started: float) -> bool:
+        asked_at = started
+        first = True
+        for event, data in events:
+            if event == "question":
+                self.metrics.add("premiere_question" if first else "tour", time.perf_counter() - asked_at)
+                first = False
+                number = data.get("question_number", 1)
+                answer = ANSWERS[(number - 1) % len(ANSWERS)]
+                think = self.rng.uniform(0, self.think) if self.think else 0.0
+                if self.typing:
+                    # Pause de frappe à mi-réflexion: le texte saisi est déjà la réponse définitive
+                    time.sleep(think / 2)
+                    self._json("POST", "/typing", {"session_id": session_id, "question_number": number, "partial": answer})
+                    think /= 2
+                if think:
+                    time.sleep(think)
+                asked_at = time.perf_counter()
+                self._json("POST", "/chat", {"session_id": session_id, "answer": answer})
+            elif event == "report":
+                self.metrics.add("rapport", time.perf_counter() - asked_at)
+                return self._download(session_id)
+            elif event == "error":
+                self.metrics.error(f"{session_id[:8]}: {data.get('error')}")
+                return False
+        self.metrics.error(f"{session_id[:8]}: flux interrompu avant le rapport")
+        return False
+
+    def _download(self, session_id: str) -> bool:
+        start = time.perf_counter()
+        while True:
+            try:
+                with self._request("GET", f"/download/{session_id}") as response:
+                    body = response.read()
+                break
+            except urllib.error.HTTPError as e:
+                if e.code != 503:
+                    self.metrics.error(f"{session_id[:8]}: /download HTTP {e.code}")
+                    return False
+        if not body.startswith(b"%PDF"):
+            self.metrics.error(f"{session_id[:8]}: /download ne renvoie pas un PDF")
+            return False
+        self.metrics.add("pdf", time.perf_counter() - start)
+        return True
+
+    # ---------------- Transports ----------------
+    def _sse(self, session_id: str):
+        with self._request("GET", f"/stream/{session_id}", timeout=300) as response:
+            event, data = None, []
+            for raw in response:
+                line = raw.decode("utf-8").rstrip("\n")
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and event:
+                    yield event, json.loads("\n".join(data) or "{}")
+                    event, data = None, []
+
+    def _poll(self, session_id: str, interval: float = 0.02, wait: float = 0):
+        seen = 0
+        while True:
+            state = self._json("GET", f"/next/{session_id}?wait={wait}" if wait else f"/next/{session_id}")
+            status = state.get("status")
+            if status == "question" and state["question_number"] != seen:
+                seen = state["question_number"]
+                yield "question", state
+            elif status == "finished":
+                yield "report", state
+                return
+            elif status == "error":
+                yield "error", state
+                return
+            elif not wait:
+                time.sleep(interval)
+
+
+def serve(kind: str):
+    """Serveur de l'application sur un port libre, dans un thread; `shutdown()` l'arrête."""
+    if kind == "wsgi":
+        from werkzeug.serving import make_server
+        from app import app
+
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, name="loadtest-server", daemon=True).start()
+        return server
+
+    import socket
+    import uvicorn
+    from asgi import app
+
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning"))
+    server.server_port = sock.getsockname()[1]
+    server.shutdown = lambda: setattr(server, "should_exit", True)
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, name="loadtest-server", daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile au rang le plus proche."""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def report(metrics: Metrics, elapsed: float, sessions: int, sampler: ResourceSampler) -> None:
+    completed = len(metrics.samples["session"])
+    print(f"Sessions terminées: {completed}/{sessions} en {elapsed:.2f} s ({completed / elapsed:.2f} sessions/s)")
+    print(f"  {'mesure (ms)':<18} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for name, values in metrics.samples.items():
+        if not values:
+            continue
+        row = [percentile(values, p) * 1000 for p in (50, 95, 99)] + [max(values) * 1000]
+        print(f"  {name:<18} {len(values):5d} " + " ".join(f"{v:9.1f}" for v in row))
+    # ru_maxrss est en Ko sous Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"Threads (pic): {sampler.peak_threads}")
+    print(f"RSS max: processus {own:.0f} Mo, plus gros enfant terminé {children:.0f} Mo, "
+          f"somme processus + pool PDF {sampler.peak_rss / (1024 * 1024):.0f} Mo (pages partagées après fork comptées par processus)")
+    for message in metrics.errors[:10]:
+        print(f"  erreur: {message}")
+    if len(metrics.errors) > 10:
+        print(f"  ... {len(metrics.errors) - 10} autres erreurs")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="nombre de patients simulés")
+    parser.add_argument("--concurrency", type=int, default=10, help="patients simultanés")
+    parser.add_argument("--latency-ms", type=float, default=50, help="latence de chaque appel LLM scripté")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="aléa ajouté à la latence LLM")
+    parser.add_argument("--think-ms", type=float, default=0, help="temps de réflexion maximal du patient")
+    parser.add_argument("--transport", choices=("sse", "poll", "longpoll"), default="sse")
+    parser.add_argument("--server", choices=("wsgi", "asgi"), default="wsgi", help="serveur de l'application")
+    parser.add_argument("--mode", default=None, help="mode du crew (défaut: PSYCHAT_CREW_MODE)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-cache", action="store_true", help="active le cache de réponses LLM (rejeux identiques)")
+    parser.add_argument("--speculative", action="store_true",
+                        help="pré-génération de la question suivante (texte partiel envoyé à mi-réflexion)")
+    parser.add_argument("--llm", choices=("scripted", "stub"), default="scripted",
+                        help="LLM scripté en mémoire, ou serveur local compatible OpenAI via la passerelle LLM")
+    parser.add_argument("--stub-tpm", type=int, default=0, help="quota de jetons/min du serveur local (0: illimité)")
+    parser.add_argument("--verbose", action="store_true", help="conserve les logs et sorties du crew")
+    args = parser.parse_args(argv)
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    sys.path.insert(0, project_root)
+    sys.path.insert(0, os.path.join(project_root, 'src'))
+
+    # Doit précéder l'import de l'application (fabrique de crews et planificateur créés à l'import)
+    for name in ("CREWAI_DISABLE_TELEMETRY", "OTEL_SDK_DISABLED"):
+        os.environ.setdefault(name, "true")
+    os.environ.setdefault("CREWAI_TRACING_ENABLED", "false")
+    stub = None
+    if args.llm == "stub":
+        from medical_report.llm_stub import StubLLMServer
+
+        stub = StubLLMServer(latency=args.latency_ms / 1000, tpm=args.stub_tpm).start()
+        os.environ["PSYCHAT_FAKE_LLM"] = "0"
+        os.environ["PSYCHAT_LLM_MODEL"] = "openai/psychat-stub"
+        os.environ["PSYCHAT_LLM_BASE_URL"] = stub.url
+        os.environ["PSYCHAT_LLM_API_KEY"] = "stub"
+    else:
+        os.environ["PSYCHAT_FAKE_LLM"] = "1"
+    os.environ["PSYCHAT_FAKE_LLM_LATENCY"] = str(args.latency_ms)
+    os.environ["PSYCHAT_FAKE_LLM_JITTER"] = str(args.jitter_ms)
+    os.environ["PSYCHAT_FAKE_LLM_SEED"] = str(args.seed)
+    os.environ["PSYCHAT_LLM_CACHE"] = "1" if args.llm_cache else "0"
+    os.environ["PSYCHAT_SPECULATIVE"] = "1" if args.speculative else "0"
+    # Rapports du test archivés à part, pas dans l'archive de l'application
+    os.environ.setdefault("PSYCHAT_REPORT_ARCHIVE_DIR", tempfile.mkdtemp(prefix="psychat_loadtest_reports_"))
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = serve(args.server)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    metrics = Metrics()
+    sampler = ResourceSampler()
+    rng = random.Random(args.seed)
+    patients = [
+        Patient(base_url, metrics, args.transport, args.think_ms / 1000, args.mode, random.Random(rng.random()), args.speculative)
+        for _ in range(args.sessions)
+    ]
+    print(f"{args.sessions} sessions, {args.concurrency} simultanées, LLM {args.llm} {args.latency_ms:.0f} ms "
+          f"± {args.jitter_ms:.0f} ms, transport {args.transport}, serveur {args.server}", file=sys.stderr)
+
+    # Les agents CrewAI impriment leurs étapes sur stdout: masquées hors --verbose
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    sampler.start()
+    start = time.perf_counter()
+    with quiet, ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="loadtest-patient") as pool:
+        for patient in patients:
+            pool.submit(patient.run)
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+    server.shutdown()
+
+    report(metrics, elapsed, args.sessions, sampler)
+    from app import report_archive
+    print(f"Archive des rapports: {report_archive.stats()}")
+    if args.speculative:
+        from app import speculator
+        print(f"Pré-générations: {speculator.stats()}")
+    if stub is not None:
+        from app import llm_gateway
+        print(f"Passerelle LLM: {json.dumps(llm_gateway.stats(), ensure_ascii=False)}")
+        print(f"Serveur LLM local: {stub.stats()}")
+        stub.stop()
+    return 1 if metrics.errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,23 +5,50 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.insert(0, project_root)
 def run():
     """
-    Démarre le serveur web Flask.
+    Démarre le serveur web: Flask, ou uvicorn en mode ASGI (PSYCHAT_SERVER=asgi, voir asgi.py).
+
+    Le port est ouvert avant l'import de l'application (crewai, litellm: plusieurs secondes),
+    importée puis préchauffée en arrière-plan (voir warmup.py); /ready répond 503 d'ici là.
     """
+    from medical_report.pdf_service import prestart
+    from medical_report.warmup import LazyASGI, LazyWSGI
+
     print("--------------------------------------------------")
     print("--- Lancement du serveur web pour l'assistant AI ---")
     print("--------------------------------------------------")
-    from app import app
-    
-    print(f"Serveur démarré. Ouvrez votre navigateur à l'adresse : http://127.0.0.1:5001")
     os.chdir(project_root)
-    app.run(debug=True, port=5001, host='0.0.0.0')
+    if os.getenv("PSYCHAT_SERVER", "wsgi").lower() == "asgi":
+        import uvicorn
+
+        print("Serveur ASGI démarré. Ouvrez votre navigateur à l'adresse : http://127.0.0.1:5001")
+        # Processus de rendu PDF forkés tant que le serveur n'a encore aucun thread
+        prestart()
+        uvicorn.run(LazyASGI("asgi:app"), port=5001, host='0.0.0.0')
+        return
+    from werkzeug.serving import is_running_from_reloader, run_simple
+
+    print(f"Serveur démarré. Ouvrez votre navigateur à l'adresse : http://127.0.0.1:5001")
+    application = LazyWSGI("app:app", debug=True)
+    if is_running_from_reloader():
+        # Processus servant (le processus parent du rechargement n'importe jamais l'application)
+        prestart()
+        application.start()
+    run_simple('0.0.0.0', 5001, application, use_reloader=True, use_debugger=True, threaded=True)
 
 
 def train():
     print("La fonction 'train' n'est pas implémentée pour l'application web.")
 
 def replay():
-    print("La fonction 'replay' n'est pas implémentée pour l'application web.")
+    """
+    Régénère en lot les rapports de transcriptions enregistrées (voir batch.py pour les options).
+    """
+    from medical_report.batch import main as batch
+    sys.exit(batch(sys.argv[1:]))
 
 def test():
-    print("La fonction 'test' n'est pas implémentée pour l'application web.")   
\ No newline at end of file
+    """
+    Test de charge de bout en bout avec un LLM scripté (voir loadtest.py pour les options).
+    """
+    from medical_report.loadtest import main as loadtest
+    sys.exit(loadtest(sys.argv[1:]))   
\ No newline at end of file
@@ -1,8 +1,10 @@
+import copy
+import logging
 import os
 import re
-import tempfile
+import threading
 from datetime import datetime
-from typing import List, Optional
+from typing import IO, Any, Dict, Iterator, Optional, Union
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -10,6 +12,24 @@ from reportlab.lib.enums import TA_LEFT, TA_JUSTIFY
 from reportlab.lib.colors import HexColor
 from reportlab.lib.utils import ImageReader
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, KeepInFrame
+from PIL import Image
+
+# Logo d'en-tête: taille affichée (points) et résolution embarquée (dpi, 0 = image source)
+LOGO_SIZE = 55
+LOGO_DPI = int(os.getenv("PSYCHAT_PDF_LOGO_DPI", "300"))
+_LOGO_FORM = "psychatLogo"
+
+# Motifs du nettoyage et du rendu markdown, compilés une fois
+_PLACEHOLDER_RE = re.compile(
+    r"\[(?:[^\]]*(?:compl[eé]ter|completer|ins[eé]rer|à remplir)[^\]]*)\]", re.IGNORECASE
+)
+# "Non spécifié" et "markdown" en une passe (leurs suppressions ne créent pas de nouvelle
+# occurrence); le lookahead sur la première lettre évite d'essayer l'alternative partout
+_NOISE_RE = re.compile(r"(?=[nNmM])\b(?:Non spécifié|markdown)\b", re.IGNORECASE)
+_BOLD_RE = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC_RE = re.compile(r"(?<!\*)\*([^*]+?)\*(?!\*)")
+_CODE_RE = re.compile(r"`(.*?)`")
+_NUMBERED_RE = re.compile(r"(\d+)\.\s+")
 
 
 class ModernPDFGenerator:
@@ -21,17 +41,36 @@ class ModernPDFGenerator:
     - Sans tableaux, multi-pages si nécessaire
     """
 
+    # Ressources partagées par tous les rendus du processus (construites une fois, puis lues seulement)
+    _shared: Optional[Dict[str, Any]] = None
+    _shared_lock = threading.Lock()
+
     def __init__(self) -> None:
         # Couleurs (2 couleurs)
         self.primary_blue = HexColor("#2B6CB0")
         self.dark_text = HexColor("#111827")
 
-        # Styles
-        self.styles = getSampleStyleSheet()
-        self._setup_styles()
+        # Styles, logo décodé et filets d'accent
+        shared = self._shared_resources()
+        self.styles = shared["styles"]
+        self.logo_path = shared["logo_path"]
+        self._logo = shared["logo"]
+        self._rules = shared["rules"]
 
-        # Logo
-        self.logo_path = self._find_logo_path()
+    def _shared_resources(self) -> Dict[str, Any]:
+        cls = type(self)
+        with cls._shared_lock:
+            if cls._shared is None:
+                self.styles = getSampleStyleSheet()
+                self._setup_styles()
+                logo_path = self._find_logo_path()
+                cls._shared = {
+                    "styles": self.styles,
+                    "logo_path": logo_path,
+                    "logo": self._load_logo(logo_path),
+                    "rules": {thin: self._build_accent_rule(thin) for thin in (False, True)},
+                }
+            return cls._shared
 
     # ---------------- Utils ----------------
     def _find_logo_path(self) -> Optional[str]:
@@ -47,6 +86,27 @@ class ModernPDFGenerator:
                 return p
         return None
 
+    def _load_logo(self, path: Optional[str]) -> Optional[ImageReader]:
+        """Logo décodé une fois, ramené à LOGO_DPI pour sa taille d'affichage."""
+        if not path:
+            return None
+        try:
+            image = Image.open(path)
+            image.load()
+            if LOGO_DPI > 0:
+                side = round(LOGO_SIZE * LOGO_DPI / 72)
+                if max(image.size) > side:
+                    image.thumbnail((side, side), Image.LANCZOS)
+            logo = ImageReader(image)
+            # Décodage RGB et alpha dès maintenant: les rendus concurrents ne font que lire
+            logo.getRGBData()
+            if logo._dataA is not None:
+                logo._dataA.getRGBData()
+            return logo
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Logo PDF illisible ({path}): {e}")
+            return None
+
     def _setup_styles(self) -> None:
         self.styles.add(ParagraphStyle(
             name="ReportTitle", parent=self.styles["Title"], fontSize=24, leading=28,
@@ -70,137 +130,150 @@ class ModernPDFGenerator:
         ))
 
     # ------------- Parsing / Nettoyage -------------
-    def _clean_markdown(self, content: str) -> str:
+    def _clean_lines(self, content: str) -> Iterator[str]:
+        """Lignes du markdown nettoyé, en une passe: lignes système retirées, vides
+        successifs réduits à un seul "" et vides de début/fin supprimés."""
         if not content:
-            return ""
+            return
         text = content.replace("\r\n", "\n").replace("\r", "\n")
         # Placeholders fréquents et mots techniques indésirables
-        text = re.sub(r"\[(?:[^\]]*(?:compl[eé]ter|completer|ins[eé]rer|à remplir)[^\]]*)\]", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\bNon spécifié\b", "", text, flags=re.IGNORECASE)
-        text = re.sub(r"\bmarkdown\b", "", text, flags=re.IGNORECASE)
-        # Lignes système et doublons évidents
-        cleaned: List[str] = []
+        if "[" in text:
+            text = _PLACEHOLDER_RE.sub("", text)
+        text = _NOISE_RE.sub("", text)
+
+        started = False
+        pending_blank = False
         for ln in text.split("\n"):
             s = ln.strip()
-            if s.lower().startswith("généré le ") or s.lower().startswith("page "):
+            if not s:
+                pending_blank = started
                 continue
-            if s == "Rapport Psychiatrique":
+            # Lignes système et doublons évidents
+            first = s[0].lower()
+            if first in ("g", "p"):
+                lowered = s.lower()
+                if lowered.startswith("généré le ") or lowered.startswith("page "):
+                    continue
+            elif s == "Rapport Psychiatrique":
                 continue
-            cleaned.append(ln)
-        # Réduction des vides successifs
-        out: List[str] = []
-        last_empty = False
-        for ln in cleaned:
-            if ln.strip() == "":
-                if not last_empty:
-                    out.append("")
-                last_empty = True
-            else:
-                out.append(ln)
-                last_empty = False
-        return "\n".join(out).strip()
+            if pending_blank:
+                yield ""
+                pending_blank = False
+            started = True
+            yield ln
+
+    def _clean_markdown(self, content: str) -> str:
+        return "\n".join(self._clean_lines(content)).strip()
 
     def _fmt_inline(self, text: str) -> str:
         try:
-            text = re.sub(r"\*\*(.+?)\*\*", r"<b>\1</b>", text)
-            text = re.sub(r"(?<!\*)\*([^*]+?)\*(?!\*)", r"<i>\1</i>", text)
-            text = re.sub(r"`(.*?)`", r"<font name='Courier'>\1</font>", text)
+            if "*" in text:
+                text = _BOLD_RE.sub(r"<b>\1</b>", text)
+                text = _ITALIC_RE.sub(r"<i>\1</i>", text)
+            if "`" in text:
+                text = _CODE_RE.sub(r"<font name='Courier'>\1</font>", text)
             return text
         except Exception:
             return text
 
-    def _md_to_elements(self, md: str):
+    def _md_to_elements(self, content: str):
+        """Flowables ReportLab du rapport, construits pendant le nettoyage (une seule passe)."""
         elements = []
-        if not md:
-            return elements
-        for raw in md.split("\n"):
+        append = elements.append
+        fmt = self._fmt_inline
+        header_style = self.styles["SectionHeader"]
+        body_style = self.styles["BodyTextLarge"]
+        for raw in self._clean_lines(content):
             line = raw.strip()
             if not line:
-                elements.append(Spacer(1, 6))
+                append(Spacer(1, 6))
                 continue
+            first = line[0]
             # Titres (#, ##)
-            if line.startswith("# "):
-                elements.append(Paragraph(self._fmt_inline(line[2:]), self.styles["SectionHeader"]))
-                continue
-            if line.startswith("## "):
-                elements.append(Paragraph(self._fmt_inline(line[3:]), self.styles["SectionHeader"]))
-                continue
+            if first == "#":
+                if line.startswith("# "):
+                    append(Paragraph(fmt(line[2:]), header_style))
+                    continue
+                if line.startswith("## "):
+                    append(Paragraph(fmt(line[3:]), header_style))
+                    continue
             # Puces (-, *)
-            if line.startswith(('- ', '* ')):
-                bullet = self._fmt_inline(line[2:])
-                elements.append(Paragraph(f"• {bullet}", self.styles["BodyTextLarge"]))
+            elif (first == "-" or first == "*") and line[1:2] == " ":
+                append(Paragraph(f"• {fmt(line[2:])}", body_style))
                 continue
             # Numérotées (1. ...)
-            if re.match(r"^\d+\.\s+.+", line):
-                num = re.sub(r"^(\d+)\.\s+", r"\1. ", line)
-                elements.append(Paragraph(self._fmt_inline(num), self.styles["BodyTextLarge"]))
-                continue
+            elif first.isdecimal():
+                match = _NUMBERED_RE.match(line)
+                if match:
+                    append(Paragraph(fmt(f"{match.group(1)}. {line[match.end():]}"), body_style))
+                    continue
             # Paragraphe
-            elements.append(Paragraph(self._fmt_inline(line), self.styles["BodyTextLarge"]))
+            append(Paragraph(fmt(line), body_style))
         return elements
 
     # ---------------- Génération ----------------
-    def generate_pdf(self, markdown_content: str, session_id: Optional[str] = None) -> Optional[str]:
+    def render(self, markdown_content: str, output: Union[str, IO[bytes]]) -> None:
+        """Rend le rapport dans un chemin ou un flux binaire (BytesIO, SpooledTemporaryFile)."""
+        doc = SimpleDocTemplate(
+            output,
+            pagesize=A4,
+            rightMargin=40,
+            leftMargin=40,
+            topMargin=80,
+            bottomMargin=60,
+            title="Rapport Psychiatrique",
+            author="PsyChat",
+        )
+
+        story = []
+
+        # Titre, sous-titre
+        story.append(Paragraph("RAPPORT PSYCHIATRIQUE", self.styles["ReportTitle"]))
+        story.append(Paragraph("Synthèse clinique — générée par PsyChat", self.styles["ReportSubtitle"]))
+        story.append(Spacer(1, 8))
+
+        # Ligne d'accent visuelle
+        story.append(self._accent_rule())
+        story.append(Spacer(1, 6))
+
+        # Section Bilan final
+        story.append(Paragraph("Bilan final", self.styles["SectionHeader"]))
+
+        # Corps du rapport (multi-pages autorisées pour lisibilité)
+        elements = self._md_to_elements(markdown_content)
+        story.extend(elements)
+
+        # Bas de page (date + confidentiel)
+        story.append(Spacer(1, 10))
+        story.append(self._accent_rule(thin=True))
+        date_str = datetime.now().strftime("Généré le %d/%m/%Y à %H:%M")
+        story.append(Paragraph(f"<font size=9>{date_str} — Document confidentiel</font>", self.styles["BodyTextLarge"]))
+
+        doc.build(story, onFirstPage=self._header_footer, onLaterPages=self._header_footer)
+
+    def _header_footer(self, canvas, doc_) -> None:
+        canvas.setFillColor(self.primary_blue)
+        canvas.rect(doc_.leftMargin, A4[1] - doc_.topMargin + 10, doc_.width, 2, stroke=0, fill=1)
+        if self._logo is None:
+            return
         try:
-            md = self._clean_markdown(markdown_content)
-
-            tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-            tmp.close()
-
-            doc = SimpleDocTemplate(
-                tmp.name,
-                pagesize=A4,
-                rightMargin=40,
-                leftMargin=40,
-                topMargin=80,
-                bottomMargin=60,
-                title="Rapport Psychiatrique",
-                author="PsyChat",
-            )
-
-            story = []
-
-            # Titre, sous-titre
-            story.append(Paragraph("RAPPORT PSYCHIATRIQUE", self.styles["ReportTitle"]))
-            story.append(Paragraph("Synthèse clinique — générée par PsyChat", self.styles["ReportSubtitle"]))
-            story.append(Spacer(1, 8))
-
-            # Ligne d'accent visuelle
-            story.append(self._accent_rule())
-            story.append(Spacer(1, 6))
-
-            # Section Bilan final
-            story.append(Paragraph("Bilan final", self.styles["SectionHeader"]))
-
-            # Corps du rapport (multi-pages autorisées pour lisibilité)
-            elements = self._md_to_elements(md)
-            story.extend(elements)
-
-            # Bas de page (date + confidentiel)
-            story.append(Spacer(1, 10))
-            story.append(self._accent_rule(thin=True))
-            date_str = datetime.now().strftime("Généré le %d/%m/%Y à %H:%M")
-            story.append(Paragraph(f"<font size=9>{date_str} — Document confidentiel</font>", self.styles["BodyTextLarge"]))
-
-            def _header_footer(canvas, doc_):
-                canvas.setFillColor(self.primary_blue)
-                canvas.rect(doc_.leftMargin, A4[1] - doc_.topMargin + 10, doc_.width, 2, stroke=0, fill=1)
-                if self.logo_path and os.path.exists(self.logo_path):
-                    try:
-                        logo = ImageReader(self.logo_path)
-                        canvas.drawImage(logo, A4[0] - doc_.rightMargin - 30, A4[1] - doc_.topMargin + 0, width=55, height=55, mask='auto')
-                    except Exception:
-                        pass
-
-            doc.build(story, onFirstPage=_header_footer, onLaterPages=_header_footer)
-            return tmp.name
-        except Exception as e:
-            import traceback, logging
-            logging.getLogger(__name__).error(f"Erreur PDF: {e}")
-            traceback.print_exc()
-            return None
+            # Image embarquée une fois par document (Form XObject), simple référence sur chaque page
+            if not canvas.hasForm(_LOGO_FORM):
+                canvas.beginForm(_LOGO_FORM)
+                canvas.drawImage(
+                    self._logo, A4[0] - doc_.rightMargin - 30, A4[1] - doc_.topMargin + 0,
+                    width=LOGO_SIZE, height=LOGO_SIZE, mask='auto'
+                )
+                canvas.endForm()
+            canvas.doForm(_LOGO_FORM)
+        except Exception:
+            pass
 
     def _accent_rule(self, thin: bool = False):
+        # Copie superficielle: chaque rendu dessine sa propre instance (état `canv` du flowable)
+        return copy.copy(self._rules[thin])
+
+    def _build_accent_rule(self, thin: bool):
         from reportlab.graphics.shapes import Drawing, Line
         d = Drawing(400, 2 if thin else 3)
         ln = Line(0, 1, 400, 1)
@@ -0,0 +1,304 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Dict, NamedTuple, Optional, Tuple
+
+from . import disk_cache
+from .private_files import open_private, private_dir
+from .telemetry import Histogram
+
+if TYPE_CHECKING:
+    # ReportLab et PIL ne sont importés qu'au premier rendu ou au préchauffage (démarrage à froid)
+    from .pdf_generator import ModernPDFGenerator
+
+logger = logging.getLogger(__name__)
+
+# À incrémenter quand la mise en page change: les PDF déjà en cache ne sont plus réutilisés
+PDF_CACHE_VERSION = 2
+
+# Générateur propre à chaque processus (pool de rendu, ou appelant pour la clé): chargé une fois
+_worker_generator: Optional["ModernPDFGenerator"] = None
+
+
+def _generator() -> "ModernPDFGenerator":
+    """Générateur du processus courant (styles et logo chargés au premier appel)."""
+    global _worker_generator
+    if _worker_generator is None:
+        from .pdf_generator import ModernPDFGenerator
+
+        _worker_generator = ModernPDFGenerator()
+    return _worker_generator
+
+
+def _warm_job(hold: float) -> int:
+    """Exécuté dans un processus du pool: charge le générateur, occupe le processus `hold` s."""
+    _generator()
+    time.sleep(hold)
+    return os.getpid()
+
+
+# Pool démarré par `prestart` avant les threads du serveur (nombre de processus, pool),
+# repris par le premier service de même taille
+_prestarted: Optional[Tuple[int, ProcessPoolExecutor]] = None
+
+
+def _pool_context() -> multiprocessing.context.BaseContext:
+    """Méthode de démarrage des processus de rendu.
+
+    fork tant que le processus n'a qu'un thread: les processus n'ont rien à réimporter.
+    Au-delà (pool recréé après un processus tué, application importée dans un thread sans
+    `prestart`), un fork copierait des verrous tenus par d'autres threads: les processus
+    naissent alors d'un serveur de fork qui ne précharge que ce module (à défaut, spawn).
+    """
+    methods = multiprocessing.get_all_start_methods()
+    if "fork" in methods and threading.active_count() == 1:
+        return multiprocessing.get_context("fork")
+    if "forkserver" in methods:
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def prestart(processes: Optional[int] = None) -> None:
+    """Démarre les processus de rendu avant les threads du serveur (voir main.run).
+
+    L'application, importée ensuite en arrière-plan, reprend ce pool au lieu de forker
+    un processus qui a déjà ses threads.
+    """
+    global _prestarted
+    processes = processes if processes is not None else int(os.getenv("PSYCHAT_PDF_PROCESSES", "2"))
+    if processes <= 0 or _prestarted is not None:
+        return
+    pool = ProcessPoolExecutor(max_workers=processes, mp_context=_pool_context())
+    pool.submit(os.getpid).result()
+    _prestarted = (processes, pool)
+
+
+def _take_prestarted(processes: int) -> Optional[ProcessPoolExecutor]:
+    """Pool de `prestart` s'il a la taille demandée (repris une seule fois)."""
+    global _prestarted
+    if _prestarted is None or _prestarted[0] != processes:
+        return None
+    pool = _prestarted[1]
+    _prestarted = None
+    return pool
+
+
+class RenderedPDF(NamedTuple):
+    """PDF rendu: en mémoire (`data`) ou, au-delà du seuil de spool, dans le cache disque (`path`)."""
+    key: str
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+
+def _render_job(markdown: str, path: str, spool_limit: int) -> Tuple[Optional[bytes], Optional[str]]:
+    """Exécuté dans un processus du pool: rendu dans un spool mémoire, disque au-delà du seuil."""
+    with tempfile.SpooledTemporaryFile(max_size=spool_limit) as spool:
+        _generator().render(markdown, spool)
+        if spool.tell() <= spool_limit:
+            spool.seek(0)
+            return spool.read(), None
+        # Rapport volumineux: publication atomique dans le cache disque
+        partial = disk_cache.partial(path)
+        try:
+            spool.seek(0)
+            with open_private(partial) as f:
+                shutil.copyfileobj(spool, f)
+            os.replace(partial, path)
+        finally:
+            if os.path.exists(partial):
+                os.unlink(partial)
+    return None, path
+
+
+class PDFRenderService:
+    """Rendu des rapports PDF dans un pool de processus, avec cache des résultats.
+
+    - Clé = empreinte SHA-256 du markdown nettoyé (sert aussi d'ETag): un même rapport
+      n'est jamais rendu deux fois, et les demandes concurrentes rejoignent le rendu en cours
+    - `doc.build` s'exécute hors du processus Flask (le GIL des requêtes reste libre)
+    - Rendu dans un spool mémoire: les PDF de taille courante (< `spool_limit`) restent
+      en mémoire (LRU borné par `max_memory`) et ne touchent jamais le disque
+    - Au-delà, cache disque borné (`max_bytes`, `max_age`), éviction des moins récemment
+      servis; un rapport évincé est simplement rendu de nouveau
+
+    `processes=0` rend dans des threads du processus courant (plateformes sans fork).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Optional[str] = None,
+        processes: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        max_memory: Optional[int] = None,
+        spool_limit: Optional[int] = None,
+    ) -> None:
+        self.cache_dir = cache_dir or os.getenv(
+            "PSYCHAT_PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "psychat_pdf_cache")
+        )
+        self.processes = processes if processes is not None else int(os.getenv("PSYCHAT_PDF_PROCESSES", "2"))
+        self.max_bytes = max_bytes or int(os.getenv("PSYCHAT_PDF_CACHE_MAX_BYTES", str(200 * 1024 * 1024)))
+        self.max_age = max_age or float(os.getenv("PSYCHAT_PDF_CACHE_MAX_AGE", "86400"))
+        self.max_memory = max_memory or int(os.getenv("PSYCHAT_PDF_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+        self.spool_limit = spool_limit or int(os.getenv("PSYCHAT_PDF_SPOOL_BYTES", str(8 * 1024 * 1024)))
+        # Rapports de patients: répertoire réservé à l'utilisateur du serveur, même sous /tmp
+        private_dir(self.cache_dir)
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._pool: Optional[Executor] = None
+        self._counters: Dict[str, int] = {"renders": 0, "hits": 0, "joined": 0, "failures": 0, "evicted": 0}
+        # Rendus effectifs, attente d'un processus du pool comprise (exposé sur /metrics)
+        self.render_seconds = Histogram("psychat_pdf_render_seconds", "Durée des rendus PDF", ("result",))
+
+    # ---------------- Pool ----------------
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.processes <= 0:
+                self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="psychat-pdf")
+            else:
+                self._pool = _take_prestarted(self.processes) or ProcessPoolExecutor(
+                    max_workers=self.processes, mp_context=_pool_context()
+                )
+        return self._pool
+
+    def start(self) -> None:
+        """Démarre les processus du pool (repris de `prestart`, sinon voir `_pool_context`)."""
+        with self._lock:
+            executor = self._executor()
+        executor.submit(os.getpid).result()
+
+    def warm_up(self) -> None:
+        """Charge ReportLab, styles et logo dans ce processus et dans chaque processus du pool."""
+        _generator()
+        with self._lock:
+            executor = self._executor()
+        # Une tâche par processus: chacune garde le sien occupé le temps que les autres démarrent
+        jobs = [executor.submit(_warm_job, 0.2) for _ in range(max(self.processes, 1))]
+        for job in jobs:
+            job.result()
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+    # ---------------- Rendu ----------------
+    def key(self, markdown: str) -> str:
+        # Nettoyage du markdown dans le processus appelant (nécessaire au calcul de la clé)
+        cleaned = _generator()._clean_markdown(markdown)
+        return hashlib.sha256(f"{PDF_CACHE_VERSION}\n{cleaned}".encode("utf-8")).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def submit(self, markdown: str) -> Future:
+        """Future d'un `RenderedPDF`: résolue immédiatement si le rapport est en cache."""
+        key = self.key(markdown)
+        path = self.path(key)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters["joined"] += 1
+                return future
+            cached = self._cached(key, path)
+            if cached is not None:
+                self._counters["hits"] += 1
+                future = Future()
+                future.set_result(cached)
+                return future
+            future = Future()
+            started = time.perf_counter()
+            job = self._executor().submit(_render_job, markdown, path, self.spool_limit)
+            self._inflight[key] = future
+            self._counters["renders"] += 1
+        job.add_done_callback(lambda f: self._on_done(key, f, future, started))
+        return future
+
+    def _cached(self, key: str, path: str) -> Optional[RenderedPDF]:
+        data = self._memory.get(key)
+        if data is not None:
+            self._memory.move_to_end(key)
+            return RenderedPDF(key, len(data), data=data)
+        if os.path.exists(path):
+            disk_cache.touch(path)
+            return RenderedPDF(key, os.path.getsize(path), path=path)
+        return None
+
+    def _on_done(self, key: str, job: Future, future: Future, started: float) -> None:
+        error = job.exception()
+        self.render_seconds.observe(time.perf_counter() - started, "error" if error is not None else "ok")
+        with self._lock:
+            self._inflight.pop(key, None)
+            if error is not None:
+                self._counters["failures"] += 1
+                if isinstance(error, BrokenProcessPool):
+                    # Processus tué (OOM...): le prochain rendu recrée le pool
+                    self._pool = None
+            else:
+                data, path = job.result()
+                if data is not None:
+                    self._remember(key, data)
+                    rendered = RenderedPDF(key, len(data), data=data)
+                else:
+                    rendered = RenderedPDF(key, os.path.getsize(path), path=path)
+        if error is not None:
+            logger.error(f"Erreur lors du rendu PDF {key[:12]}: {str(error)}")
+            future.set_exception(error)
+            return
+        future.set_result(rendered)
+        if rendered.path is not None:
+            self.sweep()
+
+    def _remember(self, key: str, data: bytes) -> None:
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._counters["evicted"] += 1
+
+    def discard(self, key: Optional[str]) -> None:
+        """Oublie un PDF (fin de session): mémoire et disque; sans effet pendant son rendu."""
+        if not key:
+            return
+        with self._lock:
+            if key in self._inflight:
+                return
+            data = self._memory.pop(key, None)
+            if data is not None:
+                self._memory_bytes -= len(data)
+            try:
+                os.unlink(self.path(key))
+            except OSError:
+                pass
+
+    # ---------------- Éviction ----------------
+    def sweep(self) -> None:
+        """Évince les PDF disque trop anciens puis les moins récemment servis au-delà de `max_bytes`."""
+        evicted, _ = disk_cache.sweep(self.cache_dir, ".pdf", self.max_bytes, self.max_age)
+        with self._lock:
+            self._counters["evicted"] += evicted
+
+    # ---------------- Compteurs ----------------
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["in_progress"] = len(self._inflight)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+        return stats
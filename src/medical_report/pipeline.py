@@ -0,0 +1,120 @@
+import logging
+import re
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Executor
+from typing import Dict, List, Optional, Tuple
+
+from .session_context import propagate
+logger = logging.getLogger(__name__)
+
+# Rubriques du dossier patient, dans l'ordre de restitution
+DOSSIER_SECTIONS = (
+    "Identité",
+    "Motif de consultation",
+    "Histoire du problème",
+    "Symptômes",
+    "Antécédents et traitements",
+    "Contexte psychosocial",
+)
+OTHER_SECTION = "Autres éléments"
+
+_NOTE_LINE = re.compile(r"^\s*[-*]\s*\[([^\]]+)\]\s*(.+)$")
+
+
+class IncrementalDossier:
+    """Structuration du dossier patient au fil de l'entretien (mode pipeline).
+
+    Chaque échange répondu est confié à l'analyste clinique pendant que le patient
+    lit la question suivante; les échanges arrivés pendant un appel sont traités
+    ensemble au suivant. À la fin de l'entretien, `dossier()` assemble les notes
+    par rubrique sans nouvel appel LLM.
+    """
+
+    def __init__(self, crew_instance, topic: str, executor: Executor) -> None:
+        self.crew_instance = crew_instance
+        self.topic = topic
+        self.executor = executor
+
+        self._pending: deque = deque()
+        self._notes: Dict[int, str] = {}
+        self._running = False
+        self._cond = threading.Condition()
+
+    def add_exchange(self, number: int, question: str, answer: str) -> None:
+        with self._cond:
+            self._pending.append((number, question, answer))
+            if self._running:
+                return
+            self._running = True
+        # Structuration dans le contexte de la session qui l'alimente (spans de sa trace)
+        self.executor.submit(propagate(self._drain))
+
+    def _drain(self) -> None:
+        while True:
+            with self._cond:
+                if not self._pending:
+                    self._running = False
+                    self._cond.notify_all()
+                    return
+                batch = list(self._pending)
+                self._pending.clear()
+            note = self._structure(batch)
+            with self._cond:
+                self._notes[batch[0][0]] = note
+
+    def _structure(self, batch: List[Tuple[int, str, str]]) -> str:
+        text = _format_exchanges(batch)
+        try:
+            task = self.crew_instance.tache_structuration_incrementale()
+            # Consignes statiques en tête du prompt (préfixe réutilisable par le cache du fournisseur),
+            # parties propres à la session en contexte, à la fin
+            context = f"Sujet de l'entretien : {self.topic}\n\n{text}"
+            return task.execute_sync(agent=task.agent, context=context).raw
+        except Exception as e:
+            # L'échange brut reste dans le dossier: l'analyse diagnostique ne perd rien
+            logger.error(f"Structuration incrémentale impossible (échanges {batch[0][0]}+): {str(e)}")
+            return text
+
+    def dossier(self, timeout: Optional[float] = None) -> str:
+        """Attend la fin des structurations en cours et assemble le dossier Markdown.
+
+        Lève TimeoutError si elles ne sont pas terminées après `timeout` secondes.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: not self._running and not self._pending, timeout=timeout):
+                raise TimeoutError(f"Structuration du dossier non terminée après {timeout:.0f} s")
+            notes = [self._notes[k] for k in sorted(self._notes)]
+
+        sections: "OrderedDict[str, List[str]]" = OrderedDict((s, []) for s in DOSSIER_SECTIONS)
+        for note in notes:
+            for line in note.splitlines():
+                match = _NOTE_LINE.match(line)
+                if match:
+                    section = _match_section(match.group(1))
+                    sections.setdefault(section, []).append(match.group(2).strip())
+                elif line.strip():
+                    sections.setdefault(OTHER_SECTION, []).append(line.strip().lstrip("-* "))
+
+        parts = ["# Dossier patient structuré"]
+        for section, items in sections.items():
+            if items:
+                parts.append(f"## {section}")
+                parts.extend(f"- {item}" for item in items)
+        return "\n".join(parts)
+
+
+def _format_exchanges(batch: List[Tuple[int, str, str]]) -> str:
+    lines = []
+    for number, question, answer in batch:
+        lines.append(f"- **Question {number}:** {question}")
+        lines.append(f"- **Réponse {number}:** {answer}")
+    return "\n".join(lines)
+
+
+def _match_section(label: str) -> str:
+    key = label.strip().lower()
+    for section in DOSSIER_SECTIONS:
+        if section.lower().startswith(key) or key.startswith(section.lower().split()[0]):
+            return section
+    return OTHER_SECTION
@@ -0,0 +1,37 @@
+"""Répertoires et fichiers réservés à l'utilisateur du serveur (données de patients).
+
+Les caches (PDF rendus, réponses LLM) vivent par défaut sous le répertoire temporaire
+commun de la machine: sans précaution, les autres utilisateurs locaux pourraient les lire.
+
+- `private_dir(path)`: crée le répertoire en 0o700; s'il existe déjà, vérifie qu'il
+  appartient à l'utilisateur courant (PermissionError sinon) et retire les droits
+  des autres
+- `open_private(path)`: fichier ouvert en écriture binaire, créé en 0o600
+"""
+import logging
+import os
+import stat
+from typing import BinaryIO
+
+logger = logging.getLogger(__name__)
+
+
+def private_dir(path: str) -> str:
+    """Répertoire `path` réservé à l'utilisateur courant (créé si besoin)."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(f"{path} n'est pas un répertoire (lien symbolique refusé)")
+    if hasattr(os, "getuid"):
+        if info.st_uid != os.getuid():
+            raise PermissionError(f"Répertoire {path} appartenant à un autre utilisateur (uid {info.st_uid})")
+        if stat.S_IMODE(info.st_mode) & 0o077:
+            logger.warning(f"Répertoire {path} accessible aux autres utilisateurs: droits ramenés à 0700")
+            os.chmod(path, 0o700)
+    return path
+
+
+def open_private(path: str) -> BinaryIO:
+    """Ouvre `path` en écriture binaire (tronqué), créé avec les droits 0o600."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_NOFOLLOW", 0) | getattr(os, "O_BINARY", 0)
+    return os.fdopen(os.open(path, flags, 0o600), "wb")
@@ -0,0 +1,404 @@
+"""Banque de questions guides de l'entretien, indexée en mémoire (BM25 lexical).
+
+Sources: les fichiers de `knowledge/` (listes de questions par rubrique, voir
+`knowledge/questions_entretien.md`) et les transcriptions passées (JSONL/JSON avec
+`exchanges`, ou transcriptions markdown "**Question N:** ..."). Une question posée dans
+plusieurs entretiens n'est indexée qu'une fois, son nombre d'occurrences la fait remonter.
+
+Dans l'entretien (`QuestionBankLLM`), les questions d'ouverture sont servies depuis la
+banque sans génération, et chaque tour suivant reçoit quelques questions candidates
+(domaines restant à explorer, proches de la dernière réponse) que l'agent adapte.
+
+Usage: python -m medical_report.question_bank [--transcripts transcripts.jsonl ...] [--query "je dors mal"]
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from crewai.llms.base_llm import BaseLLM
+
+from .llm_cache import WrappedLLM
+from .tools.custom_tool import AskPatientTool
+from .tools.response_analyzer import DOMAINS, analyze, domains_in, normalize
+from .transcript import INTERVIEW_TASK
+
+logger = logging.getLogger(__name__)
+
+ASK_TOOL = AskPatientTool.model_fields['name'].default
+
+# Rubriques particulières de la banque (en plus des domaines de l'entretien)
+OPENING = "ouverture"
+RISK = "risques"
+
+DEFAULT_KNOWLEDGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'knowledge'))
+
+_LABELS = {key: label for key, label, _ in DOMAINS}
+_WORD = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a ai au aux avec avez c ce ces cette comment d dans de des du en est et etes il elle j je l la le les "
+    "leur m ma me mes moi mon n ne ou par pas plus pour pouvez qu que quel quelle quels quelles qui s sa se "
+    "ses son sur t te un une vos votre vous y".split()
+)
+_QUESTION_LINE = re.compile(r"^\s*(?:[-*+]|\d+[.)])\s+(.{10,300}\?)\s*$")
+_TRANSCRIPT_QUESTION = re.compile(r"\*\*Question\s+\d+\s*:\*\*\s*(.{10,300}?\?)")
+# Éléments du prompt de l'interviewer (voir config/tasks.yaml, app._format_history, transcript.py)
+_TOPIC = re.compile(r"sujet général de la consultation est : '(.+?)'\.")
+_RESUMED = re.compile(r"REPRISE D'ENTRETIEN : les (\d+) premiers échanges")
+_MEMORY_ASKED = re.compile(r"(\d+) question\(s\) déjà posée\(s\)")
+_ASKED = re.compile(r'"question"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class BankQuestion(NamedTuple):
+    text: str
+    # Clé de domaine (DOMAINS), OPENING, RISK ou None
+    domain: Optional[str]
+    source: str
+    count: int = 1
+
+
+def terms(text: str) -> List[str]:
+    """Termes indexés: minuscules sans accents, mots vides retirés, racine de 6 caractères."""
+    return [w[:6] for w in _WORD.findall(normalize(text)) if w not in _STOPWORDS and len(w) > 1]
+
+
+def classify(text: str) -> Optional[str]:
+    """Domaine le plus représenté dans le texte (lexique de l'analyse des réponses)."""
+    found = domains_in(text)
+    return found.most_common(1)[0][0] if found else None
+
+
+def _heading_domain(heading: str) -> Optional[str]:
+    head = normalize(heading)
+    for key in (OPENING, RISK) + tuple(key for key, _, _ in DOMAINS):
+        if head.startswith(key[:6]):
+            return key
+    return classify(heading)
+
+
+class QuestionBank:
+    """Index BM25 en mémoire des questions guides; construit une fois, lu par tous les crews.
+
+    - `opening(topic)`: questions d'ouverture dans l'ordre de la banque, `{topic}` remplacé
+    - `search(query, domains, exclude)`: meilleures questions pour une requête (dernière
+      réponse, sujet), domaines visés en tête, questions proches de celles déjà posées exclues
+    """
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, questions: Iterable[BankQuestion] = ()) -> None:
+        self._questions: List[BankQuestion] = []
+        self._keys: Dict[Tuple[str, ...], int] = {}
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._lengths: List[int] = []
+        self._sets: List[frozenset] = []
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"served": 0, "hinted": 0}
+        for question in questions:
+            self.add(question)
+
+    # ---------------- Construction ----------------
+    def add(self, question: BankQuestion) -> None:
+        words = terms(question.text)
+        key = tuple(sorted(set(words)))
+        if not key:
+            return
+        index = self._keys.get(key)
+        if index is not None:
+            # Déjà indexée (reformulation identique aux mots vides près): une occurrence de plus
+            known = self._questions[index]
+            self._questions[index] = known._replace(count=known.count + question.count, domain=known.domain or question.domain)
+            return
+        self._keys[key] = len(self._questions)
+        for term, tf in Counter(words).items():
+            self._postings[term].append((len(self._questions), tf))
+        self._questions.append(question)
+        self._lengths.append(len(words))
+        self._sets.append(frozenset(words))
+
+    @classmethod
+    def load(cls, knowledge_dir: Optional[str] = None, transcripts: Sequence[str] = ()) -> "QuestionBank":
+        bank = cls()
+        knowledge_dir = knowledge_dir or DEFAULT_KNOWLEDGE_DIR
+        if os.path.isdir(knowledge_dir):
+            for name in sorted(os.listdir(knowledge_dir)):
+                if name.endswith((".md", ".txt")):
+                    for question in _from_knowledge(os.path.join(knowledge_dir, name)):
+                        bank.add(question)
+        for path in transcripts:
+            try:
+                for question in _from_transcripts(path):
+                    bank.add(question)
+            except (OSError, ValueError) as e:
+                logger.error(f"Transcriptions illisibles pour la banque de questions ({path}): {str(e)}")
+        logger.info(f"Banque de questions: {len(bank)} questions indexées")
+        return bank
+
+    @classmethod
+    def from_env(cls) -> Optional["QuestionBank"]:
+        """Banque de PSYCHAT_QUESTION_BANK_DIR (+ PSYCHAT_QUESTION_BANK_TRANSCRIPTS); None si désactivée."""
+        if os.getenv("PSYCHAT_QUESTION_BANK", "1").lower() in ("0", "false", "no"):
+            return None
+        transcripts = [p for p in os.getenv("PSYCHAT_QUESTION_BANK_TRANSCRIPTS", "").split(os.pathsep) if p]
+        bank = cls.load(os.getenv("PSYCHAT_QUESTION_BANK_DIR") or None, transcripts)
+        return bank if len(bank) else None
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    # ---------------- Recherche ----------------
+    def opening(self, topic: Optional[str] = None) -> List[str]:
+        return [_with_topic(q.text, topic) for q in self._questions if q.domain == OPENING]
+
+    def search(
+        self,
+        query: str,
+        domains: Sequence[str] = (),
+        exclude: Sequence[str] = (),
+        k: int = 3,
+        topic: Optional[str] = None,
+    ) -> List[BankQuestion]:
+        """`k` questions les plus pertinentes; une par domaine visé d'abord, dans l'ordre de `domains`."""
+        scores = self._scores(terms(query))
+        excluded = [set(terms(text)) for text in exclude]
+        ranked = sorted(
+            (i for i, q in enumerate(self._questions) if q.domain != OPENING),
+            key=lambda i: -(scores.get(i, 0.0) + 0.1 * math.log1p(self._questions[i].count)),
+        )
+        picked: List[int] = []
+
+        def admissible(i: int) -> bool:
+            return i not in picked and not any(_overlap(self._sets[i], asked) > 0.6 for asked in excluded)
+
+        for domain in domains:
+            best = next((i for i in ranked if self._questions[i].domain == domain and admissible(i)), None)
+            if best is not None:
+                picked.append(best)
+            if len(picked) >= k:
+                break
+        for i in ranked:
+            if len(picked) >= k:
+                break
+            if scores.get(i) and admissible(i):
+                picked.append(i)
+        return [self._questions[i]._replace(text=_with_topic(self._questions[i].text, topic)) for i in picked]
+
+    def _scores(self, query: List[str]) -> Dict[int, float]:
+        n = len(self._questions)
+        if not n:
+            return {}
+        average = sum(self._lengths) / n
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(query):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, tf in postings:
+                norm = tf + self.K1 * (1 - self.B + self.B * self._lengths[i] / average)
+                scores[i] += idf * tf * (self.K1 + 1) / norm
+        return scores
+
+    # ---------------- Entretien ----------------
+    def wrap(self, llm: BaseLLM, opening: Optional[int] = None, candidates: Optional[int] = None) -> BaseLLM:
+        """LLM de l'interviewer: ouverture servie depuis la banque, candidates ajoutées ensuite."""
+        return QuestionBankLLM(
+            llm, self,
+            opening if opening is not None else int(os.getenv("PSYCHAT_QUESTION_BANK_OPENING", "2")),
+            candidates if candidates is not None else int(os.getenv("PSYCHAT_QUESTION_BANK_CANDIDATES", "3")),
+        )
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+        stats["questions"] = len(self._questions)
+        return stats
+
+
+class QuestionBankLLM(WrappedLLM):
+    """Enveloppe du LLM de l'interviewer.
+
+    - Tant que moins de `opening` questions ont été posées (compte lu dans le prompt:
+      actions de l'outil, mémoire résumée, reprise), la question d'ouverture suivante est
+      servie sans génération, sauf si la dernière réponse porte un signal de risque
+    - Ensuite, `candidates` questions de la banque sont ajoutées en fin de prompt: signaux
+      de risque et domaines non encore explorés d'abord, proches de la dernière réponse
+    - Tout est déduit du prompt: un même prompt donne la même réponse ou le même ajout
+      (pré-génération de la question suivante, voir speculation.py)
+    """
+
+    def __init__(self, llm: BaseLLM, bank: QuestionBank, opening: int, candidates: int) -> None:
+        self._bank = bank
+        self._opening = opening
+        self._candidates = candidates
+        super().__init__(llm)
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        if getattr(from_task, "name", None) != INTERVIEW_TASK or tools or not isinstance(messages, list):
+            return self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+        try:
+            response, messages = self._from_bank(messages, from_task, from_agent)
+        except Exception as e:
+            # La banque n'est qu'une aide: le tour continue avec le prompt d'origine
+            logger.error(f"Banque de questions ignorée pour ce tour: {str(e)}")
+            response = None
+        if response is not None:
+            return response
+        return self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+
+    def _from_bank(self, messages: List[Dict[str, Any]], from_task: Any, from_agent: Any) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+        """Question d'ouverture servie sans génération, ou prompt complété par des pistes de la banque."""
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        history = [str(m.get("content", "")) for m in messages if m.get("role") == "assistant"]
+        asked = sum(h.count(f"Action: {ASK_TOOL}") for h in history)
+        for pattern in (_MEMORY_ASKED, _RESUMED):
+            match = pattern.search(prompt)
+            if match:
+                asked += int(match.group(1))
+        topic_match = _TOPIC.search(prompt)
+        topic = topic_match.group(1) if topic_match else None
+        last_answer = _last_observation(history)
+        analysis = analyze(last_answer, "\n".join(history))
+
+        openings = self._bank.opening(topic)
+        if asked < min(self._opening, len(openings)) and not analysis.risks:
+            response = (
+                "Thought: Je commence par l'identification et le motif de consultation.\n"
+                f"Action: {ASK_TOOL}\n"
+                f"Action Input: {json.dumps({'question': openings[asked]}, ensure_ascii=False)}"
+            )
+            logger.info(f"Question d'ouverture {asked + 1} servie depuis la banque")
+            self._bank._count("served")
+            self._replay(messages, response, from_task, from_agent)
+            return response, messages
+
+        if self._candidates and asked:
+            exclude = _asked_questions(history)
+            domains = ([RISK] if analysis.risks else []) + analysis.uncovered
+            found = self._bank.search(last_answer or (topic or ""), domains, exclude, self._candidates, topic)
+            if found:
+                self._bank._count("hinted")
+                messages = messages + [{"role": "user", "content": _hint(found)}]
+        return None, messages
+
+
+def _asked_questions(history: List[str]) -> List[str]:
+    """Questions déjà posées (Action Input de l'outil), même mal échappées par le modèle."""
+    asked = []
+    for raw in (q for h in history for q in _ASKED.findall(h)):
+        try:
+            asked.append(json.loads(f'"{raw}"', strict=False))
+        except ValueError:
+            # Échappement hors JSON (\' par exemple): texte brut, apostrophes et guillemets rétablis
+            asked.append(raw.replace("\\'", "'").replace('\\"', '"'))
+    return asked
+
+
+def _hint(questions: List[BankQuestion]) -> str:
+    lines = ["BANQUE DE QUESTIONS (pistes pour la question suivante, à adapter au patient ou à ignorer) :"]
+    for q in questions:
+        label = "Risques" if q.domain == RISK else _LABELS.get(q.domain or "", "Autre")
+        lines.append(f"- [{label}] {q.text}")
+    return "\n".join(lines)
+
+
+def _last_observation(history: List[str]) -> str:
+    for content in reversed(history):
+        _, sep, observation = content.rpartition("Observation:")
+        if sep:
+            return observation.strip()
+    return ""
+
+
+def _overlap(a: frozenset, b: set) -> float:
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def _with_topic(text: str, topic: Optional[str]) -> str:
+    if "{topic}" not in text:
+        return text
+    if topic:
+        return text.replace("{topic}", topic)
+    # Sujet inconnu: la précision entre guillemets disparaît avec lui
+    return re.sub(r"\s*(?:au sujet de|concernant)?\s*« \{topic\} »", "", text).replace("{topic}", "")
+
+
+# ---------------- Sources ----------------
+def _from_knowledge(path: str) -> Iterator[BankQuestion]:
+    domain: Optional[str] = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#"):
+                domain = _heading_domain(line.lstrip("#").strip()) if line.startswith("##") else None
+                continue
+            match = _QUESTION_LINE.match(line)
+            if match:
+                text = match.group(1).strip()
+                yield BankQuestion(text, domain or classify(text), f"knowledge/{os.path.basename(path)}")
+
+
+def _from_transcripts(path: str) -> Iterator[BankQuestion]:
+    """Questions posées dans des entretiens passés (formats du traitement par lot, voir batch.py)."""
+    paths = [os.path.join(path, n) for n in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+    for file_path in paths:
+        ext = os.path.splitext(file_path)[1].lower()
+        with open(file_path, "r", encoding="utf-8") as f:
+            if ext == ".jsonl":
+                records = [json.loads(line) for line in f if line.strip()]
+            elif ext == ".json":
+                records = [json.load(f)]
+            elif ext in (".md", ".txt"):
+                records = [{"transcript": f.read()}]
+            else:
+                continue
+        for record in records:
+            questions = [ex.get("question") or "" for ex in record.get("exchanges") or []]
+            questions += _TRANSCRIPT_QUESTION.findall(record.get("transcript") or "")
+            for text in questions:
+                text = " ".join(text.split())
+                if 10 <= len(text) <= 300:
+                    yield BankQuestion(text, classify(text), "transcripts")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--knowledge", default=None, help="dossier des questions guides (défaut: knowledge/)")
+    parser.add_argument("--transcripts", nargs="*", default=[], help="transcriptions passées (fichiers ou dossiers)")
+    parser.add_argument("--topic", default=None)
+    parser.add_argument("--query", default=None, help="réponse du patient pour laquelle chercher des questions")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    bank = QuestionBank.load(args.knowledge, args.transcripts)
+    by_domain = Counter(q.domain for q in bank._questions)
+    print(f"{len(bank)} questions: " + ", ".join(f"{d or 'autre'} {n}" for d, n in by_domain.most_common()))
+    for number, text in enumerate(bank.opening(args.topic), 1):
+        print(f"  ouverture {number}: {text}")
+    if args.query:
+        analysis = analyze(args.query)
+        domains = ([RISK] if analysis.risks else []) + analysis.uncovered
+        for q in bank.search(args.query, domains, k=args.k, topic=args.topic):
+            print(f"  [{q.domain}] {q.text}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
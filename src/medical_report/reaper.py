@@ -0,0 +1,105 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from .report_archive import ReportArchive
+from .session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+
+class SessionCancelled(Exception):
+    """Levée dans le thread du crew quand sa session a été évincée ou nettoyée."""
+
+
+class SessionReaper:
+    """Éviction périodique des sessions abandonnées.
+
+    Politiques appliquées à chaque passage:
+    - `max_age`: durée de vie maximale depuis la création
+    - `idle_timeout`: aucune activité (question, réponse, fin) depuis ce délai
+    - `max_live`: plafond LRU, les sessions les moins récemment actives partent en premier
+    - Rapports archivés au-delà de la durée de conservation de l'archive (`archive.expire`)
+
+    `evict(session_id, reason)` est fourni par l'application: il annule le crew,
+    supprime le PDF et l'état de la session.
+    """
+
+    def __init__(
+        self,
+        store: SessionStore,
+        evict: Callable[[str, str], None],
+        local_sessions: Callable[[], Iterable[str]],
+        idle_timeout: Optional[float] = None,
+        max_age: Optional[float] = None,
+        max_live: Optional[int] = None,
+        interval: Optional[float] = None,
+        archive: Optional[ReportArchive] = None,
+    ) -> None:
+        self.store = store
+        self.evict = evict
+        self.local_sessions = local_sessions
+        self.idle_timeout = idle_timeout if idle_timeout is not None else float(os.getenv("PSYCHAT_SESSION_IDLE_TIMEOUT", "900"))
+        self.max_age = max_age if max_age is not None else float(os.getenv("PSYCHAT_SESSION_MAX_AGE", "7200"))
+        self.max_live = max_live if max_live is not None else int(os.getenv("PSYCHAT_MAX_LIVE_SESSIONS", "1000"))
+        self.interval = interval if interval is not None else float(os.getenv("PSYCHAT_REAPER_INTERVAL", "30"))
+        self.archive = archive
+
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"idle": 0, "max_age": 0, "lru": 0, "orphan": 0}
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------- Boucle ----------------
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="psychat-reaper", daemon=True)
+        self._thread.start()
+
+    def _loop(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Erreur lors du passage du reaper: {str(e)}")
+
+    def sweep(self) -> None:
+        now = time.time()
+        records = self.store.list_sessions()
+        known = {r['session_id'] for r in records}
+        survivors = []
+
+        for record in records:
+            if now - record['created_at'] > self.max_age:
+                self._evict(record['session_id'], "max_age")
+            elif now - record['updated_at'] > self.idle_timeout:
+                self._evict(record['session_id'], "idle")
+            else:
+                survivors.append(record)
+
+        # Plafond LRU: list_sessions est trié de la moins à la plus récemment active
+        overflow = len(survivors) - self.max_live
+        for record in survivors[:max(overflow, 0)]:
+            self._evict(record['session_id'], "lru")
+
+        # Objets d'exécution locaux dont l'état a été supprimé par un autre worker
+        for session_id in list(self.local_sessions()):
+            if session_id not in known and self.store.get(session_id) is None:
+                self._evict(session_id, "orphan")
+
+        if self.archive is not None:
+            self.archive.expire(now)
+
+    def _evict(self, session_id: str, reason: str) -> None:
+        logger.info(f"Éviction de la session {session_id} ({reason})")
+        self.evict(session_id, reason)
+        with self._lock:
+            self._counters[reason] += 1
+
+    # ---------------- Compteurs ----------------
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
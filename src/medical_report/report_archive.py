@@ -0,0 +1,288 @@
+"""Archive des rapports finaux: versions par session, contenu adressé et compressé, index SQLite.
+
+- Rapport markdown et PDF rangés sous `objects/<2 premiers caractères>/<sha256>.z`
+  (SHA-256 du contenu brut, compression zlib): un contenu identique n'est stocké qu'une fois
+- Chaque écriture est atomique (fichier temporaire puis `os.replace`); la version n'est
+  indexée qu'une fois son contenu écrit: une lecture ne voit jamais un rapport partiel
+- Index (session, version, date, sujet, mode, empreintes) en B-tree SQLite: dernière version
+  d'une session, versions d'une session et liste par date ou par sujet sans parcourir le disque
+- Une nouvelle version par rapport terminé (reprise, régénération); le PDF est rattaché à
+  la version de son rapport une fois rendu
+- Indépendante du cycle de vie des sessions (/cleanup, éviction): `expire()` efface les
+  versions plus anciennes que `max_age` (PSYCHAT_REPORT_ARCHIVE_MAX_AGE), `delete(session_id)`
+  celles d'une session sur purge d'administration; un contenu n'est effacé que s'il ne sert plus à
+  aucune version. Effacements et ajouts passent par la même transaction d'écriture SQLite
+  (BEGIN IMMEDIATE): un ajout ne peut pas référencer un contenu en train d'être effacé
+"""
+import contextlib
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+from .private_files import open_private, private_dir
+from .session_store import transaction
+
+logger = logging.getLogger(__name__)
+
+
+class ArchivedReport(NamedTuple):
+    session_id: str
+    version: int
+    created_at: float
+    topic: str
+    mode: Optional[str]
+    markdown_key: str
+    markdown_size: int
+    pdf_key: Optional[str]
+    pdf_size: Optional[int]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return self._asdict()
+
+
+class ReportArchive:
+    """Archive durable des rapports, partagée par tous les workers d'une machine."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS reports (
+            session_id TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            topic TEXT NOT NULL,
+            mode TEXT,
+            markdown_key TEXT NOT NULL,
+            markdown_size INTEGER NOT NULL,
+            pdf_key TEXT,
+            pdf_size INTEGER,
+            PRIMARY KEY (session_id, version)
+        );
+        CREATE INDEX IF NOT EXISTS idx_reports_created ON reports (created_at);
+        CREATE INDEX IF NOT EXISTS idx_reports_topic ON reports (topic, created_at);
+        CREATE INDEX IF NOT EXISTS idx_reports_markdown ON reports (markdown_key);
+        CREATE INDEX IF NOT EXISTS idx_reports_pdf ON reports (pdf_key);
+    """
+    COLUMNS = "session_id, version, created_at, topic, mode, markdown_key, markdown_size, pdf_key, pdf_size"
+
+    def __init__(
+        self,
+        root: Optional[str] = None,
+        level: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        max_age: Optional[float] = None,
+    ) -> None:
+        self.enabled = enabled if enabled is not None else os.getenv("PSYCHAT_REPORT_ARCHIVE", "1").lower() not in ("0", "false", "no")
+        self.root = root or os.getenv("PSYCHAT_REPORT_ARCHIVE_DIR", "psychat_reports")
+        self.level = level if level is not None else int(os.getenv("PSYCHAT_REPORT_ARCHIVE_LEVEL", "9"))
+        self.max_age = max_age or float(os.getenv("PSYCHAT_REPORT_ARCHIVE_MAX_AGE", str(30 * 86400)))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {
+            "archived": 0, "pdfs": 0, "deduplicated": 0, "bytes_in": 0, "bytes_stored": 0, "deleted": 0, "expired": 0,
+        }
+        if self.enabled:
+            private_dir(self.root)
+            os.makedirs(os.path.join(self.root, "objects"), mode=0o700, exist_ok=True)
+            self._conn().executescript(self.SCHEMA)
+
+    # ---------------- Connexions ----------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "index.db"), timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Contenu ----------------
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, "objects", key[:2], f"{key}.z")
+
+    def _put_object(self, data: bytes) -> str:
+        key = hashlib.sha256(data).hexdigest()
+        path = self.path(key)
+        with self._lock:
+            self._counters["bytes_in"] += len(data)
+        if os.path.exists(path):
+            with self._lock:
+                self._counters["deduplicated"] += 1
+            return key
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        compressed = zlib.compress(data, self.level)
+        partial = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            with open_private(partial) as f:
+                f.write(compressed)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(partial)
+        with self._lock:
+            self._counters["bytes_stored"] += len(compressed)
+        return key
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            try:
+                data = zlib.decompress(f.read())
+            except zlib.error as e:
+                raise ValueError(f"Objet d'archive corrompu: {key[:12]} ({e})") from e
+        if hashlib.sha256(data).hexdigest() != key:
+            raise ValueError(f"Objet d'archive corrompu: {key[:12]}")
+        return data
+
+    # ---------------- Écriture ----------------
+    def add(self, session_id: str, topic: str, markdown: str, mode: Optional[str] = None) -> Optional[ArchivedReport]:
+        """Archive le rapport comme nouvelle version de la session (None si l'archive est désactivée)."""
+        if not self.enabled:
+            return None
+        data = markdown.encode("utf-8")
+        key = self._put_object(data)
+        now = time.time()
+        with transaction(self._conn()) as conn:
+            self._ensure_object(key, data)
+            row = conn.execute("SELECT MAX(version) FROM reports WHERE session_id = ?", (session_id,)).fetchone()
+            version = (row[0] or 0) + 1
+            conn.execute(
+                f"INSERT INTO reports ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, NULL, NULL)",
+                (session_id, version, now, topic, mode, key, len(data)),
+            )
+        with self._lock:
+            self._counters["archived"] += 1
+        return ArchivedReport(session_id, version, now, topic, mode, key, len(data), None, None)
+
+    def attach_pdf(self, session_id: str, markdown: str, pdf: bytes) -> bool:
+        """Rattache le PDF rendu à la dernière version de la session ayant ce rapport."""
+        if not self.enabled:
+            return False
+        markdown_key = hashlib.sha256(markdown.encode("utf-8")).hexdigest()
+        key = self._put_object(pdf)
+        with transaction(self._conn()) as conn:
+            self._ensure_object(key, pdf)
+            updated = conn.execute(
+                "UPDATE reports SET pdf_key = ?, pdf_size = ? WHERE session_id = ? AND version = "
+                "(SELECT MAX(version) FROM reports WHERE session_id = ? AND markdown_key = ?)",
+                (key, len(pdf), session_id, session_id, markdown_key),
+            ).rowcount
+            if not updated:
+                # Versions purgées ou expirées pendant le rendu: rien à conserver
+                self._unlink_unreferenced(conn, [key])
+        if updated:
+            with self._lock:
+                self._counters["pdfs"] += 1
+        return bool(updated)
+
+    def _ensure_object(self, key: str, data: bytes) -> None:
+        # Dans la transaction d'écriture: un effacement concurrent a pu retirer ce contenu déjà présent
+        if not os.path.exists(self.path(key)):
+            self._put_object(data)
+
+    # ---------------- Effacement ----------------
+    def delete(self, session_id: str) -> int:
+        """Efface toutes les versions d'une session (purge d'administration); retourne leur nombre."""
+        if not self.enabled:
+            return 0
+        deleted = self._delete("session_id = ?", (session_id,))
+        with self._lock:
+            self._counters["deleted"] += deleted
+        return deleted
+
+    def expire(self, now: Optional[float] = None) -> int:
+        """Efface les versions archivées depuis plus de `max_age` secondes."""
+        if not self.enabled:
+            return 0
+        expired = self._delete("created_at < ?", ((now or time.time()) - self.max_age,))
+        if expired:
+            logger.info(f"Archive des rapports: {expired} version(s) expirée(s)")
+            with self._lock:
+                self._counters["expired"] += expired
+        return expired
+
+    def _delete(self, where: str, params: tuple) -> int:
+        with transaction(self._conn()) as conn:
+            rows = conn.execute(f"SELECT markdown_key, pdf_key FROM reports WHERE {where}", params).fetchall()
+            if not rows:
+                return 0
+            conn.execute(f"DELETE FROM reports WHERE {where}", params)
+            self._unlink_unreferenced(conn, {key for row in rows for key in row if key})
+        return len(rows)
+
+    def _unlink_unreferenced(self, conn: sqlite3.Connection, keys: Iterable[str]) -> None:
+        for key in keys:
+            used = conn.execute(
+                "SELECT 1 FROM reports WHERE markdown_key = ? UNION ALL SELECT 1 FROM reports WHERE pdf_key = ? LIMIT 1",
+                (key, key),
+            ).fetchone()
+            if used is None:
+                with contextlib.suppress(FileNotFoundError):
+                    os.unlink(self.path(key))
+
+    # ---------------- Lecture ----------------
+    def get(self, session_id: str, version: Optional[int] = None) -> Optional[ArchivedReport]:
+        """Version demandée (par défaut la dernière) d'une session."""
+        if not self.enabled:
+            return None
+        if version is None:
+            row = self._conn().execute(
+                f"SELECT {self.COLUMNS} FROM reports WHERE session_id = ? ORDER BY version DESC LIMIT 1", (session_id,)
+            ).fetchone()
+        else:
+            row = self._conn().execute(
+                f"SELECT {self.COLUMNS} FROM reports WHERE session_id = ? AND version = ?", (session_id, version)
+            ).fetchone()
+        return ArchivedReport(*row) if row else None
+
+    def versions(self, session_id: str) -> List[ArchivedReport]:
+        if not self.enabled:
+            return []
+        rows = self._conn().execute(
+            f"SELECT {self.COLUMNS} FROM reports WHERE session_id = ? ORDER BY version", (session_id,)
+        )
+        return [ArchivedReport(*row) for row in rows]
+
+    def list(
+        self,
+        topic: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: int = 50,
+    ) -> List[ArchivedReport]:
+        """Rapports les plus récents d'abord, filtrés par sujet exact et/ou période [since, until[."""
+        if not self.enabled:
+            return []
+        clauses, params = [], []
+        if topic is not None:
+            clauses.append("topic = ?")
+            params.append(topic)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        rows = self._conn().execute(
+            f"SELECT {self.COLUMNS} FROM reports {where}ORDER BY created_at DESC LIMIT ?", (*params, limit)
+        )
+        return [ArchivedReport(*row) for row in rows]
+
+    def markdown(self, entry: ArchivedReport) -> str:
+        return self.read(entry.markdown_key).decode("utf-8")
+
+    def pdf(self, entry: ArchivedReport) -> Optional[bytes]:
+        return self.read(entry.pdf_key) if entry.pdf_key else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        if self.enabled:
+            stats["reports"] = self._conn().execute("SELECT COUNT(*) FROM reports").fetchone()[0]
+        return stats
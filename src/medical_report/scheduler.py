@@ -0,0 +1,167 @@
+import contextlib
+import heapq
+import itertools
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from .session_context import bind
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerFull(Exception):
+    """Levée quand le planificateur refuse une nouvelle session (file d'attente pleine)."""
+
+
+# Ordre d'attribution des places de travail (la plus petite passe en premier)
+RESUMED = 0   # entretien dont le patient vient de répondre
+NEW = 1       # session qui démarre
+
+
+class _Slots:
+    """Places de travail attribuées par priorité puis ordre d'arrivée."""
+
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.used = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: int) -> None:
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            while self._waiting[0] != ticket or self.used >= self.size:
+                self._cond.wait()
+            heapq.heappop(self._waiting)
+            self.used += 1
+            # Le suivant de la file réévalue sa place
+            self._cond.notify_all()
+
+    def release(self) -> None:
+        with self._cond:
+            self.used -= 1
+            self._cond.notify_all()
+
+
+class SessionScheduler:
+    """Planificateur de sessions à pool borné avec contrôle d'admission.
+
+    - Au plus `max_interviews` sessions ouvertes (un thread chacune, surtout en attente du patient)
+    - Parmi elles, au plus `max_workers` crews travaillent simultanément (étapes, appels LLM):
+      pendant l'attente d'une réponse (`parked`), un crew rend sa place à une autre session;
+      à la réponse, il la reprend avant les sessions qui démarrent
+    - Les sessions au-delà attendent dans une file FIFO (au plus `max_pending`)
+    - Au-delà, `submit` lève `SchedulerFull` pour que l'API réponde 503 immédiatement
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None,
+        max_interviews: Optional[int] = None,
+    ) -> None:
+        self.max_workers = max_workers or int(os.getenv("PSYCHAT_MAX_WORKERS", "8"))
+        self.max_pending = max_pending if max_pending is not None else int(os.getenv("PSYCHAT_MAX_PENDING", "200"))
+        self.max_interviews = max(
+            max_interviews or int(os.getenv("PSYCHAT_MAX_INTERVIEWS", "256")), self.max_workers
+        )
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_interviews, thread_name_prefix="psychat-worker")
+        self._slots = _Slots(self.max_workers)
+        self._lock = threading.Lock()
+        self._waiting: "OrderedDict[str, Future]" = OrderedDict()
+        self._running: Dict[str, Future] = {}
+        self._parked: Set[str] = set()
+
+    # ---------------- Soumission ----------------
+    def submit(self, session_id: str, fn: Callable[..., Any], *args: Any) -> Future:
+        """Place la session dans la file d'attente du pool, ou lève SchedulerFull."""
+        with self._lock:
+            in_flight = len(self._waiting) + len(self._running)
+            if in_flight >= self.max_interviews + self.max_pending:
+                raise SchedulerFull(
+                    f"Capacité atteinte ({self.max_interviews} sessions ouvertes, {self.max_pending} en attente)"
+                )
+            # Le verrou est tenu: _run ne peut pas retirer la session avant son enregistrement
+            future = self._executor.submit(self._run, session_id, fn, *args)
+            self._waiting[session_id] = future
+            return future
+
+    def _run(self, session_id: str, fn: Callable[..., Any], *args: Any) -> Any:
+        self._slots.acquire(NEW)
+        with self._lock:
+            future = self._waiting.pop(session_id, None)
+            if future is not None:
+                self._running[session_id] = future
+        if future is None:
+            # Annulée pendant l'attente d'une place
+            self._slots.release()
+            return None
+        # Enveloppes de LLM et handlers du bus retrouvent la session via son contexte d'exécution
+        try:
+            with bind(session_id):
+                return fn(*args)
+        finally:
+            with self._lock:
+                self._running.pop(session_id, None)
+            self._slots.release()
+
+    @contextlib.contextmanager
+    def parked(self, session_id: str) -> Iterator[None]:
+        """Bloc pendant lequel le crew de la session attend le patient sans occuper de place de travail.
+
+        Sans effet pour une session qui ne s'exécute pas dans ce planificateur.
+        """
+        with self._lock:
+            park = session_id in self._running and session_id not in self._parked
+            if park:
+                self._parked.add(session_id)
+        if not park:
+            yield
+            return
+        self._slots.release()
+        try:
+            yield
+        finally:
+            self._slots.acquire(RESUMED)
+            with self._lock:
+                self._parked.discard(session_id)
+
+    def cancel(self, session_id: str) -> bool:
+        """Retire une session encore en file d'attente. Retourne False si elle s'exécute déjà."""
+        with self._lock:
+            future = self._waiting.pop(session_id, None)
+        if future is None:
+            return False
+        # Déjà sur un thread mais sans place de travail: _run abandonne en l'obtenant
+        future.cancel()
+        return True
+
+    # ---------------- État ----------------
+    def position(self, session_id: str) -> int:
+        """Position (1-indexée) dans la file d'attente, 0 si la session n'attend pas."""
+        with self._lock:
+            for i, sid in enumerate(self._waiting, start=1):
+                if sid == session_id:
+                    return i
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_interviews": self.max_interviews,
+                "max_pending": self.max_pending,
+                "running": len(self._running) - len(self._parked),
+                "parked": len(self._parked),
+                "waiting": len(self._waiting),
+            }
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,46 @@
+"""Contexte d'exécution explicite d'une session (identifiant porté par une `ContextVar`).
+
+Le crew, ses outils, les enveloppes de LLM et les handlers du bus d'événements retrouvent
+leur session via `current_session()`, quel que soit le thread qui les exécute:
+
+- `bind(session_id)`: fixe la session pour le bloc (worker du planificateur, pré-génération)
+- `propagate(fn)`: capture le contexte courant pour un autre thread ou un executor;
+  les tâches asyncio (et `asyncio.to_thread`) copient déjà le contexte d'elles-mêmes
+- `run_bound(session_id, fn, ...)`: fonction de module, donc picklable, pour un pool
+  de processus où le contexte du parent n'existe pas
+
+Les outils de l'interviewer sont en outre liés à leur session à la construction du crew
+(voir `CrewFactory.instance`): ils n'ont pas besoin du contexte pour la retrouver.
+"""
+import contextlib
+import contextvars
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+
+_session: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("psychat_session", default=None)
+
+
+def current_session() -> Optional[str]:
+    """Identifiant de la session du contexte courant, None hors session."""
+    return _session.get()
+
+
+@contextlib.contextmanager
+def bind(session_id: Optional[str]) -> Iterator[None]:
+    token = _session.set(session_id)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+def run_bound(session_id: Optional[str], fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    with bind(session_id):
+        return fn(*args, **kwargs)
+
+
+def propagate(fn: Callable[..., T]) -> Callable[..., T]:
+    """`fn` exécutée dans une copie du contexte courant (à soumettre à un thread ou un executor)."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
@@ -0,0 +1,422 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Statuts après lesquels une session n'a plus besoin d'être reprise
+TERMINAL_STATUSES = ('finished', 'error')
+
+# Champs modifiables via `update`
+SESSION_FIELDS = ('topic', 'status', 'question', 'question_count', 'result', 'error', 'report_file', 'mode')
+
+# Mode d'exécution du crew: 'sequential' (crew complet), 'pipeline' (structuration au fil de l'entretien)
+# ou 'fast' (dossier, synthèse et rapport en une génération), voir CREW_MODES dans app.py
+DEFAULT_MODE = 'sequential'
+
+
+class SessionStore(ABC):
+    """Interface de stockage de l'état sérialisable des sessions.
+
+    L'état d'une session (statut, question en attente, rapport...) et chaque échange
+    Q/R y sont enregistrés; les objets d'exécution (threads, journaux SSE) restent
+    dans le processus qui fait tourner le crew.
+
+    Les méthodes `claim`/`renew`/`expired` gèrent un bail (lease) par session: le
+    worker propriétaire le renouvelle, et un autre worker peut reprendre une session
+    dont le bail a expiré (redémarrage, crash).
+    """
+
+    @abstractmethod
+    def create(
+        self, session_id: str, topic: str, owner: Optional[str] = None, lease: float = 0.0, mode: str = DEFAULT_MODE
+    ) -> None:
+        """Crée la session, déjà attribuée à `owner` pour `lease` secondes."""
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, session_id: str, **fields: Any) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """Résumé de toutes les sessions, de la moins à la plus récemment active.
+
+        Champs: session_id, status, report_file, created_at, updated_at.
+        """
+
+    @abstractmethod
+    def record_question(self, session_id: str, number: int, question: str) -> None:
+        """Enregistre la question `number` et passe la session en attente de réponse."""
+
+    @abstractmethod
+    def submit_answer(self, session_id: str, answer: str) -> bool:
+        """Enregistre la réponse à la question en attente. Retourne False si aucune n'attend."""
+
+    @abstractmethod
+    def wait_answer(self, session_id: str, number: int, timeout: float) -> Optional[str]:
+        """Attend la réponse à la question `number`; None si délai dépassé ou session supprimée."""
+
+    @abstractmethod
+    def exchanges(self, session_id: str) -> List[Dict[str, Any]]:
+        """Échanges enregistrés, dans l'ordre: {'number', 'question', 'answer'}."""
+
+    @abstractmethod
+    def discard_pending(self, session_id: str) -> None:
+        """Supprime les questions restées sans réponse (avant une reprise)."""
+
+    def claim(self, session_id: str, owner: str, lease: float) -> bool:
+        return True
+
+    def renew(self, owner: str, session_ids: List[str], lease: float) -> None:
+        pass
+
+    def expired(self) -> List[str]:
+        return []
+
+
+class InMemorySessionStore(SessionStore):
+    """Stockage en mémoire du processus (un seul worker, état perdu au redémarrage)."""
+
+    def __init__(self) -> None:
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._exchanges: Dict[str, List[Dict[str, Any]]] = {}
+        self._cond = threading.Condition()
+
+    def create(
+        self, session_id: str, topic: str, owner: Optional[str] = None, lease: float = 0.0, mode: str = DEFAULT_MODE
+    ) -> None:
+        now = time.time()
+        with self._cond:
+            self._sessions[session_id] = {
+                'session_id': session_id,
+                'topic': topic,
+                'status': 'queued',
+                'question': None,
+                'question_count': 0,
+                'result': None,
+                'error': None,
+                'report_file': None,
+                'mode': mode,
+                'created_at': now,
+                'updated_at': now,
+            }
+            self._exchanges[session_id] = []
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            record = self._sessions.get(session_id)
+            return dict(record) if record is not None else None
+
+    def update(self, session_id: str, **fields: Any) -> None:
+        _check_fields(fields)
+        with self._cond:
+            record = self._sessions.get(session_id)
+            if record is not None:
+                record.update(fields)
+                record['updated_at'] = time.time()
+
+    def delete(self, session_id: str) -> None:
+        with self._cond:
+            self._sessions.pop(session_id, None)
+            self._exchanges.pop(session_id, None)
+            self._cond.notify_all()
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        keys = ('session_id', 'status', 'report_file', 'created_at', 'updated_at')
+        with self._cond:
+            records = [{k: r[k] for k in keys} for r in self._sessions.values()]
+        return sorted(records, key=lambda r: r['updated_at'])
+
+    def record_question(self, session_id: str, number: int, question: str) -> None:
+        with self._cond:
+            if session_id not in self._sessions:
+                return
+            self._exchanges[session_id].append({'number': number, 'question': question, 'answer': None})
+            self._sessions[session_id].update(
+                status='awaiting_answer', question=question, question_count=number, updated_at=time.time()
+            )
+
+    def submit_answer(self, session_id: str, answer: str) -> bool:
+        with self._cond:
+            record = self._sessions.get(session_id)
+            if record is None or record['status'] != 'awaiting_answer':
+                return False
+            pending = self._exchanges[session_id][-1]
+            pending['answer'] = answer
+            record.update(status='running', question=None, updated_at=time.time())
+            self._cond.notify_all()
+            return True
+
+    def wait_answer(self, session_id: str, number: int, timeout: float) -> Optional[str]:
+        def answered():
+            if session_id not in self._sessions:
+                return True
+            for ex in self._exchanges[session_id]:
+                if ex['number'] == number:
+                    return ex['answer'] is not None
+            return False
+
+        with self._cond:
+            self._cond.wait_for(answered, timeout=timeout)
+            for ex in self._exchanges.get(session_id, []):
+                if ex['number'] == number:
+                    return ex['answer']
+            return None
+
+    def exchanges(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._cond:
+            return [dict(ex) for ex in self._exchanges.get(session_id, [])]
+
+    def discard_pending(self, session_id: str) -> None:
+        with self._cond:
+            if session_id in self._exchanges:
+                self._exchanges[session_id] = [ex for ex in self._exchanges[session_id] if ex['answer'] is not None]
+
+
+class SQLiteSessionStore(SessionStore):
+    """Stockage durable SQLite (mode WAL), partagé par tous les workers d'une machine.
+
+    Chaque question et chaque réponse sont écrites dès leur arrivée: une session
+    interrompue reprend à partir du dernier échange répondu. Les réponses soumises
+    par un autre processus sont détectées par scrutation (`poll_interval`); celles du
+    même processus réveillent immédiatement le tool en attente.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            topic TEXT NOT NULL,
+            status TEXT NOT NULL,
+            question TEXT,
+            question_count INTEGER NOT NULL DEFAULT 0,
+            result TEXT,
+            error TEXT,
+            report_file TEXT,
+            mode TEXT NOT NULL DEFAULT 'sequential',
+            owner TEXT,
+            lease_expires REAL NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS exchanges (
+            session_id TEXT NOT NULL,
+            number INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            answer TEXT,
+            asked_at REAL NOT NULL,
+            answered_at REAL,
+            PRIMARY KEY (session_id, number)
+        );
+        CREATE INDEX IF NOT EXISTS idx_sessions_lease ON sessions (status, lease_expires);
+        CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.2) -> None:
+        self.path = path
+        self.poll_interval = poll_interval
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        self._conn().executescript(self.SCHEMA)
+        self._migrate()
+
+    # ---------------- Connexions ----------------
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _tx(self):
+        return transaction(self._conn())
+
+    def _migrate(self) -> None:
+        """Ajoute les colonnes apparues après la création d'une base existante."""
+        columns = {r['name'] for r in self._conn().execute("PRAGMA table_info(sessions)")}
+        if 'mode' not in columns:
+            self._conn().execute(f"ALTER TABLE sessions ADD COLUMN mode TEXT NOT NULL DEFAULT '{DEFAULT_MODE}'")
+
+    # ---------------- Sessions ----------------
+    def create(
+        self, session_id: str, topic: str, owner: Optional[str] = None, lease: float = 0.0, mode: str = DEFAULT_MODE
+    ) -> None:
+        now = time.time()
+        with self._tx() as conn:
+            conn.execute(
+                "INSERT INTO sessions (session_id, topic, status, mode, owner, lease_expires, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?, ?, ?)",
+                (session_id, topic, mode, owner, now + lease, now, now),
+            )
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            "SELECT session_id, topic, status, question, question_count, result, error, report_file, mode, "
+            "created_at, updated_at FROM sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def update(self, session_id: str, **fields: Any) -> None:
+        _check_fields(fields)
+        if not fields:
+            return
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._tx() as conn:
+            conn.execute(
+                f"UPDATE sessions SET {assignments}, updated_at = ? WHERE session_id = ?",
+                (*fields.values(), time.time(), session_id),
+            )
+
+    def delete(self, session_id: str) -> None:
+        with self._tx() as conn:
+            conn.execute("DELETE FROM exchanges WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+        with self._cond:
+            self._cond.notify_all()
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT session_id, status, report_file, created_at, updated_at FROM sessions ORDER BY updated_at"
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    # ---------------- Échanges ----------------
+    def record_question(self, session_id: str, number: int, question: str) -> None:
+        now = time.time()
+        with self._tx() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO exchanges (session_id, number, question, asked_at) VALUES (?, ?, ?, ?)",
+                (session_id, number, question, now),
+            )
+            conn.execute(
+                "UPDATE sessions SET status = 'awaiting_answer', question = ?, question_count = ?, updated_at = ? "
+                "WHERE session_id = ?",
+                (question, number, now, session_id),
+            )
+
+    def submit_answer(self, session_id: str, answer: str) -> bool:
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute(
+                "SELECT status, question_count FROM sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or row['status'] != 'awaiting_answer':
+                return False
+            conn.execute(
+                "UPDATE exchanges SET answer = ?, answered_at = ? WHERE session_id = ? AND number = ?",
+                (answer, now, session_id, row['question_count']),
+            )
+            conn.execute(
+                "UPDATE sessions SET status = 'running', question = NULL, updated_at = ? WHERE session_id = ?",
+                (now, session_id),
+            )
+        with self._cond:
+            self._cond.notify_all()
+        return True
+
+    def wait_answer(self, session_id: str, number: int, timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            row = self._conn().execute(
+                "SELECT e.answer FROM sessions s LEFT JOIN exchanges e "
+                "ON e.session_id = s.session_id AND e.number = ? WHERE s.session_id = ?",
+                (number, session_id),
+            ).fetchone()
+            if row is None or row['answer'] is not None:
+                return row['answer'] if row is not None else None
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            with self._cond:
+                self._cond.wait(min(self.poll_interval, remaining))
+
+    def exchanges(self, session_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute(
+            "SELECT number, question, answer FROM exchanges WHERE session_id = ? ORDER BY number",
+            (session_id,),
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+    def discard_pending(self, session_id: str) -> None:
+        with self._tx() as conn:
+            conn.execute("DELETE FROM exchanges WHERE session_id = ? AND answer IS NULL", (session_id,))
+
+    # ---------------- Baux de reprise ----------------
+    def claim(self, session_id: str, owner: str, lease: float) -> bool:
+        now = time.time()
+        with self._tx() as conn:
+            cur = conn.execute(
+                "UPDATE sessions SET owner = ?, lease_expires = ? "
+                "WHERE session_id = ? AND (owner IS NULL OR owner = ? OR lease_expires < ?)",
+                (owner, now + lease, session_id, owner, now),
+            )
+            return cur.rowcount == 1
+
+    def renew(self, owner: str, session_ids: List[str], lease: float) -> None:
+        if not session_ids:
+            return
+        expires = time.time() + lease
+        with self._tx() as conn:
+            conn.executemany(
+                "UPDATE sessions SET lease_expires = ? WHERE session_id = ? AND owner = ?",
+                [(expires, sid, owner) for sid in session_ids],
+            )
+
+    def expired(self) -> List[str]:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        rows = self._conn().execute(
+            f"SELECT session_id FROM sessions WHERE status NOT IN ({placeholders}) AND lease_expires < ? "
+            "ORDER BY created_at",
+            (*TERMINAL_STATUSES, time.time()),
+        ).fetchall()
+        return [r['session_id'] for r in rows]
+
+
+@contextlib.contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """Transaction SQLite `BEGIN IMMEDIATE` (verrou d'écriture pris dès le début).
+
+    Pour les connexions en mode autocommit (`isolation_level=None`), comme celles des bases
+    de sessions et de l'archive des rapports.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _check_fields(fields: Dict[str, Any]) -> None:
+    unknown = set(fields) - set(SESSION_FIELDS)
+    if unknown:
+        raise ValueError(f"Champs de session inconnus: {sorted(unknown)}")
+
+
+def create_session_store() -> SessionStore:
+    """Instancie le backend choisi par PSYCHAT_SESSION_STORE ('memory' par défaut, ou 'sqlite')."""
+    backend = os.getenv("PSYCHAT_SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        path = os.getenv("PSYCHAT_SESSION_DB", "psychat_sessions.db")
+        logger.info(f"Stockage des sessions: SQLite ({path})")
+        return SQLiteSessionStore(path)
+    if backend != "memory":
+        raise ValueError(f"Backend de sessions inconnu: {backend}")
+    return InMemorySessionStore()
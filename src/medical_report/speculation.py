@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from crewai.llms.base_llm import BaseLLM
+
+from .llm_cache import WrappedLLM
+from .llm_gateway import SPECULATIVE, prioritized
+from .session_context import run_bound
+
+logger = logging.getLogger(__name__)
+
+# Tâche dont l'appel LLM qui suit chaque réponse du patient est pré-généré
+SPECULATIVE_TASK = 'tache_entretien_interactif'
+
+# Longueur minimale (caractères) d'une réponse partielle pour lancer une pré-génération
+MIN_PARTIAL_CHARS = 2
+
+
+class Speculator:
+    """Pré-génération de la question suivante pendant que le patient tape sa réponse.
+
+    - Le prompt de l'interviewer après une réponse est celui de l'appel précédent, plus la
+      question posée et l'observation de l'outil, c'est-à-dire la réponse du patient
+    - Le frontend transmet le texte partiel de la réponse à chaque pause de frappe
+      (`/typing`): l'appel suivant est lancé en arrière-plan avec ce texte comme
+      observation, au plus `max_candidates` textes différents par question
+    - À l'arrivée de la vraie réponse, les candidats d'un autre texte sont abandonnés; si
+      l'un correspond au prompt réel, l'agent reprend sa génération (terminée ou en cours)
+      au lieu d'en lancer une nouvelle: la question suivante arrive plus tôt
+    - Coût: jusqu'à `max_candidates` appels LLM de plus par question; désactivé par défaut
+      (PSYCHAT_SPECULATIVE=1)
+    """
+
+    def __init__(
+        self,
+        enabled: Optional[bool] = None,
+        workers: Optional[int] = None,
+        max_candidates: Optional[int] = None,
+        tasks=(SPECULATIVE_TASK,),
+    ) -> None:
+        self.enabled = enabled if enabled is not None else os.getenv("PSYCHAT_SPECULATIVE", "0").lower() in ("1", "true", "yes")
+        self.max_candidates = max_candidates or int(os.getenv("PSYCHAT_SPECULATIVE_CANDIDATES", "2"))
+        self.tasks = frozenset(tasks)
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers or int(os.getenv("PSYCHAT_SPECULATIVE_WORKERS", "4")),
+            thread_name_prefix="psychat-speculation",
+        ) if self.enabled else None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {"started": 0, "committed": 0, "discarded": 0, "failed": 0}
+
+    def session(self, session_id: str) -> Optional["Speculation"]:
+        """État de pré-génération d'une nouvelle session (None si désactivé)."""
+        return Speculation(self, session_id) if self.enabled else None
+
+    def wrap(self, llm: BaseLLM, resolve: Callable[[], Optional["Speculation"]]) -> BaseLLM:
+        """LLM de l'agent servi depuis les pré-générations de la session que renvoie `resolve`."""
+        return SpeculativeLLM(llm, self, resolve) if self.enabled else llm
+
+    def _submit(
+        self, session_id: str, llm: BaseLLM, messages: List[Dict[str, str]], from_task: Any, from_agent: Any
+    ) -> Future:
+        self._count("started")
+        # Appel routé comme ceux du crew de la session (outils, enveloppes, handlers du bus)
+        return self._executor.submit(run_bound, session_id, _speculate, llm, messages, from_task, from_agent)
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+
+class Speculation:
+    """Pré-générations en cours pour la question courante d'une session."""
+
+    def __init__(self, speculator: Speculator, session_id: str) -> None:
+        self._speculator = speculator
+        self.session_id = session_id
+        self._lock = threading.Lock()
+        # (LLM, prompt, réponse, tâche, agent) du dernier appel de l'interviewer
+        self._base: Optional[Tuple[BaseLLM, List[Dict[str, str]], str, Any, Any]] = None
+        # Texte de réponse supposé -> (prompt supposé, génération)
+        self._candidates: Dict[str, Tuple[List[Dict[str, str]], Future]] = {}
+
+    def observed(self, llm: BaseLLM, messages: Any, response: Any, from_task: Any, from_agent: Any) -> None:
+        """Appel réel de l'interviewer terminé: base des pré-générations de la question suivante."""
+        with self._lock:
+            stale, self._candidates = list(self._candidates.values()), {}
+            usable = isinstance(messages, list) and isinstance(response, str)
+            self._base = (llm, list(messages), response, from_task, from_agent) if usable else None
+        self._discard(stale)
+
+    def propose(self, partial: str) -> bool:
+        """Lance l'appel suivant en supposant que `partial` est la réponse définitive."""
+        text = partial.strip()
+        with self._lock:
+            if (
+                self._base is None
+                or len(text) < MIN_PARTIAL_CHARS
+                or text in self._candidates
+                or len(self._candidates) >= self._speculator.max_candidates
+            ):
+                return False
+            llm, messages, response, from_task, from_agent = self._base
+            # Message ajouté par l'exécuteur CrewAI après l'outil (voir handle_agent_action_core)
+            predicted = messages + [{"role": "assistant", "content": f"{response}\nObservation: {text}".rstrip()}]
+            future = self._speculator._submit(self.session_id, llm, predicted, from_task, from_agent)
+            self._candidates[text] = (predicted, future)
+        return True
+
+    def answered(self, answer: Optional[str]) -> None:
+        """Vraie réponse reçue: seuls les candidats de ce texte sont conservés."""
+        text = (answer or "").strip()
+        with self._lock:
+            stale = [c for t, c in self._candidates.items() if t != text]
+            self._candidates = {t: c for t, c in self._candidates.items() if t == text}
+            self._base = None
+        self._discard(stale)
+
+    def take(self, messages: Any) -> Optional[str]:
+        """Réponse pré-générée pour ce prompt (attend la fin de sa génération), None sinon."""
+        with self._lock:
+            candidates, self._candidates = list(self._candidates.values()), {}
+        hit = next((future for predicted, future in candidates if _same_prompt(predicted, messages)), None)
+        self._discard([c for c in candidates if c[1] is not hit])
+        if hit is None:
+            return None
+        try:
+            response = hit.result()
+        except Exception as e:
+            logger.warning(f"Pré-génération de la question suivante en échec: {str(e)}")
+            self._speculator._count("failed")
+            return None
+        if not isinstance(response, str):
+            self._speculator._count("failed")
+            return None
+        self._speculator._count("committed")
+        return response
+
+    def close(self) -> None:
+        """Session terminée ou évincée: abandonne les pré-générations."""
+        with self._lock:
+            stale, self._candidates, self._base = list(self._candidates.values()), {}, None
+        self._discard(stale)
+
+    def _discard(self, candidates: List[Tuple[List[Dict[str, str]], Future]]) -> None:
+        # Une génération pas encore démarrée n'est jamais envoyée au fournisseur
+        for _, future in candidates:
+            future.cancel()
+        if candidates:
+            self._speculator._count("discarded", len(candidates))
+
+
+def _speculate(llm: BaseLLM, messages: List[Dict[str, str]], from_task: Any, from_agent: Any) -> Any:
+    # Passe après les tours d'entretien réellement attendus dans la file de la passerelle LLM
+    with prioritized(SPECULATIVE):
+        return llm.call(messages, None, None, None, from_task, from_agent)
+
+
+def _same_prompt(predicted: List[Dict[str, str]], messages: Any) -> bool:
+    """Prompt réel identique au prompt supposé.
+
+    CrewAI ajoute toutes les quelques utilisations d'outil un rappel du format après
+    l'observation: il est toléré, le texte de la réponse ayant déjà été vérifié (`answered`).
+    """
+    if not isinstance(messages, list) or len(messages) != len(predicted) or messages[:-1] != predicted[:-1]:
+        return False
+    last, expected = messages[-1], predicted[-1]
+    content = str(last.get("content", ""))
+    if last.get("role") != expected["role"] or not content.startswith(expected["content"]):
+        return False
+    # Espaces en fin de réponse (texte comparé sans eux), puis rappel éventuel
+    rest = content[len(expected["content"]):].lstrip(" \t")
+    return not rest or rest.startswith("\n\n")
+
+
+class SpeculativeLLM(WrappedLLM):
+    """Enveloppe du LLM de l'interviewer: appels servis depuis les pré-générations de la session.
+
+    Une réponse pré-générée est rejouée sur le bus (début, fin) comme un vrai appel.
+    """
+
+    def __init__(self, llm: BaseLLM, speculator: Speculator, resolve: Callable[[], Optional[Speculation]]) -> None:
+        self._speculator = speculator
+        self._resolve = resolve
+        super().__init__(llm)
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        speculation = None
+        if getattr(from_task, "name", None) in self._speculator.tasks and not tools:
+            speculation = self._resolve()
+        if speculation is None:
+            return self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+
+        response = speculation.take(messages)
+        if response is not None:
+            logger.info("Question suivante servie depuis la pré-génération")
+            self._replay(messages, response, from_task, from_agent)
+        else:
+            response = self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
+        speculation.observed(self._llm, messages, response, from_task, from_agent)
+        return response
@@ -0,0 +1,189 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bornes (secondes) couvrant un appel d'outil local comme une session complète
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+Labels = Tuple[str, ...]
+
+
+class Histogram:
+    """Histogramme cumulatif au format Prometheus (une série par combinaison d'étiquettes)."""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # étiquettes -> [compteurs par borne (+Inf en dernier), somme]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in sorted(self._series.items())]
+        for labels, counts, total in series:
+            base = list(zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                yield f"{self.name}_bucket{_labels(base + [('le', le)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(base)} {total:.6f}"
+            yield f"{self.name}_count{_labels(base)} {cumulative}"
+
+
+class Telemetry:
+    """Spans des sessions, histogrammes de durées et jauges exposés sur /metrics.
+
+    - `span()` (contexte) ou `start()`/`finish()` (paires d'événements du bus CrewAI)
+      mesurent une étape: tâche du crew, outil, appel LLM, attente du patient, PDF
+    - Chaque span alimente `psychat_stage_seconds{kind,name}`; celui d'une session est
+      aussi ajouté à sa trace (bornée à `max_spans`), consultable via `trace()`
+    - Jauges et compteurs évalués à la lecture (`gauge()`), aucun coût hors scrape
+    - Avec PSYCHAT_TRACE_DIR, `dump()` écrit la trace JSON d'une session terminée
+    """
+
+    def __init__(self, max_spans: Optional[int] = None, trace_dir: Optional[str] = None) -> None:
+        self.max_spans = max_spans or int(os.getenv("PSYCHAT_TRACE_MAX_SPANS", "1000"))
+        self.trace_dir = trace_dir or os.getenv("PSYCHAT_TRACE_DIR") or None
+        self.stages = Histogram("psychat_stage_seconds", "Durée des étapes d'une session", ("kind", "name"))
+        self._histograms: List[Histogram] = [self.stages]
+        self._gauges: List[Tuple[str, str, str, Callable[[], Any], str]] = []
+        self._lock = threading.Lock()
+        self._traces: Dict[str, List[Dict[str, Any]]] = {}
+        # Spans ouverts par thread et par type (les événements du bus arrivent dans le thread appelant)
+        self._open: Dict[Tuple[int, str], List[Tuple[str, Optional[str], float, float, Dict[str, Any]]]] = defaultdict(list)
+
+    # ---------------- Enregistrement ----------------
+    def register(self, histogram: Histogram) -> Histogram:
+        self._histograms.append(histogram)
+        return histogram
+
+    def gauge(self, name: str, help_text: str, fn: Callable[[], Any], kind: str = "gauge", label: str = "") -> None:
+        """`fn` retourne une valeur, ou un dict {valeur d'étiquette `label`: valeur}."""
+        self._gauges.append((name, help_text, kind, fn, label))
+
+    # ---------------- Spans ----------------
+    @contextmanager
+    def span(self, kind: str, name: str, session_id: Optional[str] = None, **attrs: Any):
+        wall, start = time.time(), time.perf_counter()
+        status = "ok"
+        try:
+            yield attrs
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.record(kind, name, time.perf_counter() - start, session_id, wall, status, **attrs)
+
+    def start(self, kind: str, name: str, session_id: Optional[str] = None, **attrs: Any) -> None:
+        self._open[(threading.get_ident(), kind)].append((name, session_id, time.time(), time.perf_counter(), attrs))
+
+    def finish(self, kind: str, status: str = "ok", **attrs: Any) -> None:
+        stack = self._open.get((threading.get_ident(), kind))
+        if not stack:
+            return
+        name, session_id, wall, start, opened = stack.pop()
+        if not stack:
+            self._open.pop((threading.get_ident(), kind), None)
+        self.record(kind, name, time.perf_counter() - start, session_id, wall, status, **{**opened, **attrs})
+
+    def record(
+        self,
+        kind: str,
+        name: str,
+        duration: float,
+        session_id: Optional[str] = None,
+        started_at: Optional[float] = None,
+        status: str = "ok",
+        **attrs: Any,
+    ) -> None:
+        self.stages.observe(duration, kind, name)
+        if session_id is None:
+            return
+        span = {
+            "kind": kind,
+            "name": name,
+            "start": round(started_at if started_at is not None else time.time() - duration, 6),
+            "duration": round(duration, 6),
+            "status": status,
+        }
+        if attrs:
+            span["attrs"] = attrs
+        with self._lock:
+            trace = self._traces.setdefault(session_id, [])
+            if len(trace) < self.max_spans:
+                trace.append(span)
+
+    # ---------------- Traces ----------------
+    def trace(self, session_id: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            trace = self._traces.get(session_id)
+            return None if trace is None else sorted(trace, key=lambda s: s["start"])
+
+    def dump(self, session_id: str) -> Optional[str]:
+        """Écrit la trace de la session dans PSYCHAT_TRACE_DIR (si configuré)."""
+        trace = self.trace(session_id)
+        if not self.trace_dir or trace is None:
+            return None
+        path = os.path.join(self.trace_dir, f"{session_id}.json")
+        try:
+            os.makedirs(self.trace_dir, exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"session_id": session_id, "spans": trace}, f, ensure_ascii=False, indent=1)
+        except OSError as e:
+            logger.error(f"Écriture de la trace {session_id} impossible: {str(e)}")
+            return None
+        return path
+
+    def discard(self, session_id: str) -> None:
+        with self._lock:
+            self._traces.pop(session_id, None)
+
+    # ---------------- Exposition ----------------
+    def render(self) -> str:
+        """Métriques au format texte Prometheus (version 0.0.4)."""
+        lines: List[str] = []
+        for name, help_text, kind, fn, label in self._gauges:
+            try:
+                value = fn()
+            except Exception as e:
+                logger.error(f"Métrique {name} indisponible: {str(e)}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if isinstance(value, dict):
+                lines.extend(f"{name}{_labels([(label, str(k))])} {v}" for k, v in sorted(value.items()))
+            else:
+                lines.append(f"{name} {value}")
+        for histogram in self._histograms:
+            lines.extend(histogram.collect())
+        return "\n".join(lines) + "\n"
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
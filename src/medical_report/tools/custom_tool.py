@@ -1,7 +1,10 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import Callable, Optional, Type
 from pydantic import BaseModel, Field
 
+from ..session_context import bind
+from .response_analyzer import analyze, format_analysis
+
 class AskPatientInput(BaseModel):
     """Schéma d'input pour l'outil qui pose une question au patient."""
     question: str = Field(..., description="La question exacte à poser au patient.")
@@ -9,9 +12,31 @@ class AskPatientInput(BaseModel):
 class AnalyzeResponseInput(BaseModel):
     """Schéma d'input pour l'outil d'analyse des réponses."""
     patient_response: str = Field(..., description="La réponse du patient à analyser.")
-    conversation_context: str = Field(..., description="Le contexte de la conversation jusqu'à présent.")
+    conversation_context: str = Field(
+        "", description="Facultatif: réponses précédentes (inutile dans l'application web, qui les connaît déjà)."
+    )
+
+class SessionBoundTool(BaseTool):
+    """Outil dont les appels peuvent être servis pour une session précise (application web).
+
+    Après `attach()`, `handler(session_id, *arguments)` traite les appels dans le contexte
+    de la session (voir session_context.py), quel que soit le thread ou la tâche asyncio qui
+    exécute l'outil: la session est portée par l'instance, pas par l'appelant. Sans handler,
+    comportement console de l'outil.
+    """
+    session_id: Optional[str] = None
+    handler: Optional[Callable[..., str]] = Field(default=None, exclude=True)
+
+    def attach(self, session_id: str, handler: Callable[..., str]) -> None:
+        # Sur place: les tâches déjà créées référencent cette instance (voir CrewFactory.instance)
+        self.session_id = session_id
+        self.handler = handler
+
+    def _serve(self, *args: str) -> str:
+        with bind(self.session_id):
+            return self.handler(self.session_id, *args)
 
-class AskPatientTool(BaseTool):
+class AskPatientTool(SessionBoundTool):
     name: str = "Poser une Question au Patient"
     description: str = (
         "Utilisez cet outil pour poser UNE question et obtenir la réponse. "
@@ -22,22 +47,26 @@ class AskPatientTool(BaseTool):
 
     def _run(self, question: str) -> str:
         """Pose la question à l'utilisateur dans la console et retourne sa réponse."""
+        if self.handler is not None:
+            return self._serve(question)
         print("\n---------------------------------")
         print(f"Agent [Interviewer Clinique]: {question}")
         response = input("Votre réponse [Patient]: ")
         print("---------------------------------\n")
         return response
 
-class AnalyzePatientResponseTool(BaseTool):
+class AnalyzePatientResponseTool(SessionBoundTool):
     name: str = "Analyser la Réponse du Patient"
     description: str = (
-        "Analysez la réponse du patient pour déterminer la prochaine question la plus pertinente. "
-        "Identifiez les informations manquantes et le domaine à approfondir."
+        "Analyse instantanée (locale) de la réponse du patient: éléments cliniques repérés, signaux "
+        "à approfondir en priorité et domaines de l'entretien encore non couverts (identification, "
+        "histoire, symptômes, antécédents, contexte psychosocial). Les échanges précédents de "
+        "l'entretien sont pris en compte automatiquement."
     )
     args_schema: Type[BaseModel] = AnalyzeResponseInput
 
-    def _run(self, patient_response: str, conversation_context: str) -> str:
-        return (
-            f"Analyse de la réponse: {patient_response[:100]}... - "
-            f"Contexte: {conversation_context[:100]}..."
-        )
\ No newline at end of file
+    def _run(self, patient_response: str, conversation_context: str = "") -> str:
+        """Couverture lexicale des domaines de l'entretien, sans appel LLM."""
+        if self.handler is not None:
+            return self._serve(patient_response, conversation_context)
+        return format_analysis(analyze(patient_response, conversation_context))
\ No newline at end of file
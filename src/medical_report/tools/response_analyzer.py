@@ -0,0 +1,144 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, NamedTuple, Tuple
+
+# Domaines des lignes directrices de `tache_entretien_interactif`, dans l'ordre de l'entretien:
+# (clé, libellé, racines lexicales; accents et casse ignorés, une racine couvre ses dérivés,
+# "#" désigne un nombre)
+DOMAINS: Tuple[Tuple[str, str, Tuple[str, ...]], ...] = (
+    ("identification", "Identification et motif de consultation", (
+        "je m appelle", "mon nom", "prenom", "j ai # ans", "age", "motif", "consult",
+        "je viens", "raison", "ce qui m amene", "amene",
+    )),
+    ("histoire", "Histoire du problème et facteurs déclenchants", (
+        "depuis", "ca a commence", "a commence", "debut", "declench", "il y a", "semaine", "mois",
+        "annee", "suite a", "evolu", "aggrav", "empir", "ameliore", "progressivement", "soudain",
+    )),
+    ("symptomes", "Symptômes (fréquence, intensité, durée, retentissement)", (
+        "sommeil", "dormi", "dors", "insomni", "reveil", "cauchemar", "fatigu", "epuis", "energie",
+        "appetit", "mange", "poids", "anxi", "angoiss", "stress", "panique", "peur", "inquiet", "tendu",
+        "triste", "tristesse", "deprim", "pleur", "humeur", "irritab", "colere", "plaisir",
+        "concentr", "memoire", "idees noires", "suicid", "voix", "halluc", "obsess", "compuls",
+    )),
+    ("antecedents", "Antécédents médicaux/psychiatriques et traitements", (
+        "antecedent", "traitement", "medicament", "cachet", "antidepress", "anxiolyt", "somnifere",
+        "neurolept", "hospitalis", "psychiatre", "psychologue", "therap", "suivi", "maladie",
+        "diabet", "chirurg", "allerg", "operation", "medecin",
+    )),
+    ("psychosocial", "Contexte psychosocial (travail, famille, stress)", (
+        "travail", "emploi", "boulot", "chomage", "collegue", "patron", "etudes", "ecole", "famille",
+        "parent", "pere", "mere", "enfant", "fils", "fille", "conjoint", "mari", "femme", "couple",
+        "divorce", "separ", "deuil", "ami", "seul", "isole", "logement", "argent", "financ", "dette",
+        "alcool", "cannabis", "drogue", "tabac",
+    )),
+)
+
+# Signaux à approfondir en priorité, quelle que soit la couverture
+RISKS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    ("risque suicidaire", (
+        "suicid", "idees noires", "me tuer", "en finir", "mourir", "plus envie de vivre", "disparaitre",
+        "que tout s arrete", "ne plus me reveiller",
+    )),
+    ("auto-agression", ("automutil", "scarif", "me faire du mal", "me blesser")),
+    ("consommation de substances", ("alcool", "cannabis", "drogue", "cocaine")),
+)
+
+# Remplacements préalables à la décomposition Unicode (ligatures, apostrophes, traits d'union)
+_REPLACEMENTS = (("œ", "oe"), ("æ", "ae"), ("'", " "), ("’", " "), ("-", " "))
+
+
+def _trie(stems: Tuple[str, ...]) -> str:
+    """Alternative factorisée par préfixes ("an(?:xi|goiss)"): un seul caractère testé par branche."""
+    tree: Dict[str, dict] = {}
+    for stem in stems:
+        node = tree
+        for ch in stem:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        if "" in node:
+            # Racine complète: inutile de chercher une correspondance plus longue
+            return ""
+        branches = [(r"\d+" if ch == "#" else re.escape(ch)) + build(child) for ch, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(tree)
+
+
+def _pattern(groups: Dict[str, Tuple[str, ...]]) -> "re.Pattern[str]":
+    # Un seul automate pour tous les domaines: une passe sur le texte, groupe nommé = domaine
+    # (début de mot testé une seule fois, avant les alternatives)
+    return re.compile(r"\b(?:" + "|".join(f"(?P<{key}>{_trie(stems)})" for key, stems in groups.items()) + ")")
+
+
+_DOMAIN_RE = _pattern({key: stems for key, _, stems in DOMAINS})
+_RISK_RE = _pattern({f"r{i}": stems for i, (_, stems) in enumerate(RISKS)})
+_LABELS = {key: label for key, label, _ in DOMAINS}
+
+
+class Analysis(NamedTuple):
+    covered: List[str]
+    uncovered: List[str]
+    in_response: Dict[str, List[str]]
+    risks: List[str]
+
+
+def normalize(text: str) -> str:
+    """Minuscules ASCII sans accents ("J'ai l'anxiété" -> "j ai l anxiete")."""
+    text = text.lower()
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    # Décomposition puis retrait des diacritiques: fait en C, bien plus rapide que str.translate
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+
+
+def domains_in(text: str) -> "Counter[str]":
+    """Nombre de termes de chaque domaine (clé de DOMAINS) trouvés dans le texte."""
+    return Counter(m.lastgroup for m in _DOMAIN_RE.finditer(normalize(text)))
+
+
+def analyze(patient_response: str, conversation_context: str = "") -> Analysis:
+    """Couverture des cinq domaines sur l'entretien (contexte + réponse), sans appel LLM."""
+    response = normalize(patient_response)
+    covered = set()
+    for match in _DOMAIN_RE.finditer(normalize(conversation_context)):
+        covered.add(match.lastgroup)
+        if len(covered) == len(DOMAINS):
+            break
+    in_response: Dict[str, List[str]] = {}
+    for match in _DOMAIN_RE.finditer(response):
+        terms = in_response.setdefault(match.lastgroup, [])
+        if match.group() not in terms:
+            terms.append(match.group())
+    covered.update(in_response)
+    risks = sorted({RISKS[int(m.lastgroup[1:])][0] for m in _RISK_RE.finditer(response)})
+    order = [key for key, _, _ in DOMAINS]
+    return Analysis(
+        covered=[k for k in order if k in covered],
+        uncovered=[k for k in order if k not in covered],
+        in_response=in_response,
+        risks=risks,
+    )
+
+
+def format_analysis(analysis: Analysis) -> str:
+    """Compte rendu court destiné à l'interviewer: domaines restants et priorité suivante."""
+    lines = []
+    if analysis.risks:
+        lines.append(f"PRIORITÉ: signal de {', '.join(analysis.risks)} dans la réponse, approfondissez-le maintenant.")
+    if analysis.in_response:
+        found = "; ".join(f"{_LABELS[k]}: {', '.join(v)}" for k, v in analysis.in_response.items())
+        lines.append(f"Éléments de la réponse: {found}.")
+    elif not analysis.risks:
+        lines.append("Réponse sans élément clinique identifiable: reformulez ou demandez des précisions.")
+    if analysis.covered:
+        lines.append(f"Domaines couverts: {', '.join(_LABELS[k] for k in analysis.covered)}.")
+    if analysis.uncovered:
+        lines.append(f"Domaines restant à explorer: {', '.join(_LABELS[k] for k in analysis.uncovered)}.")
+        if not analysis.risks:
+            lines.append(f"Question suivante suggérée: {_LABELS[analysis.uncovered[0]]}.")
+    else:
+        lines.append("Tous les domaines sont couverts: précisez fréquence, intensité et retentissement des symptômes.")
+    return "\n".join(lines)
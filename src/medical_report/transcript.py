@@ -0,0 +1,196 @@
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+from .llm_cache import WrappedLLM
+from .tools.custom_tool import AskPatientTool
+from .tools.response_analyzer import DOMAINS, analyze
+
+# Tâche d'entretien (nom unique pour tous les modules): historique ReAct compacté à chaque tour
+INTERVIEW_TASK = 'tache_entretien_interactif'
+
+# Appel de l'outil d'entretien dans un message de l'agent (une question posée)
+ASK_ACTION = f"Action: {AskPatientTool.model_fields['name'].default}"
+
+_LABELS = {key: label for key, label, _ in DOMAINS}
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s")
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation du nombre de tokens (4 caractères par token, comme les benchmarks)."""
+    return len(text) // 4
+
+
+def clip(text: str, tokens: int) -> str:
+    """Texte tronqué à `tokens` tokens estimés, sur une fin de mot, marqué "[…]"."""
+    text = text.strip()
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = max(text.rfind(" ", 0, limit), text.rfind("\n", 0, limit))
+    return text[:cut if cut > limit // 2 else limit].rstrip(" ,;:\n") + " […]"
+
+
+class Exchange(NamedTuple):
+    number: int
+    question: str
+    answer: str
+    # Domaines de l'entretien abordés dans la réponse, et fait retenu pour la synthèse
+    domains: List[str]
+    fact: str
+
+
+class Transcript:
+    """Transcription structurée d'une session (échanges Q/R) et contextes de taille bornée.
+
+    - Chaque échange est enregistré une fois, avec les domaines abordés (analyse lexicale
+      locale) et un fait court (début de la réponse) calculés à l'arrivée: la synthèse
+      se maintient incrémentalement, sans appel LLM
+    - `memory()`: synthèse des premiers échanges pour l'interviewer, bornée à
+      `budget` tokens (faits les plus anciens omis au-delà)
+    - `render()`: transcription des tâches suivantes, réponses verbatim tronquées pour tenir
+      dans `transcript_budget` tokens quelle que soit la longueur des réponses du patient
+    """
+
+    def __init__(
+        self,
+        budget: Optional[int] = None,
+        answer_budget: Optional[int] = None,
+        transcript_budget: Optional[int] = None,
+        fact_tokens: int = 30,
+    ) -> None:
+        self.budget = budget or int(os.getenv("PSYCHAT_CONTEXT_BUDGET", "600"))
+        self.answer_budget = answer_budget or int(os.getenv("PSYCHAT_ANSWER_BUDGET", "200"))
+        self.transcript_budget = transcript_budget or int(os.getenv("PSYCHAT_TRANSCRIPT_BUDGET", "2500"))
+        self.fact_tokens = fact_tokens
+        # Échanges repris d'une session interrompue (déjà dans le prompt via {historique})
+        self.resumed = 0
+        self._exchanges: List[Exchange] = []
+        self._lock = threading.Lock()
+
+    def add(self, number: int, question: str, answer: str) -> Exchange:
+        analysis = analyze(answer)
+        first = _SENTENCE_END.split(" ".join(answer.split()), 1)[0]
+        exchange = Exchange(number, question, answer, list(analysis.in_response), clip(first, self.fact_tokens))
+        with self._lock:
+            self._exchanges.append(exchange)
+        return exchange
+
+    def exchanges(self) -> List[Exchange]:
+        with self._lock:
+            return list(self._exchanges)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._exchanges)
+
+    def answers(self) -> str:
+        """Réponses du patient, tronquées (contexte de l'analyse locale des réponses)."""
+        return "\n".join(clip(ex.answer, self.answer_budget) for ex in self.exchanges())
+
+    # ---------------- Contextes bornés ----------------
+    def memory(self, asked: int) -> str:
+        """Synthèse des `asked` premières questions posées depuis le début (ou la reprise)."""
+        last = self.resumed + asked
+        exchanges = [ex for ex in self.exchanges() if self.resumed < ex.number <= last]
+        lines = [
+            f"MÉMOIRE DE L'ENTRETIEN ({asked} question(s) déjà posée(s) avant les échanges ci-dessous, résumées) :",
+            "Questions posées : " + " | ".join(f"{ex.number}. {clip(ex.question, 20)}" for ex in exchanges),
+        ]
+        facts: Dict[str, List[str]] = {}
+        for ex in exchanges:
+            for key in ex.domains or [""]:
+                facts.setdefault(key, []).append(f"{ex.fact} (R{ex.number})")
+        covered = [key for key, _, _ in DOMAINS if key in facts]
+        missing = [_LABELS[key] for key, _, _ in DOMAINS if key not in facts]
+        tail = [f"Domaines non encore explorés : {', '.join(missing)}."] if missing else []
+
+        # Faits les plus récents d'abord dans la limite du budget, puis remis dans l'ordre
+        remaining = self.budget - estimate_tokens("\n".join(lines + tail))
+        kept: Dict[str, List[str]] = {}
+        omitted = 0
+        for key in sorted(facts, key=lambda k: -len(facts[k])):
+            for fact in reversed(facts[key]):
+                cost = estimate_tokens(fact) + 2
+                if cost > remaining:
+                    omitted += 1
+                    continue
+                kept.setdefault(key, []).insert(0, fact)
+                remaining -= cost
+        for key in covered + ([""] if "" in kept else []):
+            if kept.get(key):
+                lines.append(f"- {_LABELS.get(key, 'Autres réponses')} : " + " ; ".join(kept[key]))
+        if omitted:
+            lines.append(f"({omitted} élément(s) plus ancien(s) omis)")
+        return "\n".join(lines + tail)
+
+    def render(self, exchanges: Optional[List[Exchange]] = None) -> str:
+        """Transcription Q/R des tâches suivantes, dans `transcript_budget` tokens."""
+        exchanges = self.exchanges() if exchanges is None else exchanges
+        if not exchanges:
+            return ""
+        # Part du budget par réponse (les questions, courtes, sont gardées entières)
+        per_answer = min(self.answer_budget, max(self.fact_tokens, self.transcript_budget // len(exchanges) - 30))
+        lines = [f"## Transcription de l'Entretien ({len(exchanges)} échanges)"]
+        for ex in exchanges:
+            lines.append(f"- **Question {ex.number}:** {ex.question}")
+            lines.append(f"- **Réponse {ex.number}:** {clip(ex.answer, per_answer)}")
+        return "\n".join(lines)
+
+    # ---------------- Historique de l'interviewer ----------------
+    def compact(self, messages: List[Dict[str, Any]], keep: int) -> List[Dict[str, Any]]:
+        """Prompt ReAct de l'interviewer borné: consignes, mémoire et `keep` derniers tours.
+
+        Au-delà de `budget` tokens d'historique, les tours plus anciens (questions posées,
+        analyses) sont remplacés par `memory()` et les tours conservés tronqués à
+        `answer_budget` par partie. Ne dépend que des messages reçus et des échanges déjà
+        répondus: un même prompt donne toujours le même prompt compacté (voir speculation.py).
+        """
+        start = next((i for i, m in enumerate(messages) if m.get("role") == "assistant"), len(messages))
+        history = messages[start:]
+        if sum(estimate_tokens(str(m.get("content", ""))) for m in history) <= self.budget:
+            # Entretien encore court: historique transmis tel quel
+            return messages
+        dropped, kept = (history[:-keep], history[-keep:]) if len(history) > keep else ([], history)
+        compacted = list(messages[:start])
+        if dropped:
+            asked = sum(str(m.get("content", "")).count(ASK_ACTION) for m in dropped)
+            compacted.append({"role": "assistant", "content": self.memory(asked)})
+        for m in kept:
+            compacted.append({**m, "content": _clip_turn(str(m.get("content", "")), self.answer_budget)})
+        return compacted
+
+
+def _clip_turn(content: str, tokens: int) -> str:
+    """Tour ReAct (pensée, action, observation) dont chaque partie tient dans `tokens`."""
+    action, sep, observation = content.partition("\nObservation:")
+    return clip(action, tokens) + (sep + " " + clip(observation, tokens) if sep else "")
+
+
+class BoundedHistoryLLM(WrappedLLM):
+    """Enveloppe du LLM de l'interviewer: prompt compacté par la transcription de la session.
+
+    Sans transcription (hors application web), le prompt est transmis tel quel.
+    """
+
+    def __init__(self, llm: BaseLLM, resolve: Callable[[], Optional[Transcript]], keep: Optional[int] = None) -> None:
+        self._resolve = resolve
+        self._keep = keep or int(os.getenv("PSYCHAT_CONTEXT_RECENT_TURNS", "2"))
+        super().__init__(llm)
+
+    def call(
+        self,
+        messages: Any,
+        tools: Any = None,
+        callbacks: Any = None,
+        available_functions: Any = None,
+        from_task: Any = None,
+        from_agent: Any = None,
+    ) -> Any:
+        transcript = self._resolve() if getattr(from_task, "name", None) == INTERVIEW_TASK else None
+        if transcript is not None and isinstance(messages, list):
+            messages = transcript.compact(messages, self._keep)
+        return self._llm.call(messages, tools, callbacks, available_functions, from_task, from_agent)
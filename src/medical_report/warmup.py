@@ -0,0 +1,226 @@
+"""Démarrage à froid: port ouvert avant l'import de l'application, préchauffage en arrière-plan.
+
+- `LazyWSGI` / `LazyASGI`: l'application (`module:attribut`) est importée dans un thread
+  pendant que le serveur écoute déjà; les requêtes arrivées avant attendent qu'elle soit
+  prête (au plus `PSYCHAT_WARMUP_WAIT` s, puis 503), `/ready` répond 503 tant qu'elle ne
+  l'est pas. Une fois importée, le `warm_up()` du module s'exécute dans le même thread
+- `import_profile`: profil d'import d'un module dans un interpréteur neuf (`-X importtime`),
+  temps propre et cumulé par module; comparaison avec un profil de référence enregistré
+
+Usage: python -m medical_report.warmup [--module app] [--top 20] [--save profil.json] [--compare profil.json]
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+READY_PATH = "/ready"
+
+
+class LazyApp:
+    """Application importée en arrière-plan au premier `start()`."""
+
+    def __init__(self, target: str, wait: Optional[float] = None, debug: bool = False) -> None:
+        self.target = target
+        self.wait = wait if wait is not None else float(os.getenv("PSYCHAT_WARMUP_WAIT", "60"))
+        self.debug = debug
+        self.timings: Dict[str, float] = {}
+        self._future: Future = Future()
+        self._lock = threading.Lock()
+        self._started = False
+
+    def start(self) -> "LazyApp":
+        with self._lock:
+            if self._started:
+                return self
+            self._started = True
+        threading.Thread(target=self._load, name="psychat-warmup", daemon=True).start()
+        return self
+
+    @property
+    def ready(self) -> bool:
+        return self._future.done() and self._future.exception() is None
+
+    def _load(self) -> None:
+        started = time.perf_counter()
+        module_name, _, attribute = self.target.partition(":")
+        try:
+            module = importlib.import_module(module_name)
+            application = getattr(module, attribute or "app")
+        except BaseException as e:
+            logger.error(f"Import de l'application {self.target} impossible: {str(e)}")
+            self._future.set_exception(e)
+            return
+        if self.debug:
+            application.debug = True
+        self.timings["import_s"] = round(time.perf_counter() - started, 3)
+        self._future.set_result(application)
+        logger.info(f"Application {self.target} prête en {self.timings['import_s']:.2f} s")
+
+        warm_up = getattr(module, "warm_up", None)
+        if warm_up is not None:
+            try:
+                warm_up()
+            except Exception as e:
+                logger.error(f"Préchauffage incomplet: {str(e)}")
+            self.timings["warm_up_s"] = round(time.perf_counter() - started - self.timings["import_s"], 3)
+
+
+class LazyWSGI(LazyApp):
+    """Application WSGI chargée en arrière-plan (serveur de développement, gunicorn --preload exclu)."""
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable) -> Any:
+        self.start()
+        if not self.ready and environ.get("PATH_INFO") == READY_PATH:
+            return _unavailable(start_response, "démarrage en cours")
+        try:
+            application = self._future.result(timeout=self.wait)
+        except FutureTimeout:
+            return _unavailable(start_response, "démarrage en cours")
+        except BaseException:
+            return _unavailable(start_response, "démarrage en échec", status="500 Internal Server Error")
+        return application(environ, start_response)
+
+
+class LazyASGI(LazyApp):
+    """Application ASGI chargée en arrière-plan; le cycle de vie (lifespan) est géré ici."""
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    # Import lancé sans l'attendre: uvicorn ouvre le port tout de suite
+                    self.start()
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        self.start()
+        if not self.ready and scope["type"] == "http" and scope["path"] == READY_PATH:
+            await _send_unavailable(send, "démarrage en cours")
+            return
+        try:
+            application = await asyncio.wait_for(asyncio.wrap_future(self._future), self.wait)
+        except asyncio.TimeoutError:
+            await _send_unavailable(send, "démarrage en cours")
+            return
+        except BaseException:
+            await _send_unavailable(send, "démarrage en échec", status=500)
+            return
+        await application(scope, receive, send)
+
+
+def _unavailable(start_response: Callable, reason: str, status: str = "503 Service Unavailable") -> List[bytes]:
+    body = json.dumps({"ready": False, "error": f"Serveur non prêt ({reason})"}, ensure_ascii=False).encode("utf-8")
+    start_response(status, [
+        ("Content-Type", "application/json"), ("Content-Length", str(len(body))), ("Retry-After", "1"),
+    ])
+    return [body]
+
+
+async def _send_unavailable(send: Callable, reason: str, status: int = 503) -> None:
+    body = json.dumps({"ready": False, "error": f"Serveur non prêt ({reason})"}, ensure_ascii=False).encode("utf-8")
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1")),
+        (b"retry-after", b"1"),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+
+# ---------------- Profil d'import ----------------
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def import_profile(module: str = "app", env: Optional[Dict[str, str]] = None, cwd: Optional[str] = None) -> List[ImportTime]:
+    """Temps d'import de chaque module chargé par `import <module>` dans un interpréteur neuf."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env={**os.environ, **(env or {})}, cwd=cwd, stdin=subprocess.DEVNULL,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Import de {module} en échec: {result.stderr.strip().splitlines()[-1:]}")
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), (len(name) - len(name.lstrip())) // 2))
+    return entries
+
+
+def packages(profile: List[ImportTime]) -> Dict[str, int]:
+    """Temps propre cumulé par paquet de premier niveau (µs), du plus coûteux au moins coûteux."""
+    totals: Dict[str, int] = {}
+    for entry in profile:
+        top = entry.module.split(".")[0]
+        totals[top] = totals.get(top, 0) + entry.self_us
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def regressions(current: Dict[str, int], baseline: Dict[str, int], tolerance: float, floor_us: int) -> List[str]:
+    """Paquets dont l'import a ralenti de plus de `tolerance` (et d'au moins `floor_us`) ou nouveaux."""
+    found = []
+    for package, us in current.items():
+        before = baseline.get(package)
+        if before is None and us >= floor_us:
+            found.append(f"{package}: nouveau, {us / 1000:.1f} ms")
+        elif before is not None and us - before >= floor_us and us > before * (1 + tolerance):
+            found.append(f"{package}: {before / 1000:.1f} -> {us / 1000:.1f} ms")
+    return found
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app", help="module importé (défaut: app, depuis la racine du projet)")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--save", default=None, help="enregistre le profil par paquet (JSON)")
+    parser.add_argument("--compare", default=None, help="profil de référence: code 1 en cas de régression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="ralentissement toléré par paquet")
+    parser.add_argument("--floor-ms", type=float, default=20, help="écart absolu ignoré en deçà (bruit)")
+    args = parser.parse_args(argv)
+
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    env = {
+        "PYTHONPATH": os.pathsep.join([project_root, os.path.join(project_root, "src"), os.getenv("PYTHONPATH", "")]),
+        "CREWAI_DISABLE_TELEMETRY": os.getenv("CREWAI_DISABLE_TELEMETRY", "true"),
+        "OTEL_SDK_DISABLED": os.getenv("OTEL_SDK_DISABLED", "true"),
+    }
+    profile = import_profile(args.module, env=env, cwd=project_root)
+    total = max(entry.cumulative_us for entry in profile if entry.depth == 0 and entry.module == args.module)
+    by_package = packages(profile)
+    print(f"import {args.module}: {total / 1000:.0f} ms, {len(profile)} modules")
+    for package, us in list(by_package.items())[:args.top]:
+        print(f"  {package:32s} {us / 1000:8.1f} ms")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"module": args.module, "total_us": total, "packages": by_package}, f, indent=1)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        found = regressions(by_package, baseline["packages"], args.tolerance, int(args.floor_ms * 1000))
+        print(f"Référence: {baseline['total_us'] / 1000:.0f} ms; "
+              + (f"{len(found)} régression(s):" if found else "aucune régression"))
+        for line in found:
+            print(f"  {line}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,40 @@
+"""Répertoires de cache: éviction par âge, par taille (ordre LRU) et fichiers temporaires abandonnés."""
+import os
+import time
+
+from medical_report import disk_cache
+
+
+def entry(directory, name, size, age):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    stamp = time.time() - age
+    os.utime(path, (stamp, stamp))
+    return path
+
+
+def test_age_then_least_recently_served(tmp_path):
+    directory = str(tmp_path)
+    entry(directory, "ancienne.pdf", 10, age=500)
+    served = entry(directory, "a.pdf", 10, age=30)
+    entry(directory, "b.pdf", 10, age=20)
+    entry(directory, "c.pdf", 10, age=10)
+    entry(directory, "autre.json", 10, age=500)
+    disk_cache.touch(served)
+
+    assert disk_cache.sweep(directory, ".pdf", max_bytes=20, max_age=100) == (2, 20)
+    assert sorted(os.listdir(directory)) == ["a.pdf", "autre.json", "c.pdf"]
+
+
+def test_orphan_partial_files(tmp_path):
+    directory = str(tmp_path)
+    entry(directory, "a.pdf", 10, age=0)
+    orphan = entry(directory, "b.pdf.123.456.part", 100, age=disk_cache.PARTIAL_MAX_AGE + 1)
+    writing = os.path.basename(disk_cache.partial(os.path.join(directory, "c.pdf")))
+    entry(directory, writing, 100, age=1)
+
+    # Ni comptés dans la taille ni évincés comme entrées; supprimés une fois abandonnés
+    assert disk_cache.sweep(directory, ".pdf", max_bytes=10, max_age=86400) == (0, 10)
+    assert not os.path.exists(orphan)
+    assert sorted(os.listdir(directory)) == ["a.pdf", writing]
@@ -0,0 +1,167 @@
+"""Passerelle LLM: bascule, nouveaux essais, flux interrompus et priorités, sans fournisseur réel."""
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from medical_report import llm_gateway  # noqa: E402
+from medical_report.llm_gateway import (  # noqa: E402
+    BACKGROUND, INTERACTIVE, GatewayBusy, LLMGateway, Provider,
+)
+
+MESSAGES = [{"role": "user", "content": "Rédigez le rapport."}]
+ARGS = (None, None, None, None, None)
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after=None):
+        super().__init__("429 Too Many Requests")
+        self.litellm_response_headers = {"retry-after": str(retry_after)} if retry_after else {}
+
+
+class ServiceUnavailableError(Exception):
+    status_code = 503
+
+
+class ScriptedLLM:
+    """LLM d'un fournisseur: rejoue `script` (exception à lever ou texte à retourner)."""
+
+    def __init__(self, script, chunks=0):
+        self.script = list(script)
+        self.chunks = chunks
+        self.calls = 0
+
+    def call(self, messages, *args):
+        self.calls += 1
+        for _ in range(self.chunks):
+            # Comme le handler du bus pour chaque LLMStreamChunkEvent du thread
+            llm_gateway._count_stream_chunk(None, None)
+        step = self.script.pop(0)
+        if isinstance(step, BaseException):
+            raise step
+        return step
+
+
+class Wrapper:
+    """Enveloppe minimale de l'agent: un LLM scripté par fournisseur (comme GatewayLLM.on)."""
+
+    def __init__(self, **llms):
+        self.llms = llms
+
+    def on(self, provider):
+        return self.llms[provider.name]
+
+
+def gateway(fallback=True, **kwargs):
+    kwargs.setdefault("max_wait", 0.2)
+    kwargs.setdefault("queue_timeout", 1.0)
+    return LLMGateway(
+        primary=Provider("primary", cooldown=kwargs.pop("cooldown", 10.0)),
+        fallback=Provider("fallback") if fallback else None,
+        pool=0,
+        **kwargs,
+    )
+
+
+def test_failover_after_rate_limit():
+    gw = gateway()
+    primary, fallback = ScriptedLLM([RateLimitError(retry_after=30)]), ScriptedLLM(["rapport"])
+    assert gw.call(Wrapper(primary=primary, fallback=fallback), MESSAGES, ARGS, None) == "rapport"
+    stats = gw.stats()
+    assert stats["failovers"] == 1
+    assert (stats["primary"]["failures"], stats["primary"]["rate_limited"]) == (1, 1)
+    assert stats["fallback"]["calls"] == 1
+
+    # Principal suspendu (Retry-After): l'appel suivant déborde sur le secondaire après max_wait
+    fallback.script.append("suite")
+    assert gw.call(Wrapper(primary=primary, fallback=fallback), MESSAGES, ARGS, None) == "suite"
+    assert primary.calls == 1
+    assert gw.primary.stats()["overflows"] == 1
+
+
+def test_non_retryable_error_is_raised_at_once():
+    gw = gateway()
+    primary, fallback = ScriptedLLM([ValueError("prompt invalide")]), ScriptedLLM(["jamais"])
+    with pytest.raises(ValueError):
+        gw.call(Wrapper(primary=primary, fallback=fallback), MESSAGES, ARGS, None)
+    assert fallback.calls == 0
+    assert gw.primary.stats()["in_flight"] == 0
+
+
+def test_partial_stream_is_never_retried():
+    gw = gateway()
+    primary = ScriptedLLM([ServiceUnavailableError("coupure")], chunks=3)
+    fallback = ScriptedLLM(["texte dupliqué"])
+    with pytest.raises(ServiceUnavailableError):
+        gw.call(Wrapper(primary=primary, fallback=fallback), MESSAGES, ARGS, None)
+    assert fallback.calls == 0
+    stats = gw.stats()
+    assert (stats["interrupted_streams"], stats["retries"], stats["failovers"]) == (1, 0, 0)
+
+
+def test_retries_then_last_error():
+    gw = gateway(fallback=False, retries=2, cooldown=0.01)
+    primary = ScriptedLLM([ServiceUnavailableError("1"), ServiceUnavailableError("2"), "rapport"])
+    assert gw.call(Wrapper(primary=primary), MESSAGES, ARGS, None) == "rapport"
+    assert gw.stats()["retries"] == 2
+
+    primary.script = [ServiceUnavailableError(str(i)) for i in range(3)]
+    with pytest.raises(ServiceUnavailableError):
+        gw.call(Wrapper(primary=primary), MESSAGES, ARGS, None)
+
+
+def test_busy_when_no_capacity():
+    gw = gateway(fallback=False, queue_timeout=0.1)
+    gw.primary.max_concurrent = 1
+    assert gw.primary.acquire(10, BACKGROUND, 1)
+    with pytest.raises(GatewayBusy):
+        gw.call(Wrapper(primary=ScriptedLLM(["jamais"])), MESSAGES, ARGS, None)
+    assert gw.stats()["busy"] == 1
+
+
+def test_interactive_calls_overtake_background():
+    provider = Provider("primary", max_concurrent=1)
+    assert provider.acquire(10, BACKGROUND, 1)
+    order = []
+
+    def call(priority, name):
+        assert provider.acquire(10, priority, 5)
+        order.append(name)
+        provider.release(10, 10)
+
+    background = threading.Thread(target=call, args=(BACKGROUND, "rapport"))
+    background.start()
+    time.sleep(0.05)
+    interactive = threading.Thread(target=call, args=(INTERACTIVE, "entretien"))
+    interactive.start()
+    time.sleep(0.05)
+    provider.release(10, 10)
+    background.join()
+    interactive.join()
+    assert order == ["entretien", "rapport"]
+
+
+def test_failed_call_refunds_its_tokens():
+    provider = Provider("primary", tpm=600)   # réserve de 100 jetons (10 s)
+    assert provider.acquire(80, BACKGROUND, 1)
+    provider.release(80, None)
+    assert provider.acquire(80, BACKGROUND, 0.01)
+
+
+def test_release_after_refill_keeps_reserve_capped(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(llm_gateway.time, "monotonic", lambda: now[0])
+    provider = Provider("primary", tpm=600)   # réserve de 100 jetons
+    assert provider.acquire(80, BACKGROUND, 1)
+    now[0] = 60.0   # réserve pleine à nouveau
+    assert provider.acquire(10, BACKGROUND, 1)
+    # Réservation surestimée: le trop-perçu ne dépasse pas la réserve
+    provider.release(80, 10)
+    provider.release(10, 10)
+    assert provider.acquire(100, BACKGROUND, 1)
+    provider.release(100, 100)
+    assert not provider.acquire(60, BACKGROUND, 0.01)
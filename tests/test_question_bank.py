@@ -0,0 +1,123 @@
+"""Banque de questions: index, recherche, questions déjà posées et repli sur le LLM."""
+import json
+
+import pytest
+
+pytest.importorskip("crewai")
+
+from crewai.llms.base_llm import BaseLLM  # noqa: E402
+
+from medical_report.question_bank import (  # noqa: E402
+    ASK_TOOL, INTERVIEW_TASK, OPENING, BankQuestion, QuestionBank, QuestionBankLLM, _asked_questions,
+)
+
+QUESTIONS = [
+    BankQuestion("Pour commencer, pouvez-vous vous présenter : votre prénom et votre âge ?", OPENING, "test"),
+    BankQuestion("Qu'est-ce qui vous amène à consulter au sujet de « {topic} » ?", OPENING, "test"),
+    BankQuestion("Comment qualifieriez-vous votre sommeil ces dernières semaines ?", "symptomes", "test"),
+    BankQuestion("Avez-vous des réveils nocturnes ou des difficultés à vous endormir ?", "symptomes", "test"),
+    BankQuestion("Depuis quand ressentez-vous ces difficultés ?", "histoire", "test"),
+    BankQuestion("Avez-vous déjà été suivi pour des difficultés psychologiques ?", "antecedents", "test"),
+]
+
+
+class EchoLLM(BaseLLM):
+    """LLM de l'agent: compte ses appels et retourne une question générée."""
+
+    def __init__(self):
+        super().__init__(model="test/echo")
+        self.calls = []
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        self.calls.append(messages)
+        return "question générée"
+
+
+class InterviewTask:
+    name = INTERVIEW_TASK
+
+
+def action(question):
+    return f"Action: {ASK_TOOL}\nAction Input: {json.dumps({'question': question}, ensure_ascii=False)}"
+
+
+@pytest.fixture
+def bank():
+    return QuestionBank(QUESTIONS)
+
+
+def test_duplicates_are_counted_once(bank):
+    bank.add(BankQuestion("Depuis quand ressentez-vous ces difficultés ?", None, "transcripts"))
+    assert len(bank) == len(QUESTIONS)
+    assert next(q for q in bank._questions if q.domain == "histoire").count == 2
+
+
+def test_opening_replaces_topic(bank):
+    assert bank.opening("anxiété")[1] == "Qu'est-ce qui vous amène à consulter au sujet de « anxiété » ?"
+    assert bank.opening()[1] == "Qu'est-ce qui vous amène à consulter ?"
+
+
+def test_search_targets_domains_and_skips_asked(bank):
+    found = bank.search("je dors très mal, je me réveille la nuit", domains=["antecedents"], k=2)
+    assert found[0].domain == "antecedents"
+    assert found[1].domain == "symptomes"
+    assert all(q.domain != OPENING for q in bank.search("présenter prénom âge", k=5))
+
+    asked = ["Avez-vous des réveils nocturnes ou des difficultés à vous endormir ?"]
+    texts = [q.text for q in bank.search("réveils nocturnes endormir", exclude=asked, k=3)]
+    assert asked[0] not in texts
+
+
+def test_asked_questions_tolerate_bad_escapes():
+    history = [
+        action("Comment dormez-vous ?"),
+        'Action Input: {"question": "Qu\\\'est-ce qui vous inquiète ?"}',
+        'Action Input: {"question": "Première ligne\nseconde ligne ?"}',
+        'Action Input: {"question": "Vous avez dit \\"fatigué\\" ?"}',
+    ]
+    assert _asked_questions(history) == [
+        "Comment dormez-vous ?",
+        "Qu'est-ce qui vous inquiète ?",
+        "Première ligne\nseconde ligne ?",
+        'Vous avez dit "fatigué" ?',
+    ]
+
+
+def test_opening_served_without_generation(bank):
+    llm = EchoLLM()
+    wrapped = QuestionBankLLM(llm, bank, opening=2, candidates=3)
+    messages = [{"role": "user", "content": "Le sujet général de la consultation est : 'sommeil'."}]
+    response = wrapped.call(messages, from_task=InterviewTask())
+    assert "présenter" in response and ASK_TOOL in response
+    assert llm.calls == []
+    assert bank.stats()["served"] == 1
+
+
+def test_hints_added_after_opening(bank):
+    llm = EchoLLM()
+    wrapped = QuestionBankLLM(llm, bank, opening=0, candidates=2)
+    messages = [
+        {"role": "user", "content": "Le sujet général de la consultation est : 'sommeil'."},
+        {"role": "assistant", "content": action("Comment dormez-vous ?") + "\nObservation: je me réveille la nuit"},
+    ]
+    assert wrapped.call(messages, from_task=InterviewTask()) == "question générée"
+    assert "BANQUE DE QUESTIONS" in llm.calls[0][-1]["content"]
+    assert bank.stats()["hinted"] == 1
+
+
+def test_bank_error_falls_back_to_llm(bank, monkeypatch):
+    def broken(*args, **kwargs):
+        raise RuntimeError("index corrompu")
+
+    monkeypatch.setattr(bank, "opening", broken)
+    llm = EchoLLM()
+    wrapped = QuestionBankLLM(llm, bank, opening=2, candidates=3)
+    messages = [{"role": "user", "content": "Le sujet général de la consultation est : 'sommeil'."}]
+    assert wrapped.call(messages, from_task=InterviewTask()) == "question générée"
+    assert llm.calls == [messages]
+
+
+def test_knowledge_directory_loads():
+    bank = QuestionBank.load()
+    assert len(bank) > 20
+    assert len(bank.opening("anxiété")) >= 2
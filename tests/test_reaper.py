@@ -0,0 +1,35 @@
+"""Reaper: limites explicites (y compris 0) et plafond LRU des sessions vivantes."""
+import time
+
+from medical_report.reaper import SessionReaper
+from medical_report.session_store import InMemorySessionStore
+
+
+def reaper(store, evicted, **limits):
+    def evict(session_id, reason):
+        evicted.append((session_id, reason))
+        store.delete(session_id)
+
+    return SessionReaper(store, evict, lambda: [], **limits)
+
+
+def test_explicit_zero_limits_are_kept(monkeypatch):
+    monkeypatch.setenv("PSYCHAT_MAX_LIVE_SESSIONS", "1000")
+    store, evicted = InMemorySessionStore(), []
+    for session_id in ("a", "b", "c"):
+        store.create(session_id, "anxiété")
+        time.sleep(0.01)
+    store.update("a", status="running")
+
+    r = reaper(store, evicted, idle_timeout=3600, max_age=3600, max_live=0, interval=0)
+    assert (r.max_live, r.interval) == (0, 0)
+    r.sweep()
+    assert evicted == [("b", "lru"), ("c", "lru"), ("a", "lru")]
+
+
+def test_idle_timeout_zero_evicts_inactive_sessions():
+    store, evicted = InMemorySessionStore(), []
+    store.create("s1", "anxiété")
+    time.sleep(0.01)
+    reaper(store, evicted, idle_timeout=0, max_age=3600).sweep()
+    assert evicted == [("s1", "idle")]
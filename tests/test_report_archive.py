@@ -0,0 +1,112 @@
+"""Archive des rapports: versions, rattachement du PDF, effacement et comptage des références."""
+import os
+
+import pytest
+
+from medical_report.report_archive import ReportArchive
+
+REPORT = "# Rapport psychiatrique\n\nSynthèse de l'entretien."
+PDF = b"%PDF-1.4\nrapport"
+
+
+@pytest.fixture
+def archive(tmp_path):
+    return ReportArchive(str(tmp_path / "archive"), enabled=True, max_age=3600)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge de l'archive avancée à la main (dates d'archivage distinctes)."""
+    now = [1_000_000.0]
+    monkeypatch.setattr("medical_report.report_archive.time.time", lambda: now[0])
+    return now
+
+
+def test_versions_and_pdf(archive):
+    first = archive.add("s1", "anxiété", REPORT, "fast")
+    second = archive.add("s1", "anxiété", REPORT + "\nRévision.")
+    assert (first.version, second.version) == (1, 2)
+    assert archive.markdown(archive.get("s1")) == REPORT + "\nRévision."
+    assert archive.markdown(archive.get("s1", 1)) == REPORT
+
+    # Rattaché à la dernière version ayant ce rapport, pas à la plus récente
+    assert archive.attach_pdf("s1", REPORT, PDF)
+    assert archive.pdf(archive.get("s1", 1)) == PDF
+    assert archive.get("s1", 2).pdf_key is None
+    assert not archive.attach_pdf("inconnue", REPORT, PDF)
+
+
+def test_identical_content_stored_once(archive):
+    archive.add("s1", "anxiété", REPORT)
+    archive.add("s2", "anxiété", REPORT)
+    archive.attach_pdf("s1", REPORT, PDF)
+    archive.attach_pdf("s2", REPORT, PDF)
+    assert archive.stats()["deduplicated"] == 2
+    objects = [name for _, _, names in os.walk(os.path.join(archive.root, "objects")) for name in names]
+    assert len(objects) == 2
+
+
+def test_delete_keeps_shared_content(archive):
+    archive.add("s1", "anxiété", REPORT)
+    archive.add("s2", "sommeil", REPORT)
+    archive.attach_pdf("s1", REPORT, PDF)
+    entry = archive.get("s1")
+
+    assert archive.delete("s1") == 1
+    assert archive.get("s1") is None
+    # Le markdown sert encore à s2; le PDF n'était rattaché qu'à s1
+    assert os.path.exists(archive.path(entry.markdown_key))
+    assert not os.path.exists(archive.path(entry.pdf_key))
+
+    assert archive.delete("s2") == 1
+    assert not os.path.exists(archive.path(entry.markdown_key))
+    assert archive.stats()["reports"] == 0
+
+
+def test_attach_after_purge_leaves_nothing(archive):
+    archive.add("s1", "anxiété", REPORT)
+    archive.delete("s1")
+    assert not archive.attach_pdf("s1", REPORT, PDF)
+    objects = [name for _, _, names in os.walk(os.path.join(archive.root, "objects")) for name in names]
+    assert objects == []
+
+
+def test_unreadable_content(archive):
+    entry = archive.add("s1", "anxiété", REPORT)
+    with open(archive.path(entry.markdown_key), "wb") as f:
+        f.write(b"pas du zlib")
+    with pytest.raises(ValueError):
+        archive.markdown(entry)
+    os.remove(archive.path(entry.markdown_key))
+    with pytest.raises(FileNotFoundError):
+        archive.markdown(entry)
+
+
+def test_expire(archive, clock):
+    old = archive.add("ancienne", "anxiété", REPORT)
+    clock[0] += 600
+    archive.add("recente", "sommeil", REPORT + "\nAutre.")
+    assert archive.expire(now=old.created_at + archive.max_age + 1) == 1
+    assert archive.get("ancienne") is None
+    assert archive.get("recente") is not None
+    assert not os.path.exists(archive.path(old.markdown_key))
+    assert archive.stats()["expired"] == 1
+
+
+def test_list_filters(archive, clock):
+    first = archive.add("s1", "anxiété", REPORT)
+    clock[0] += 1
+    archive.add("s2", "sommeil", REPORT)
+    clock[0] += 1
+    archive.add("s3", "anxiété", REPORT)
+    assert [e.session_id for e in archive.list()] == ["s3", "s2", "s1"]
+    assert [e.session_id for e in archive.list(topic="anxiété")] == ["s3", "s1"]
+    assert [e.session_id for e in archive.list(until=first.created_at + 1)] == ["s1"]
+    assert len(archive.list(limit=1)) == 1
+
+
+def test_disabled(tmp_path):
+    archive = ReportArchive(str(tmp_path / "archive"), enabled=False)
+    assert archive.add("s1", "anxiété", REPORT) is None
+    assert archive.list() == []
+    assert not os.path.exists(archive.root)
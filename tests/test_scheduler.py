@@ -0,0 +1,63 @@
+"""Planificateur: places de travail rendues pendant l'attente du patient, admission et annulation."""
+import threading
+
+import pytest
+
+from medical_report.scheduler import SchedulerFull, SessionScheduler
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = SessionScheduler(max_workers=1, max_pending=1, max_interviews=3)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_parked_session_frees_its_slot(scheduler):
+    answered = threading.Event()
+    order = []
+
+    def interview(session_id):
+        order.append(f"{session_id} question")
+        with scheduler.parked(session_id):
+            assert answered.wait(5)
+        order.append(f"{session_id} réponse")
+
+    first = scheduler.submit("s1", interview, "s1")
+    # s1 attend le patient: la seule place de travail revient à s2
+    scheduler.submit("s2", lambda: order.append("s2")).result(5)
+    assert scheduler.stats()["parked"] == 1
+    answered.set()
+    first.result(5)
+    assert order == ["s1 question", "s2", "s1 réponse"]
+    assert (scheduler.stats()["running"], scheduler.stats()["parked"]) == (0, 0)
+
+
+def test_admission_counts_open_interviews(scheduler):
+    release = threading.Event()
+    futures = [scheduler.submit(f"s{i}", release.wait, 5) for i in range(4)]
+    with pytest.raises(SchedulerFull):
+        scheduler.submit("refusée", release.wait, 5)
+    release.set()
+    assert all(f.result(5) for f in futures)
+
+
+def test_cancel_while_waiting_for_a_slot(scheduler):
+    started, release = threading.Event(), threading.Event()
+    ran = []
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    first = scheduler.submit("s1", hold)
+    assert started.wait(5)
+    scheduler.submit("s2", ran.append, "s2")
+    assert scheduler.position("s2") == 1
+    assert scheduler.cancel("s2")
+    release.set()
+    first.result(5)
+    # Place suivante libre: s3 passe, s2 n'a jamais été exécutée
+    scheduler.submit("s3", ran.append, "s3").result(5)
+    assert ran == ["s3"]
+    assert not scheduler.cancel("s1")
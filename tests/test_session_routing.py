@@ -0,0 +1,148 @@
+"""Routage des sessions sous concurrence, à travers le vrai handler de l'application web.
+
+Chaque entretien construit son crew par `app.crew_factory` (outils de l'interviewer liés
+à sa session par `CrewFactory.instance`) et appelle l'`AskPatientTool` de l'agent comme
+le ferait CrewAI (outil structuré, arguments en dictionnaire); `app.web_ask_patient` sert
+les appels et un patient simulé répond par `app.submit_answer`. Le crew n'est pas lancé:
+aucun appel LLM.
+"""
+import asyncio
+import importlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("crewai")
+pytest.importorskip("flask")
+
+from medical_report.session_context import current_session, propagate, run_bound  # noqa: E402
+from medical_report.tools.custom_tool import AskPatientTool  # noqa: E402
+
+SESSIONS = 24
+LIMIT = 10   # limite stricte de web_ask_patient
+QUESTIONS = LIMIT + 1
+
+
+@pytest.fixture(scope="module")
+def web(tmp_path_factory):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("PSYCHAT_FAKE_LLM", "1")
+        mp.setenv("PSYCHAT_PDF_PROCESSES", "0")
+        mp.setenv("PSYCHAT_QUESTION_BANK", "0")
+        mp.setenv("PSYCHAT_SPECULATIVE", "0")
+        mp.setenv("PSYCHAT_REPORT_ARCHIVE", "0")
+        mp.setenv("PSYCHAT_PDF_CACHE_DIR", str(tmp_path_factory.mktemp("pdf")))
+        mp.setenv("OPENAI_API_KEY", os.getenv("OPENAI_API_KEY", "test"))
+        app = importlib.import_module("app")
+        mp.setattr(app, "ANSWER_TIMEOUT", 30)
+        # Le handler réel, appelé après vérification du contexte courant
+        handler = app.crew_factory.tool_handlers[AskPatientTool]
+        seen = []
+
+        def checked(session_id, question):
+            seen.append(current_session() == session_id)
+            return handler(session_id, question)
+
+        mp.setitem(app.crew_factory.tool_handlers, AskPatientTool, checked)
+        app.context_checks = seen
+        yield app
+
+
+@pytest.fixture
+def sessions(web):
+    session_ids = [f"routage-{i:03d}-{time.monotonic_ns()}" for i in range(SESSIONS)]
+    for session_id in session_ids:
+        web.store.create(session_id, "routage")
+        web.sessions[session_id] = web._new_runtime(session_id)
+    stop = threading.Event()
+    responder = threading.Thread(target=_patient, args=(web, session_ids, stop), daemon=True)
+    responder.start()
+    yield session_ids
+    stop.set()
+    responder.join()
+    for session_id in session_ids:
+        web.discard_session(session_id)
+
+
+def _patient(web, session_ids, stop):
+    """Répond à chaque question en attente (réponse = session et numéro de question)."""
+    while not stop.is_set():
+        idle = True
+        for session_id in session_ids:
+            record = web.store.get(session_id)
+            if record is not None and record['status'] == 'awaiting_answer':
+                idle = False
+                web.submit_answer(session_id, f"réponse {session_id} {record['question_count']}")
+        if idle:
+            time.sleep(0.001)
+
+
+def _ask_tool(web, session_id):
+    agent = web.crew_factory.instance(session_id).interviewer_clinique()
+    tool = next(t for t in agent.tools if isinstance(t, AskPatientTool))
+    assert tool.session_id == session_id
+    return tool.to_structured_tool()
+
+
+def _call(tool, number):
+    try:
+        return tool.invoke({"question": f"question {number}"})
+    except Exception as e:
+        # Limite atteinte: web_ask_patient lève MAX_QUESTIONS_REACHED pour l'agent
+        return str(e)
+
+
+def _expected(session_id, number):
+    return f"réponse {session_id} {number}" if number <= LIMIT else "MAX_QUESTIONS_REACHED"
+
+
+def _interview(web, session_id, tool_pool):
+    tool = _ask_tool(web, session_id)
+    answers = []
+    for number in range(1, QUESTIONS + 1):
+        answers.append(tool_pool.submit(propagate(lambda: _call(tool, number))).result())
+    return answers
+
+
+def _check_answers(session_id, answers):
+    for number, answer in enumerate(answers, 1):
+        assert _expected(session_id, number) in answer, (session_id, number, answer)
+
+
+def _check_store(web, session_ids):
+    for session_id in session_ids:
+        exchanges = web.store.exchanges(session_id)
+        assert web.store.get(session_id)['question_count'] == LIMIT
+        assert [ex['number'] for ex in exchanges] == list(range(1, LIMIT + 1))
+        assert all(ex['answer'] == f"réponse {session_id} {ex['number']}" for ex in exchanges)
+        assert len(web.sessions[session_id]['transcript'].answers()) > 0
+
+
+def test_threads_share_crew_and_tool_executors(web, sessions):
+    # Moins de workers que de sessions: threads réutilisés d'un crew à l'autre
+    del web.context_checks[:]
+    with ThreadPoolExecutor(max_workers=8) as crews, ThreadPoolExecutor(max_workers=8) as tools:
+        futures = {sid: crews.submit(run_bound, sid, _interview, web, sid, tools) for sid in sessions}
+        for session_id, future in futures.items():
+            _check_answers(session_id, future.result())
+    assert web.context_checks and all(web.context_checks)
+    _check_store(web, sessions)
+
+
+def test_asyncio_tasks(web, sessions):
+    del web.context_checks[:]
+
+    async def interview(session_id):
+        tool = await asyncio.to_thread(_ask_tool, web, session_id)
+        return [await asyncio.to_thread(_call, tool, number) for number in range(1, QUESTIONS + 1)]
+
+    async def main():
+        return await asyncio.gather(*(interview(sid) for sid in sessions))
+
+    for session_id, answers in zip(sessions, asyncio.run(main())):
+        _check_answers(session_id, answers)
+    assert web.context_checks and all(web.context_checks)
+    _check_store(web, sessions)
@@ -0,0 +1,124 @@
+"""Stockage des sessions: échanges Q/R, baux de reprise et migration de la base SQLite."""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from medical_report.session_store import DEFAULT_MODE, InMemorySessionStore, SQLiteSessionStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return InMemorySessionStore()
+    return SQLiteSessionStore(str(tmp_path / "sessions.db"), poll_interval=0.01)
+
+
+def test_question_answer_cycle(store):
+    store.create("s1", "anxiété", mode="pipeline")
+    record = store.get("s1")
+    assert (record['status'], record['mode'], record['question_count']) == ("queued", "pipeline", 0)
+    assert not store.submit_answer("s1", "trop tôt")
+
+    store.record_question("s1", 1, "Comment dormez-vous ?")
+    assert store.get("s1")['status'] == "awaiting_answer"
+    assert store.submit_answer("s1", "Mal")
+    assert not store.submit_answer("s1", "Deux fois")
+    assert store.wait_answer("s1", 1, timeout=1) == "Mal"
+    record = store.get("s1")
+    assert (record['status'], record['question']) == ("running", None)
+    assert store.exchanges("s1") == [{'number': 1, 'question': "Comment dormez-vous ?", 'answer': "Mal"}]
+
+
+def test_wait_answer_wakes_on_submit_and_delete(store):
+    store.create("s1", "anxiété")
+    store.record_question("s1", 1, "Question ?")
+    threading.Timer(0.05, store.submit_answer, ("s1", "Réponse")).start()
+    assert store.wait_answer("s1", 1, timeout=5) == "Réponse"
+
+    store.record_question("s1", 2, "Suite ?")
+    assert store.wait_answer("s1", 2, timeout=0.05) is None
+    # Session supprimée (éviction): l'attente se termine sans réponse
+    threading.Timer(0.05, store.delete, ("s1",)).start()
+    started = time.monotonic()
+    assert store.wait_answer("s1", 2, timeout=5) is None
+    assert time.monotonic() - started < 2
+    assert store.get("s1") is None
+
+
+def test_discard_pending_keeps_answered(store):
+    store.create("s1", "anxiété")
+    store.record_question("s1", 1, "Q1")
+    store.submit_answer("s1", "R1")
+    store.record_question("s1", 2, "Q2")
+    store.discard_pending("s1")
+    assert [ex['number'] for ex in store.exchanges("s1")] == [1]
+
+
+def test_update_rejects_unknown_fields(store):
+    store.create("s1", "anxiété")
+    with pytest.raises(ValueError):
+        store.update("s1", owner="intrus")
+    store.update("s1", status="finished", result="Rapport")
+    assert store.get("s1")['result'] == "Rapport"
+
+
+def test_list_sessions_least_recent_first(store):
+    for session_id in ("a", "b", "c"):
+        store.create(session_id, "anxiété")
+        time.sleep(0.01)
+    store.update("a", status="running")
+    assert [r['session_id'] for r in store.list_sessions()] == ["b", "c", "a"]
+
+
+def test_sqlite_leases(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    first, second = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    first.create("s1", "anxiété", owner="w1", lease=30)
+    first.create("s2", "sommeil", owner="w1", lease=0.05)
+    first.create("s3", "humeur", owner="w1", lease=0.05)
+    first.update("s3", status="finished")
+
+    # Bail en cours: seul son propriétaire peut le reprendre
+    assert not second.claim("s1", "w2", 30)
+    assert first.claim("s1", "w1", 30)
+    time.sleep(0.1)
+    # Sessions terminées jamais reprises
+    assert second.expired() == ["s2"]
+    assert second.claim("s2", "w2", 30)
+    assert second.expired() == []
+
+    # Le renouvellement d'un ancien propriétaire ne touche pas une session reprise
+    first.renew("w1", ["s1", "s2"], 0.01)
+    time.sleep(0.05)
+    assert second.expired() == ["s1"]
+
+
+def test_sqlite_answer_from_other_worker(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    crew_worker, http_worker = SQLiteSessionStore(path, poll_interval=0.01), SQLiteSessionStore(path)
+    crew_worker.create("s1", "anxiété")
+    crew_worker.record_question("s1", 1, "Question ?")
+    threading.Timer(0.05, http_worker.submit_answer, ("s1", "Réponse")).start()
+    assert crew_worker.wait_answer("s1", 1, timeout=5) == "Réponse"
+
+
+def test_sqlite_migrates_missing_mode_column(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE sessions (session_id TEXT PRIMARY KEY, topic TEXT NOT NULL, status TEXT NOT NULL, "
+        "question TEXT, question_count INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, report_file TEXT, "
+        "owner TEXT, lease_expires REAL NOT NULL DEFAULT 0, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "INSERT INTO sessions (session_id, topic, status, created_at, updated_at) VALUES ('ancienne', 'anxiété', 'running', 0, 0)"
+    )
+    conn.commit()
+    conn.close()
+
+    store = SQLiteSessionStore(path)
+    assert store.get("ancienne")['mode'] == DEFAULT_MODE
+    store.create("nouvelle", "sommeil", mode="fast")
+    assert store.get("nouvelle")['mode'] == "fast"